@@ -0,0 +1,227 @@
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+
+from database import db, ActivityEvent
+
+# kind -> Font Awesome icon shown in the admin feed
+ICONS = {
+    'register': 'user-plus',
+    'upload': 'music',
+    'play': 'headphones',
+    'ad': 'ad',
+    'withdrawal': 'money-bill-wave',
+    'withdrawal_processed': 'check-circle',
+    'ban': 'user-slash',
+    'unban': 'user-check',
+    'fraud': 'shield-alt',
+}
+
+
+def time_ago(when, now=None):
+    """Age of a datetime as '2 minutes ago'."""
+    seconds = max(0, int(((now or datetime.utcnow()) - when).total_seconds()))
+    for unit, size in (('day', 86400), ('hour', 3600), ('minute', 60)):
+        if seconds >= size:
+            count = seconds // size
+            return f'{count} {unit}{"" if count == 1 else "s"} ago'
+    return 'just now'
+
+
+def serialize(event):
+    return {
+        'kind': event['kind'],
+        'icon': ICONS.get(event['kind'], 'bell'),
+        'message': event['message'],
+        'user_id': event['user_id'],
+        'created_at': event['created_at'].isoformat(),
+        'time_ago': time_ago(event['created_at']),
+    }
+
+
+class ActivityFeed:
+    """Event bus behind the admin activity feed.
+
+    publish() only touches memory. The event goes into this worker's ring
+    buffer of the latest ACTIVITY_BUFFER_SIZE events, to the subscribers,
+    and onto a queue that a background thread writes to ActivityEvent in
+    batches. The table is the history for paging. Reading the latest
+    events merges in rows written by other workers, at most every
+    ACTIVITY_REFRESH_SECONDS.
+
+    Events too frequent to publish one by one, such as plays, go through
+    tally() instead: the writer thread publishes one event per kind and
+    key every ACTIVITY_TALLY_SECONDS with the number of times it happened.
+    """
+
+    def __init__(self, app=None):
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.buffer = deque(maxlen=200)
+        self.queue = queue.Queue()
+        self.thread = None
+        self.app = None
+        self.subscribers = []
+        self.tallies = {}  # (kind, key) -> [message, user_id, count]
+        self.last_tally = time.time()
+        self.tally_seconds = 60
+        self.last_id = None  # newest table row merged into the buffer
+        self.last_refresh = 0.0
+        self.refresh_seconds = 5
+        self.batch_size = 500
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ACTIVITY_BUFFER_SIZE', 200)
+        app.config.setdefault('ACTIVITY_REFRESH_SECONDS', 5)
+        app.config.setdefault('ACTIVITY_BATCH_SIZE', 500)
+        app.config.setdefault('ACTIVITY_TALLY_SECONDS', 60)
+
+        self.app = app
+        self.buffer = deque(maxlen=app.config['ACTIVITY_BUFFER_SIZE'])
+        self.tallies = {}
+        self.refresh_seconds = app.config['ACTIVITY_REFRESH_SECONDS']
+        self.batch_size = app.config['ACTIVITY_BATCH_SIZE']
+        self.tally_seconds = app.config['ACTIVITY_TALLY_SECONDS']
+        app.extensions['activity_feed'] = self
+
+    def subscribe(self, callback):
+        """Call `callback(event)` for every event published in this worker; it must not block."""
+        self.subscribers.append(callback)
+        return callback
+
+    def publish(self, kind, message, user_id=None):
+        event = {'uid': uuid.uuid4().hex, 'kind': kind, 'message': message[:200], 'user_id': user_id,
+                 'created_at': datetime.utcnow()}
+        with self.lock:
+            self.buffer.append(event)
+            self._start()
+        self.queue.put(event)
+        self._notify([event])
+        return event
+
+    def tally(self, kind, key, message, user_id=None):
+        """Count an event to be published later with others of the same kind and key."""
+        with self.lock:
+            entry = self.tallies.get((kind, key))
+            if entry is None:
+                self.tallies[(kind, key)] = [message, user_id, 1]
+            else:
+                entry[2] += 1
+            self._start()
+
+    def publish_tallies(self):
+        """Publish one event per counted kind and key, as '<message> (12 times)'."""
+        with self.lock:
+            tallies, self.tallies = self.tallies, {}
+            self.last_tally = time.time()
+        for (kind, _), (message, user_id, count) in tallies.items():
+            self.publish(kind, message if count == 1 else f'{message} ({count} times)', user_id)
+
+    def _start(self):
+        # Called with the lock held
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self.run, name='activity-writer', daemon=True)
+            self.thread.start()
+
+    def _notify(self, events):
+        for event in events:
+            for callback in self.subscribers:
+                try:
+                    callback(event)
+                except Exception:
+                    self.app.logger.exception('Activity subscriber failed')
+
+    def run(self):
+        while True:
+            if self.tallies and time.time() - self.last_tally >= self.tally_seconds:
+                self.publish_tallies()
+            try:
+                batch = [self.queue.get(timeout=self.tally_seconds)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with self.app.app_context():
+                    with db.engine.begin() as connection:
+                        connection.execute(ActivityEvent.__table__.insert(), batch)
+            except Exception:
+                self.app.logger.exception('Could not write %d activity events', len(batch))
+            for _ in batch:
+                self.queue.task_done()
+
+    def flush(self):
+        """Publish the tallies and wait until every published event has been written."""
+        self.publish_tallies()
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.join()
+
+    def refresh(self, force=False):
+        """Merge events other workers wrote since the last refresh into the buffer.
+
+        Subscribers are told about them too, except on the first refresh,
+        which only fills the buffer with history.
+        """
+        now = time.time()
+        if not force and now - self.last_refresh < self.refresh_seconds:
+            return
+        # Another thread is already refreshing; its result will do
+        if not self.refresh_lock.acquire(blocking=False):
+            return
+        try:
+            self.last_refresh = now
+            self._merge()
+        finally:
+            self.refresh_lock.release()
+
+    def _merge(self):
+        query = ActivityEvent.query
+        if self.last_id is not None:
+            query = query.filter(ActivityEvent.id > self.last_id)
+        rows = query.order_by(ActivityEvent.id.desc()).limit(self.buffer.maxlen).all()
+        if not rows:
+            return
+        first = self.last_id is None
+        self.last_id = rows[0].id
+        with self.lock:
+            seen = {event['uid'] for event in self.buffer}
+            remote = [self._event(row) for row in reversed(rows) if row.uid not in seen]
+            merged = list(self.buffer) + remote
+            merged.sort(key=lambda event: event['created_at'])
+            self.buffer = deque(merged, maxlen=self.buffer.maxlen)
+        if not first:
+            self._notify(remote)
+
+    def recent(self, limit=20, kind=None):
+        """The latest events, newest first, from the buffer."""
+        self.refresh()
+        with self.lock:
+            events = list(self.buffer)
+        events.reverse()
+        if kind is not None:
+            events = [event for event in events if event['kind'] == kind]
+        return events[:limit]
+
+    def history(self, before=None, limit=50, kind=None):
+        """Events from the table older than id `before`, newest first, with their ids for paging."""
+        query = ActivityEvent.query
+        if before is not None:
+            query = query.filter(ActivityEvent.id < before)
+        if kind is not None:
+            query = query.filter(ActivityEvent.kind == kind)
+        return [dict(self._event(row), id=row.id) for row in query.order_by(ActivityEvent.id.desc()).limit(limit)]
+
+    def _event(self, row):
+        return {'uid': row.uid, 'kind': row.kind, 'message': row.message, 'user_id': row.user_id,
+                'created_at': row.created_at}
+
+
+activity_feed = ActivityFeed()
@@ -0,0 +1,256 @@
+import math
+import os
+import subprocess
+import wave
+from datetime import datetime
+
+import numpy as np
+
+from database import db, TrackAnalysis
+from transcode import find_encoder
+
+CHUNK_FRAMES = 65536
+PEAK_BLOCKS_PER_SECOND = 100  # waveform resolution before downsampling
+DECODE_SAMPLE_RATE = 44100  # used when ffmpeg decodes compressed formats
+PEAK_CEILING_DBFS = -1.0  # normalized peaks stay this far below full scale
+
+
+def k_weighting(sample_rate):
+    """ITU-R BS.1770 K-weighting as two biquads, (b, a) pairs for `sample_rate`.
+
+    Same formulation as libebur128, so any sample rate is supported.
+    """
+    f0 = 1681.974450955533
+    gain = 3.999843853973347
+    q = 0.7071752369554196
+    k = math.tan(math.pi * f0 / sample_rate)
+    vh = 10 ** (gain / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf = ([(vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0],
+             [1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0])
+
+    f0 = 38.13547087602444
+    q = 0.5003270373238773
+    k = math.tan(math.pi * f0 / sample_rate)
+    a0 = 1 + k / q + k * k
+    highpass = ([1.0, -2.0, 1.0],
+                [1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0])
+    return shelf, highpass
+
+
+class Analyzer:
+    """Streaming peak waveform and integrated loudness for one track.
+
+    Feed float samples in [-1, 1] shaped (frames, channels) with `feed()`;
+    nothing but a few partial blocks is kept between chunks, so memory does
+    not grow with the length of the file. `finish()` returns the results.
+    """
+
+    def __init__(self, sample_rate, channels):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frames = 0
+
+        self.peak_block = max(1, sample_rate // PEAK_BLOCKS_PER_SECOND)
+        self.peak_rest = np.zeros(0, dtype=np.float32)
+        self.peaks = []
+
+        # Loudness is gated over 400 ms blocks overlapping by 75%, so the
+        # mean square is kept per 100 ms step and combined four at a time
+        self.step = max(1, sample_rate // 10)
+        self.filters = k_weighting(sample_rate)
+        self.filter_state = [np.zeros((2, channels)) for _ in self.filters]
+        self.loudness_rest = np.zeros((0, channels))
+        self.steps = []
+
+    def feed(self, samples):
+        # scipy.signal takes seconds to import; only the analysis worker needs it
+        from scipy.signal import lfilter
+
+        if not len(samples):
+            return
+        self.frames += len(samples)
+
+        # Peak per 10 ms across all channels
+        level = np.concatenate([self.peak_rest, np.abs(samples).max(axis=1)])
+        whole = len(level) - len(level) % self.peak_block
+        if whole:
+            self.peaks.append(level[:whole].reshape(-1, self.peak_block).max(axis=1))
+        self.peak_rest = level[whole:]
+
+        weighted = samples.astype(np.float64)
+        for index, (b, a) in enumerate(self.filters):
+            weighted, self.filter_state[index] = lfilter(b, a, weighted, axis=0, zi=self.filter_state[index])
+        weighted = np.concatenate([self.loudness_rest, weighted])
+        whole = len(weighted) - len(weighted) % self.step
+        if whole:
+            steps = weighted[:whole].reshape(-1, self.step, self.channels)
+            self.steps.append(np.mean(steps ** 2, axis=1))
+        self.loudness_rest = weighted[whole:]
+
+    def loudness(self):
+        """Gated integrated loudness in LUFS, or None for silence or < 400 ms."""
+        if not self.steps:
+            return None
+        steps = np.concatenate(self.steps)
+        if len(steps) < 4:
+            return None
+        # Mean square of every 400 ms block, summed over channels (weight 1.0
+        # for the front channels, which is all mono and stereo files have)
+        windows = np.lib.stride_tricks.sliding_window_view(steps, 4, axis=0).mean(axis=-1)
+        power = windows.sum(axis=1)
+        with np.errstate(divide='ignore'):
+            block_loudness = -0.691 + 10 * np.log10(power)
+
+        gated = power[block_loudness > -70.0]
+        if not len(gated):
+            return None
+        relative_gate = -0.691 + 10 * math.log10(gated.mean()) - 10.0
+        gated = power[(block_loudness > -70.0) & (block_loudness > relative_gate)]
+        if not len(gated):
+            return None
+        return float(-0.691 + 10 * math.log10(gated.mean()))
+
+    def waveform(self, points):
+        """Peaks reduced to at most `points` values, quantized to bytes."""
+        blocks = list(self.peaks)
+        if len(self.peak_rest):
+            blocks.append(np.array([self.peak_rest.max()], dtype=np.float32))
+        if not blocks:
+            return b''
+        peaks = np.concatenate(blocks)
+        if len(peaks) > points:
+            edges = np.linspace(0, len(peaks), points + 1).astype(np.int64)[:-1]
+            peaks = np.maximum.reduceat(peaks, edges)
+        return np.round(np.clip(peaks, 0.0, 1.0) * 255).astype(np.uint8).tobytes()
+
+    def finish(self, points=1000):
+        peak = max((float(block.max()) for block in self.peaks if len(block)), default=0.0)
+        if len(self.peak_rest):
+            peak = max(peak, float(self.peak_rest.max()))
+        return {
+            'duration': self.frames / self.sample_rate,
+            'loudness_lufs': self.loudness(),
+            'peak_dbfs': 20 * math.log10(peak) if peak > 0 else None,
+            'waveform': self.waveform(points),
+        }
+
+
+def _wav_samples(raw, sample_width, channels):
+    if sample_width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif sample_width == 2:
+        samples = np.frombuffer(raw, dtype='<i2').astype(np.float32) / 32768.0
+    elif sample_width == 3:
+        data = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        value = data[:, 0] | (data[:, 1] << 8) | (data[:, 2] << 16)
+        value = (value << 8) >> 8  # sign-extend the 24-bit value
+        samples = value.astype(np.float32) / 8388608.0
+    else:
+        samples = np.frombuffer(raw, dtype='<i4').astype(np.float32) / 2147483648.0
+    return samples.reshape(-1, channels)
+
+
+def _read_wav(path, chunk_frames):
+    with wave.open(path, 'rb') as wav:
+        sample_rate, channels, sample_width = wav.getframerate(), wav.getnchannels(), wav.getsampwidth()
+        yield sample_rate, channels
+        while True:
+            raw = wav.readframes(chunk_frames)
+            if not raw:
+                break
+            yield _wav_samples(raw, sample_width, channels)
+
+
+def _read_ffmpeg(path, encoder, chunk_frames):
+    channels = 2
+    process = subprocess.Popen(
+        [encoder, '-nostdin', '-loglevel', 'error', '-i', path, '-vn',
+         '-ac', str(channels), '-ar', str(DECODE_SAMPLE_RATE), '-f', 'f32le', 'pipe:1'],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    try:
+        yield DECODE_SAMPLE_RATE, channels
+        frame_bytes = 4 * channels
+        while True:
+            raw = process.stdout.read(chunk_frames * frame_bytes)
+            if not raw:
+                break
+            raw = raw[:len(raw) - len(raw) % frame_bytes]
+            yield np.frombuffer(raw, dtype='<f4').reshape(-1, channels)
+    finally:
+        process.stdout.close()
+        process.kill()
+        process.wait()
+
+
+def decode(path, chunk_frames=CHUNK_FRAMES):
+    """Decode an audio file in chunks.
+
+    The first item is (sample_rate, channels), followed by float32 arrays
+    shaped (frames, channels). PCM WAV is read directly; anything else needs
+    ffmpeg. Returns None when the file cannot be decoded here.
+    """
+    if path.lower().endswith('.wav'):
+        try:
+            with wave.open(path, 'rb'):
+                pass
+            return _read_wav(path, chunk_frames)
+        except (wave.Error, EOFError):
+            pass  # e.g. float WAV, which ffmpeg can still read
+    encoder = find_encoder()
+    if encoder is None:
+        return None
+    return _read_ffmpeg(path, encoder, chunk_frames)
+
+
+def analyze_file(path, points=1000):
+    """Waveform, loudness, sample peak and duration of the file at `path`."""
+    chunks = decode(path)
+    if chunks is None:
+        return None
+    sample_rate, channels = next(chunks)
+    analyzer = Analyzer(sample_rate, channels)
+    for samples in chunks:
+        analyzer.feed(samples)
+    if not analyzer.frames:
+        return None
+    return analyzer.finish(points)
+
+
+def analyze_track(track, upload_folder, points=1000):
+    """Analyze one track's original upload and store the result."""
+    source = os.path.join(upload_folder, track.filename)
+    if not os.path.exists(source):
+        return None
+    result = analyze_file(source, points)
+    if result is None:
+        return None
+
+    analysis = TrackAnalysis.query.get(track.id) or TrackAnalysis(track_id=track.id)
+    analysis.waveform = result['waveform']
+    analysis.points = len(result['waveform'])
+    analysis.loudness_lufs = result['loudness_lufs']
+    analysis.peak_dbfs = result['peak_dbfs']
+    analysis.duration = result['duration']
+    analysis.analyzed_at = datetime.utcnow()
+    db.session.add(analysis)
+    if not track.duration:
+        track.duration = int(round(result['duration']))
+    db.session.commit()
+    return analysis
+
+
+def playback_gain(analysis, target_lufs, max_boost_db=6.0):
+    """Gain in dB that brings a track to `target_lufs`, 0 when unknown.
+
+    Never more than `max_boost_db`, and never so much that the track's
+    peak goes above PEAK_CEILING_DBFS.
+    """
+    if analysis is None or analysis.loudness_lufs is None:
+        return 0.0
+    gain = min(target_lufs - analysis.loudness_lufs, max_boost_db)
+    if analysis.peak_dbfs is not None:
+        gain = min(gain, PEAK_CEILING_DBFS - analysis.peak_dbfs)
+    return round(gain, 2)
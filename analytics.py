@@ -0,0 +1,275 @@
+"""Play, earnings and listener rollups behind the artist analytics API.
+
+Every credited play adds to its track's DailyPlayStats row for the UTC
+day, in the crediting transaction like the chart rollups. Plays and
+earnings add up, so a day, week or month for a track or an artist is a
+sum over those rows.
+
+Unique listeners do not add up, so each track and artist keeps a
+HyperLogLog sketch of its listeners per day in DailyListenerSketch, one
+row per register that has been set. Merging sketches is a max per
+register, which the database does while grouping the days into buckets.
+With 256 registers the estimate has a standard error of about 6.5%,
+and is close to exact for audiences of a few hundred or less.
+"""
+import math
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import case, cast, func, Date
+
+from database import db, DailyPlayStats, DailyListenerSketch, ListeningHistory, MusicTrack, upsert
+from counters import sharded_counters
+
+PERIODS = ('day', 'week', 'month')
+REGISTER_BITS = 8
+REGISTERS = 1 << REGISTER_BITS
+RANK_BITS = 64 - REGISTER_BITS
+MASK64 = (1 << 64) - 1
+
+
+def listener_register(streamer_id):
+    """(register, rank) of a listener in every sketch; a splitmix64 hash of the id."""
+    z = (streamer_id + 0x9E3779B97F4A7C15) & MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    z ^= z >> 31
+    return z >> RANK_BITS, RANK_BITS + 1 - (z & ((1 << RANK_BITS) - 1)).bit_length()
+
+
+def estimate(ranks):
+    """Distinct listeners from {register: rank}."""
+    m = REGISTERS
+    zeros = m - len(ranks)
+    raw = 0.7213 / (1 + 1.079 / m) * m * m / (zeros + sum(2.0 ** -rank for rank in ranks.values()))
+    if raw <= 2.5 * m and zeros:
+        return round(m * math.log(m / zeros))  # linear counting while most registers are empty
+    return round(raw)
+
+
+def bucket_start(day, period):
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(start, period):
+    if period == 'week':
+        return start + timedelta(days=7)
+    if period == 'month':
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def bucket_starts(start, end, period):
+    starts = []
+    current = bucket_start(start, period)
+    while current <= end:
+        starts.append(current)
+        current = next_bucket(current, period)
+    return starts
+
+
+def bucket_count(start, end, period):
+    if period == 'week':
+        return (bucket_start(end, period) - bucket_start(start, period)).days // 7 + 1
+    if period == 'month':
+        return (end.year - start.year) * 12 + end.month - start.month + 1
+    return (end - start).days + 1
+
+
+def default_start(end, period):
+    """30 days, 12 weeks or 12 months up to `end`."""
+    if period == 'week':
+        return bucket_start(end - timedelta(weeks=11), period)
+    if period == 'month':
+        months = end.year * 12 + end.month - 1 - 11
+        return date(months // 12, months % 12 + 1, 1)
+    return end - timedelta(days=29)
+
+
+def _as_date(value):
+    # SQLite hands back dates computed in SQL as text
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _bucket(column, period, dialect):
+    """SQL for the start of the bucket holding the day in `column`."""
+    if period == 'day':
+        return column
+    if dialect == 'postgresql':
+        return cast(func.date_trunc(period, column), Date)
+    if period == 'week':
+        return func.date(column, '-6 days', 'weekday 1')  # the Monday on or before
+    return func.date(column, 'start of month')
+
+
+class PlayAnalytics:
+    def __init__(self, app=None):
+        self.max_buckets = 1000
+        self.cache_seconds = 60
+        self.history_cache_seconds = 24 * 60 * 60
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ANALYTICS_MAX_BUCKETS', 1000)
+        app.config.setdefault('ANALYTICS_CACHE_SECONDS', 60)
+        app.config.setdefault('ANALYTICS_HISTORY_CACHE_SECONDS', 24 * 60 * 60)
+
+        self.max_buckets = app.config['ANALYTICS_MAX_BUCKETS']
+        self.cache_seconds = app.config['ANALYTICS_CACHE_SECONDS']
+        self.history_cache_seconds = app.config['ANALYTICS_HISTORY_CACHE_SECONDS']
+        app.extensions['play_analytics'] = self
+
+    def record_play(self, track, streamer_id, earnings_cents, when=None, session=None):
+        """Count a credited play in the day's rollups. Runs inside the caller's transaction."""
+        if session is None:
+            session = db.session
+        day = (when or datetime.utcnow()).date()
+        stats = DailyPlayStats.__table__
+        statement = upsert(session, stats).values(track_id=track.id, day=day, artist_id=track.artist_id,
+                                                  plays=1, earnings_cents=earnings_cents)
+        session.execute(statement.on_conflict_do_update(
+            index_elements=[stats.c.track_id, stats.c.day],
+            set_={'plays': stats.c.plays + 1,
+                  'earnings_cents': stats.c.earnings_cents + statement.excluded.earnings_cents}
+        ))
+
+        register, rank = listener_register(streamer_id)
+        sketches = DailyListenerSketch.__table__
+        statement = upsert(session, sketches).values([
+            {'scope': 'track', 'key': track.id, 'day': day, 'register': register, 'rank': rank},
+            {'scope': 'artist', 'key': track.artist_id, 'day': day, 'register': register, 'rank': rank},
+        ])
+        session.execute(statement.on_conflict_do_update(
+            index_elements=[sketches.c.scope, sketches.c.key, sketches.c.day, sketches.c.register],
+            set_={'rank': case((statement.excluded.rank > sketches.c.rank, statement.excluded.rank),
+                               else_=sketches.c.rank)}
+        ))
+
+    def first_day(self, scope, key):
+        column = DailyPlayStats.track_id if scope == 'track' else DailyPlayStats.artist_id
+        return _as_date(db.session.query(func.min(DailyPlayStats.day)).filter(column == key).scalar())
+
+    def series(self, scope, key, period, start, end):
+        """Plays, earnings and unique listeners of a track or artist per bucket from `start` to `end`.
+
+        Buckets without plays are included, so a chart gets every step.
+        """
+        dialect = db.session.get_bind().dialect.name
+        first = bucket_start(start, period)
+
+        stats_key = DailyPlayStats.track_id if scope == 'track' else DailyPlayStats.artist_id
+        bucket = _bucket(DailyPlayStats.day, period, dialect)
+        totals = {
+            _as_date(row[0]): row[1:]
+            for row in db.session.query(bucket, func.sum(DailyPlayStats.plays),
+                                        func.sum(DailyPlayStats.earnings_cents))
+            .filter(stats_key == key, DailyPlayStats.day >= first, DailyPlayStats.day <= end)
+            .group_by(bucket)
+        }
+
+        sketches = DailyListenerSketch
+        in_range = (sketches.scope == scope, sketches.key == key, sketches.day >= first, sketches.day <= end)
+        bucket = _bucket(sketches.day, period, dialect)
+        ranks = {}
+        for bucket_day, register, rank in db.session.query(bucket, sketches.register, func.max(sketches.rank))\
+                .filter(*in_range)\
+                .group_by(bucket, sketches.register):
+            ranks.setdefault(_as_date(bucket_day), {})[register] = rank
+        # The whole range is one more merge, not a sum of the buckets
+        overall = dict(db.session.query(sketches.register, func.max(sketches.rank))
+                       .filter(*in_range)
+                       .group_by(sketches.register)
+                       .all())
+
+        buckets = []
+        for bucket_day in bucket_starts(start, end, period):
+            plays, earnings_cents = totals.get(bucket_day, (0, 0))
+            buckets.append({
+                'start': bucket_day.isoformat(),
+                'plays': int(plays or 0),
+                'earnings': (earnings_cents or 0) / 100,
+                'listeners': estimate(ranks.get(bucket_day, {})),
+            })
+        return {
+            'period': period,
+            'start': first.isoformat(),
+            'end': end.isoformat(),
+            'buckets': buckets,
+            'totals': {
+                'plays': sum(item['plays'] for item in buckets),
+                'earnings': round(sum(item['earnings'] for item in buckets), 2),
+                'listeners': estimate(overall),
+            }
+        }
+
+    def rebuild(self, artist_ids, session=None):
+        """Recount the rollups of these artists' current tracks from listening history; does not commit.
+
+        History does not keep the artist's share of each play, so every
+        track's earnings are spread over its days in proportion to plays.
+        Rollups of deleted tracks are dropped. Returns the number of days
+        written.
+        """
+        if session is None:
+            session = db.session
+        artist_ids = list(artist_ids)
+        # Delete first, so SQLite holds the write lock while the history is read
+        session.query(DailyPlayStats).filter(DailyPlayStats.artist_id.in_(artist_ids))\
+            .delete(synchronize_session=False)
+        track_ids = [track_id for (track_id,) in session.query(MusicTrack.id)
+                     .filter(MusicTrack.artist_id.in_(artist_ids))]
+        session.query(DailyListenerSketch)\
+            .filter(DailyListenerSketch.scope == 'artist', DailyListenerSketch.key.in_(artist_ids))\
+            .delete(synchronize_session=False)
+        if track_ids:
+            session.query(DailyListenerSketch)\
+                .filter(DailyListenerSketch.scope == 'track', DailyListenerSketch.key.in_(track_ids))\
+                .delete(synchronize_session=False)
+
+        day = func.date(ListeningHistory.listened_at)
+        plays, artists, sketches = {}, {}, {}
+        for track_id, artist_id, listened_on, streamer_id, count in session.query(
+                ListeningHistory.track_id, MusicTrack.artist_id, day, ListeningHistory.streamer_id,
+                func.count())\
+                .join(MusicTrack, MusicTrack.id == ListeningHistory.track_id)\
+                .filter(MusicTrack.artist_id.in_(artist_ids))\
+                .group_by(ListeningHistory.track_id, MusicTrack.artist_id, day, ListeningHistory.streamer_id)\
+                .yield_per(10000):
+            listened_on = _as_date(listened_on)
+            days = plays.setdefault(track_id, {})
+            days[listened_on] = days.get(listened_on, 0) + count
+            artists[track_id] = artist_id
+            register, rank = listener_register(streamer_id)
+            for sketch_key in (('track', track_id, listened_on), ('artist', artist_id, listened_on)):
+                registers = sketches.setdefault(sketch_key, {})
+                registers[register] = max(rank, registers.get(register, 0))
+
+        earnings = dict(session.query(MusicTrack.id, MusicTrack.earnings).filter(MusicTrack.id.in_(track_ids)))
+        pending = sharded_counters.pending('track_earnings', track_ids) if track_ids else {}
+        rows = []
+        for track_id, days in plays.items():
+            track_cents = round((earnings.get(track_id) or 0) * 100) + pending.get(track_id, 0)
+            track_plays = sum(days.values())
+            counted = given = 0
+            for listened_on in sorted(days):
+                counted += days[listened_on]
+                # Rounded running share, so the days add up to the track's earnings
+                share = round(track_cents * counted / track_plays) - given
+                given += share
+                rows.append({'track_id': track_id, 'day': listened_on, 'artist_id': artists[track_id],
+                             'plays': days[listened_on], 'earnings_cents': share})
+        if rows:
+            session.execute(DailyPlayStats.__table__.insert(), rows)
+        sketch_rows = [{'scope': scope, 'key': key, 'day': listened_on, 'register': register, 'rank': rank}
+                       for (scope, key, listened_on), registers in sketches.items()
+                       for register, rank in registers.items()]
+        if sketch_rows:
+            session.execute(DailyListenerSketch.__table__.insert(), sketch_rows)
+        return len(rows)
+
+
+play_analytics = PlayAnalytics()
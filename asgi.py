@@ -0,0 +1,17 @@
+"""ASGI entry point: the streamer /api endpoints run on the event loop,
+every other route goes through the Flask app on a thread pool of
+WSGI_THREADS.
+
+    uvicorn asgi:application --workers 4
+    gunicorn asgi:application -k uvicorn.workers.UvicornWorker -w 4
+
+To keep the pages on the sync workers, run `gunicorn wsgi:app` as before
+and have the proxy send /api/start_ad, /api/complete_ad,
+/api/check_ad_status, /api/play_track/* and /api/user_stats to this
+server. Both read the same session cookie and database.
+"""
+from app import create_app
+from async_api import AsyncAPI, ThreadedWsgi
+
+app = create_app()
+application = AsyncAPI(app, fallback=ThreadedWsgi(app, app.config['WSGI_THREADS']))
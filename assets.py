@@ -0,0 +1,151 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+from flask import request, send_from_directory, abort
+from flask import url_for as flask_url_for
+
+try:
+    import brotli
+except ImportError:  # brotli variants are skipped without it
+    brotli = None
+
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.txt', '.html', '.map'}
+
+
+def build_assets(static_folder, output='dist', folders=('css', 'js', 'img', 'fonts')):
+    """Copy static assets to content-hashed names with .gz and .br variants.
+
+    Writes <static>/<output>/manifest.json mapping each source path
+    (``css/main.css``) to its fingerprinted path (``css/main.3f9a1c2b7d.css``).
+    Returns the manifest.
+    """
+    target_root = os.path.join(static_folder, output)
+    if os.path.isdir(target_root):
+        shutil.rmtree(target_root)
+
+    manifest = {}
+    for folder in folders:
+        source_root = os.path.join(static_folder, folder)
+        for dirpath, _, filenames in os.walk(source_root):
+            for filename in sorted(filenames):
+                source = os.path.join(dirpath, filename)
+                relative = os.path.relpath(source, static_folder).replace(os.sep, '/')
+                with open(source, 'rb') as f:
+                    content = f.read()
+
+                stem, ext = os.path.splitext(relative)
+                hashed = f'{stem}.{hashlib.sha256(content).hexdigest()[:10]}{ext}'
+                target = os.path.join(target_root, hashed)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with open(target, 'wb') as f:
+                    f.write(content)
+
+                if ext.lower() in COMPRESSIBLE:
+                    with open(target + '.gz', 'wb') as f:
+                        f.write(gzip.compress(content, compresslevel=9, mtime=0))
+                    if brotli is not None:
+                        with open(target + '.br', 'wb') as f:
+                            f.write(brotli.compress(content, quality=11))
+                manifest[relative] = hashed
+
+    os.makedirs(target_root, exist_ok=True)
+    with open(os.path.join(target_root, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+class Assets:
+    """Serves built assets with far-future caching and precompressed bodies.
+
+    Templates keep calling ``url_for('static', filename='css/main.css')``.
+    When the file is in the build manifest the URL points at its
+    fingerprinted copy under /assets/, which is served with
+    ``Cache-Control: immutable`` and as .br or .gz when the client accepts
+    it. Files that were not built get a ``?v=<hash>`` query string instead,
+    so a changed file still gets a new URL during development.
+    """
+
+    def __init__(self, app=None):
+        self.manifest = {}
+        self.versions = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ASSETS_OUTPUT', 'dist')
+        app.config.setdefault('ASSETS_MAX_AGE', 365 * 24 * 60 * 60)
+
+        self.static_folder = app.static_folder
+        self.output_folder = os.path.join(app.static_folder, app.config['ASSETS_OUTPUT'])
+        self.max_age = app.config['ASSETS_MAX_AGE']
+        self.load_manifest()
+
+        app.add_url_rule('/assets/<path:filename>', 'assets', self.serve)
+        app.jinja_env.globals['url_for'] = self.url_for
+        app.extensions['assets'] = self
+
+    def load_manifest(self):
+        path = os.path.join(self.output_folder, 'manifest.json')
+        try:
+            with open(path) as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = {}
+
+    def version(self, filename):
+        """Content hash of an unbuilt static file, cached until it changes."""
+        path = os.path.join(self.static_folder, filename)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        cached = self.versions.get(filename)
+        if cached is None or cached[0] != mtime:
+            with open(path, 'rb') as f:
+                cached = (mtime, hashlib.sha256(f.read()).hexdigest()[:10])
+            self.versions[filename] = cached
+        return cached[1]
+
+    def url_for(self, endpoint, **values):
+        if endpoint == 'static' and 'filename' in values:
+            filename = values['filename']
+            hashed = self.manifest.get(filename)
+            if hashed is not None:
+                values['filename'] = hashed
+                return flask_url_for('assets', **values)
+            version = self.version(filename)
+            if version is not None:
+                values.setdefault('v', version)
+        return flask_url_for(endpoint, **values)
+
+    def serve(self, filename):
+        if filename == 'manifest.json':
+            abort(404)
+        accepted = request.headers.get('Accept-Encoding', '')
+        encoding = None
+        for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if candidate in accepted and os.path.isfile(os.path.join(self.output_folder, filename + suffix)):
+                encoding = candidate
+                break
+
+        if encoding is None:
+            response = send_from_directory(self.output_folder, filename, max_age=self.max_age)
+        else:
+            suffix = '.br' if encoding == 'br' else '.gz'
+            # Keep the type of the original file, not of the .gz/.br
+            mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            response = send_from_directory(self.output_folder, filename + suffix,
+                                           mimetype=mimetype, max_age=self.max_age)
+            response.headers['Content-Encoding'] = encoding
+
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+assets = Assets()
@@ -0,0 +1,374 @@
+"""Async serving mode for the streamer JSON API.
+
+The /api endpoints below are short and spend their time waiting on the
+database. Under sync gunicorn workers each one holds a whole worker, so
+concurrency is capped by the worker count. AsyncAPI is an ASGI
+application that serves them on an event loop instead, with an async
+SQLAlchemy engine and connection pool, and hands every other request to
+`fallback` (usually the Flask app wrapped for ASGI; see asgi.py).
+
+It shares the Flask app's configuration, signed session cookie and
+in-process services (play guard, play sessions, settings, activity feed,
+live updates), so a client can move between the two servers freely.
+Database work goes through AsyncSession; the ORM code shared with the
+Flask views runs inside ``run_sync`` so the ledger and play sessions have
+a single implementation.
+"""
+import asyncio
+import contextlib
+import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from flask.sessions import SecureCookieSession
+from itsdangerous import BadSignature
+from sqlalchemy import func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from werkzeug.datastructures import Headers
+from werkzeug.http import dump_cookie, parse_cookie
+
+from database import db, User, MusicTrack, ListeningHistory, AdWatch
+from play_guard import play_guard
+from play_sessions import play_sessions
+from transcode import choose_rendition
+from analysis import playback_gain
+from settings import platform_settings
+from activity import activity_feed
+from live import live_updates
+from fraud import fraud_detector, referral_group
+from views.streamer import record_ad_watch, ad_result, record_play_verdict
+
+# Async drivers for the databases the sync app runs on
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'mysql': 'mysql+aiomysql',
+}
+
+UNLOCK_REQUIRED = 'Please watch an ad first to unlock music'
+
+
+def async_url(url):
+    """The async-driver form of a sync SQLAlchemy URL."""
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f'No async driver configured for {backend}; set ASYNC_DATABASE_URL')
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+class ThreadedWsgi(WsgiToAsgi):
+    """WsgiToAsgi with each request on a thread of its own pool.
+
+    Plain WsgiToAsgi runs every request on one shared thread while telling
+    the app it is multithreaded, so a single open event stream would hold
+    up every page behind it. Here up to `threads` requests run at once;
+    keep LIVE_MAX_CONNECTIONS below that so streams leave threads for pages.
+    """
+
+    def __init__(self, wsgi_application, threads):
+        super().__init__(wsgi_application)
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix='wsgi')
+
+    async def __call__(self, scope, receive, send):
+        instance = WsgiToAsgiInstance(self.wsgi_application, self.duplicate_header_limit)
+        run = WsgiToAsgiInstance.__dict__['run_wsgi_app'].func
+        instance.run_wsgi_app = sync_to_async(run.__get__(instance), thread_sensitive=False,
+                                              executor=self.executor)
+        await instance(scope, receive, send)
+
+
+class Request:
+    def __init__(self, scope, body):
+        self.scope = scope
+        self.method = scope['method']
+        self.path = scope['path']
+        self.headers = Headers([(name.decode('latin-1'), value.decode('latin-1'))
+                                for name, value in scope['headers']])
+        self.args = {name: values[0] for name, values in parse_qs(scope['query_string'].decode()).items()}
+        self.body = body
+        self.remote_addr = scope['client'][0] if scope.get('client') else None
+        self.session = None
+        self.user = None
+
+
+class AsyncAPI:
+    """ASGI app for the streamer API endpoints; everything else goes to `fallback`."""
+
+    def __init__(self, app, fallback=None):
+        app.config.setdefault('ASYNC_DATABASE_URL', None)
+        app.config.setdefault('ASYNC_POOL_SIZE', 10)
+        app.config.setdefault('ASYNC_POOL_OVERFLOW', 20)
+        app.config.setdefault('ASYNC_POOL_TIMEOUT', 30)
+
+        self.app = app
+        self.fallback = fallback
+        self.routes = [
+            ('POST', re.compile(r'/api/start_ad$'), self.start_ad),
+            ('POST', re.compile(r'/api/complete_ad$'), self.complete_ad),
+            ('GET', re.compile(r'/api/check_ad_status$'), self.check_ad_status),
+            ('POST', re.compile(r'/api/play_track/(\d+)$'), self.play_track),
+            ('GET', re.compile(r'/api/user_stats$'), self.user_stats),
+        ]
+
+        if app.config['ASYNC_DATABASE_URL']:
+            url = make_url(app.config['ASYNC_DATABASE_URL'])
+        else:
+            with app.app_context():
+                url = async_url(db.engine.url)
+        options = {}
+        if url.database not in (None, '', ':memory:'):
+            # aiosqlite would open a new connection for every checkout of a file database
+            options = {
+                'poolclass': AsyncAdaptedQueuePool,
+                'pool_size': app.config['ASYNC_POOL_SIZE'],
+                'max_overflow': app.config['ASYNC_POOL_OVERFLOW'],
+                'pool_timeout': app.config['ASYNC_POOL_TIMEOUT'],
+            }
+        self.engine = create_async_engine(url, **options)
+        # SQLite has one writer; queueing writes here is cheaper than its busy-wait
+        self.write_lock = asyncio.Lock() if url.get_backend_name() == 'sqlite' else None
+
+        interface = app.session_interface
+        self.sessions = interface
+        self.serializer = interface.get_signing_serializer(app)
+        self.session_max_age = int(app.permanent_session_lifetime.total_seconds())
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] == 'http':
+            for method, pattern, handler in self.routes:
+                match = pattern.match(scope['path'])
+                if match and scope['method'] == method:
+                    return await self.dispatch(handler, match.groups(), scope, receive, send)
+        if self.fallback is not None:
+            return await self.fallback(scope, receive, send)
+        await self.respond(send, None, 404, {'success': False, 'error': 'Not found'})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def dispatch(self, handler, args, scope, receive, send):
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+
+        request = Request(scope, body)
+        request.session = self.load_session(request.headers)
+        request.user = await self.load_user(request)
+        if request.user is None:
+            return await self.respond(send, request, 401, {'success': False, 'error': 'Login required'})
+        if request.user.user_type != 'streamer':
+            return await self.respond(send, request, 403, {'success': False, 'error': 'Unauthorized'})
+
+        result = await handler(request, *args)
+        status, payload, headers = result if len(result) == 3 else result + ({},)
+        await self.respond(send, request, status, payload, headers)
+
+    async def respond(self, send, request, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        raw = [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+        raw += [(name.lower().encode('latin-1'), str(value).encode('latin-1'))
+                for name, value in (headers or {}).items()]
+        if request is not None and request.session.modified:
+            raw.append((b'set-cookie', self.session_cookie(request.session).encode('latin-1')))
+            raw.append((b'vary', b'Cookie'))
+        await send({'type': 'http.response.start', 'status': status, 'headers': raw})
+        await send({'type': 'http.response.body', 'body': body})
+
+    # The Flask session cookie, read and written the way Flask does
+
+    def load_session(self, headers):
+        cookies = parse_cookie(headers.get('Cookie', ''))
+        value = cookies.get(self.sessions.get_cookie_name(self.app))
+        if value:
+            try:
+                return SecureCookieSession(self.serializer.loads(value, max_age=self.session_max_age))
+            except BadSignature:
+                pass
+        return SecureCookieSession()
+
+    def session_cookie(self, session):
+        app = self.app
+        return dump_cookie(
+            self.sessions.get_cookie_name(app),
+            self.serializer.dumps(dict(session)),
+            expires=self.sessions.get_expiration_time(app, session),
+            domain=self.sessions.get_cookie_domain(app),
+            path=self.sessions.get_cookie_path(app),
+            secure=self.sessions.get_cookie_secure(app),
+            httponly=self.sessions.get_cookie_httponly(app),
+            samesite=self.sessions.get_cookie_samesite(app),
+        )
+
+    async def load_user(self, request):
+        user_id = request.session.get('_user_id')
+        if not user_id:
+            return None
+        users = User.__table__
+        async with self.engine.connect() as connection:
+            result = await connection.execute(
+                select(users.c.id, users.c.username, users.c.user_type, users.c.balance, users.c.referred_by,
+                       users.c.referral_code)
+                .where(users.c.id == int(user_id)))
+            return result.first()
+
+    def writing(self):
+        """Context for a write transaction."""
+        return self.write_lock or contextlib.nullcontext()
+
+    async def setting(self, name):
+        # The settings check queries the database, so it runs off the loop
+        if time.time() - platform_settings.last_check >= platform_settings.check_seconds:
+            await asyncio.get_running_loop().run_in_executor(None, self.refresh_settings)
+        return platform_settings.values[name]
+
+    def refresh_settings(self):
+        with self.app.app_context():
+            platform_settings.refresh()
+
+    # Endpoints; each mirrors the Flask view of the same name in views/streamer.py
+
+    async def start_ad(self, request):
+        request.session['ad_start_time'] = time.time()
+        request.session['ad_completed'] = False
+        return 200, {'success': True, 'message': 'Ad started'}
+
+    async def complete_ad(self, request):
+        ad_start_time = request.session.get('ad_start_time')
+        if not ad_start_time:
+            return 400, {'success': False, 'error': 'No ad started'}
+
+        ad_duration = await self.setting('ad_duration')
+        if time.time() - ad_start_time < ad_duration:
+            return 400, {'success': False, 'error': f'Ad not completed. Please watch for {ad_duration} seconds.'}
+
+        earnings = await self.setting('ad_earnings')
+        ad_unlock_expiry = datetime.utcnow() + timedelta(minutes=await self.setting('ad_unlock_minutes'))
+        request.session['ad_unlock_expiry'] = ad_unlock_expiry.isoformat()
+        request.session['ad_completed'] = True
+
+        user = request.user
+        verdict = fraud_detector.score_ad(user.id, request.remote_addr)
+        async with self.writing(), AsyncSession(self.engine, expire_on_commit=False) as session:
+            ad_watch = await session.run_sync(record_ad_watch, user.id, earnings, verdict, user.username)
+            new_balance = (await session.execute(select(User.balance).where(User.id == user.id))).scalar()
+            await session.commit()
+        activity_feed.publish('ad', f'{user.username} watched an ad', user.id)
+        live_updates.publish(f'user:{user.id}', 'unlock', {'expires_at': ad_unlock_expiry.isoformat()})
+
+        return 200, ad_result(ad_watch, earnings, new_balance, ad_unlock_expiry)
+
+    async def check_ad_status(self, request):
+        ad_unlock_expiry = request.session.get('ad_unlock_expiry')
+        is_unlocked = False
+        minutes_left = 0
+
+        if ad_unlock_expiry:
+            try:
+                expiry_time = datetime.fromisoformat(ad_unlock_expiry)
+                if datetime.utcnow() < expiry_time:
+                    is_unlocked = True
+                    minutes_left = max(0, int((expiry_time - datetime.utcnow()).total_seconds() / 60))
+            except (ValueError, TypeError):
+                request.session.pop('ad_unlock_expiry', None)
+
+        return 200, {
+            'ad_unlocked': is_unlocked,
+            'minutes_left': minutes_left,
+            'ad_completed': request.session.get('ad_completed', False)
+        }
+
+    async def play_track(self, request, track_id):
+        track_id = int(track_id)
+        user = request.user
+
+        ad_unlock_expiry = request.session.get('ad_unlock_expiry')
+        if not ad_unlock_expiry:
+            return 403, {'success': False, 'error': UNLOCK_REQUIRED}
+        try:
+            if datetime.utcnow() >= datetime.fromisoformat(ad_unlock_expiry):
+                return 403, {'success': False, 'error': UNLOCK_REQUIRED}
+        except (ValueError, TypeError):
+            request.session.pop('ad_unlock_expiry', None)
+            return 403, {'success': False, 'error': UNLOCK_REQUIRED}
+
+        idempotency_key = request.headers.get('Idempotency-Key', '')[:64]
+        replay = play_guard.replayed(user.id, idempotency_key)
+        if replay is not None:
+            return 200, dict(replay, replayed=True)
+
+        if not play_guard.acquire(user.id, track_id):
+            return 429, {'success': False, 'error': 'This play was already recorded. Please keep listening.'}, \
+                {'Retry-After': play_guard.retry_after(user.id, track_id)}
+
+        async with self.writing(), AsyncSession(self.engine, expire_on_commit=False) as session:
+            details = await session.run_sync(self.open_play, user, track_id, request)
+        if details is None:
+            play_guard.release(user.id, track_id)
+            return 404, {'success': False, 'error': 'Track not found'}
+
+        result = dict(details,
+                      success=True,
+                      earnings=await self.setting('streamer_play_earnings'),
+                      new_balance=user.balance,
+                      heartbeat_interval=self.app.config['PLAY_HEARTBEAT_INTERVAL'])
+        play_guard.remember(user.id, idempotency_key, result)
+        return 200, result
+
+    def open_play(self, session, user, track_id, request):
+        """Open a play session for an active track, in run_sync; None when it cannot be played"""
+        track = session.get(MusicTrack, track_id)
+        if track is None or not track.is_active:
+            return None
+        verdict = fraud_detector.score_play(user.id, track.id, request.remote_addr,
+                                            referral_group(user.referred_by, user.referral_code))
+        play_token = play_sessions.start(user.id, track, session=session)
+        if verdict.action:
+            record_play_verdict(session, user, track.id, play_token, verdict)
+            session.commit()
+
+        rendition = choose_rendition(track.renditions, request.args.get('quality'), request.headers)
+        stream_file = rendition.filename if rendition else track.filename
+        return {
+            'track_url': f"{request.scope.get('root_path', '')}{self.app.static_url_path}/uploads/{stream_file}",
+            'quality': rendition.quality if rendition else 'original',
+            'gain_db': playback_gain(track.analysis, self.app.config['PLAYBACK_TARGET_LUFS'],
+                                     self.app.config['PLAYBACK_MAX_BOOST_DB']),
+            'title': track.title,
+            'artist': track.artist.username,
+            'play_token': play_token,
+            'held': verdict.action == 'hold',
+        }
+
+    async def user_stats(self, request):
+        user = request.user
+        async with self.engine.connect() as connection:
+            total_plays = (await connection.execute(
+                select(func.count()).select_from(ListeningHistory.__table__)
+                .where(ListeningHistory.__table__.c.streamer_id == user.id))).scalar()
+            ads_watched = (await connection.execute(
+                select(func.count()).select_from(AdWatch.__table__)
+                .where(AdWatch.__table__.c.streamer_id == user.id))).scalar()
+        return 200, {
+            'total_plays': total_plays,
+            'total_earnings': user.balance or 0,
+            'ads_watched': ads_watched
+        }
@@ -0,0 +1,199 @@
+"""Concurrent-connection capacity of the streamer API: sync workers vs the async mode.
+
+Seeds a throwaway SQLite database, then runs the same /api mix against
+`gunicorn wsgi:app` (sync workers) and `uvicorn asgi:application` with
+the same number of worker processes, at rising numbers of concurrent
+connections. Each virtual user holds one signed-in, ad-unlocked session
+and sends check_ad_status, user_stats and play_track requests back to
+back, one connection per request. A level passes when nothing fails and
+p99 stays under --slo-ms; the capacity is the highest level that passes.
+
+    python benchmarks/async_capacity.py
+    python benchmarks/async_capacity.py --workers 2 --levels 16,64,256,1024 --duration 20
+
+On SQLite every query is a fast local read, so the gap between the two
+modes here is smaller than with a database across the network.
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import uuid
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SERVERS = {
+    'sync': lambda workers, port: ['gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{port}',
+                                   '--backlog', '4096', '--log-level', 'warning', 'wsgi:app'],
+    'async': lambda workers, port: ['uvicorn', '--workers', str(workers), '--port', str(port),
+                                    '--backlog', '4096', '--log-level', 'warning', 'asgi:application'],
+}
+
+# (weight, method, path) with {track} filled in per request
+MIX = [
+    (0.4, 'GET', '/api/check_ad_status'),
+    (0.3, 'GET', '/api/user_stats'),
+    (0.3, 'POST', '/api/play_track/{track}'),
+]
+
+
+def seed(app, args):
+    from werkzeug.security import generate_password_hash
+    from database import db
+    from synthetic_data import generate
+
+    with app.app_context():
+        db.create_all()
+        return generate(streamers=args.streamers, artists=args.artists, tracks=args.tracks, listens=args.history,
+                        days=90, password_hash=generate_password_hash('benchmark'), seed=args.seed)
+
+
+def session_cookies(app, streamers):
+    """Signed session cookies for logged-in streamers with an active ad unlock."""
+    from database import User
+
+    serializer = app.session_interface.get_signing_serializer(app)
+    name = app.config['SESSION_COOKIE_NAME']
+    expiry = (datetime.utcnow() + timedelta(hours=6)).isoformat()
+    with app.app_context():
+        ids = [user_id for user_id, in User.query.with_entities(User.id).filter_by(user_type='streamer')
+               .order_by(User.id).limit(streamers)]
+    return [f'{name}={serializer.dumps({"_user_id": str(user_id), "_fresh": True, "ad_unlock_expiry": expiry})}'
+            for user_id in ids]
+
+
+def start_server(mode, workers, env):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    process = subprocess.Popen([sys.executable, '-m'] + SERVERS[mode](workers, port), cwd=os.getcwd(), env=env)
+    for _ in range(150):
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/login', timeout=1).close()
+            return process, port
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise SystemExit(f'{mode} server did not start')
+
+
+async def request(port, method, path, cookie, timeout):
+    """One request on its own connection; returns the status, or None on a failed connection."""
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return None
+    try:
+        writer.write((f'{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nCookie: {cookie}\r\n'
+                      f'Idempotency-Key: {uuid.uuid4().hex}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+                     .encode())
+        response = await asyncio.wait_for(reader.read(), timeout)
+        return int(response.split(b' ', 2)[1]) if response else None
+    except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+        return None
+    finally:
+        writer.close()
+
+
+async def run_level(port, cookies, concurrency, duration, timeout, tracks, seed):
+    deadline = time.perf_counter() + duration
+    samples = []  # (seconds, status)
+    weights, methods, paths = zip(*MIX)
+
+    async def virtual_user(index):
+        rng = random.Random(seed * 100003 + index)
+        cookie = cookies[index % len(cookies)]
+        while time.perf_counter() < deadline:
+            choice = rng.choices(range(len(MIX)), weights)[0]
+            path = paths[choice].format(track=rng.randint(1, tracks))
+            started = time.perf_counter()
+            status = await request(port, methods[choice], path, cookie, timeout)
+            samples.append((time.perf_counter() - started, status))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(virtual_user(i) for i in range(concurrency)))
+    return samples, time.perf_counter() - started
+
+
+def percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def summarize(samples, wall_time):
+    latencies = sorted(seconds for seconds, _ in samples)
+    # 404 (inactive track) and 429 (repeat play) are correct answers; failures are errors and timeouts
+    failed = sum(1 for _, status in samples if status is None or status >= 500)
+    return {
+        'requests': len(samples),
+        'failed': failed,
+        'rps': len(samples) / wall_time,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--streamers', type=int, default=2000)
+    parser.add_argument('--artists', type=int, default=100)
+    parser.add_argument('--tracks', type=int, default=2000)
+    parser.add_argument('--history', type=int, default=100000, help='listening history rows')
+    parser.add_argument('--workers', type=int, default=4, help='processes for both servers')
+    parser.add_argument('--levels', default='8,32,128,512', help='concurrent connections to try')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per level')
+    parser.add_argument('--timeout', type=float, default=10, help='seconds before a request counts as failed')
+    parser.add_argument('--slo-ms', type=float, default=1000, help='p99 a level must stay under to pass')
+    parser.add_argument('--modes', default='sync,async')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    levels = [int(level) for level in args.levels.split(',')]
+
+    workdir = tempfile.mkdtemp(prefix='async-capacity-')
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(workdir, "bench.db")}'
+    os.chdir(workdir)  # keep logs and part files out of the source tree
+
+    from app import create_app
+    app = create_app()
+    started = time.time()
+    counts = seed(app, args)
+    print(f'Seeded {", ".join(f"{n} {table}" for table, n in counts.items())} in {time.time() - started:.1f}s')
+    cookies = session_cookies(app, args.streamers)
+
+    capacity = {}
+    try:
+        for mode in args.modes.split(','):
+            server, port = start_server(mode, args.workers, dict(os.environ, PYTHONPATH=ROOT))
+            print(f'\n{mode}: {args.workers} workers')
+            print(f'{"connections":>12} {"requests":>9} {"failed":>7} {"req/s":>8} {"p50 ms":>9} {"p99 ms":>9}')
+            try:
+                for level in levels:
+                    samples, wall_time = asyncio.run(run_level(port, cookies, level, args.duration, args.timeout,
+                                                               args.tracks, args.seed))
+                    row = summarize(samples, wall_time)
+                    passed = row['failed'] == 0 and row['p99_ms'] <= args.slo_ms
+                    if passed:
+                        capacity[mode] = level
+                    print(f'{level:12d} {row["requests"]:9d} {row["failed"]:7d} {row["rps"]:8.1f} '
+                          f'{row["p50_ms"]:9.1f} {row["p99_ms"]:9.1f}{"" if passed else "  over SLO"}')
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f'\nCapacity (no failures, p99 <= {args.slo_ms:.0f} ms):')
+    for mode in args.modes.split(','):
+        print(f'  {mode:6} {capacity.get(mode, 0)} concurrent connections')
+
+
+if __name__ == '__main__':
+    main()
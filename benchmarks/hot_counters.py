@@ -0,0 +1,154 @@
+"""Contention benchmark: credits for one hot track, hot row vs sharded counters.
+
+Starts N worker processes that all credit plays of the same track as
+fast as they can, each credit its own transaction. In `row` mode every
+credit adds to the track's plays and earnings and the artist's balance
+in place, as credit_play does with COUNTER_SHARDS = 0. In `sharded`
+mode it goes through counters.ShardedCounters with --shards shards. Both also insert the listening
+history row. After each run the shards are compacted and the track's
+plays are checked against the number of committed credits.
+
+    python benchmarks/hot_counters.py
+    python benchmarks/hot_counters.py --workers 1,2,4,8,16 --hold-ms 2
+    DATABASE_URL=postgresql://... python benchmarks/hot_counters.py
+
+--hold-ms keeps each transaction open a little longer after its
+writes, like a round trip to a database across the network. SQLite
+locks the whole database for every write, so there throughput stays flat
+in both modes. The difference shows on a database with row locks.
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def seed(app):
+    from database import db, User, MusicTrack
+
+    with app.app_context():
+        db.create_all()
+        artist = User(username='hot_artist', email='hot_artist@example.com', password='x', user_type='artist')
+        streamer = User(username='hot_streamer', email='hot_streamer@example.com', password='x',
+                        user_type='streamer')
+        db.session.add_all([artist, streamer])
+        db.session.flush()
+        track = MusicTrack(title='Hot track', artist_id=artist.id, filename='hot.mp3', plays=0, earnings=0.0)
+        db.session.add(track)
+        db.session.commit()
+        return track.id, artist.id, streamer.id
+
+
+def worker(mode, ids, deadline, hold, shards, results):
+    from sqlalchemy.exc import OperationalError
+    from app import create_app
+    from database import db, User, MusicTrack, ListeningHistory
+    from counters import sharded_counters
+
+    track_id, artist_id, streamer_id = ids
+    app = create_app({'COUNTER_SHARDS': shards})
+    tracks, users = MusicTrack.__table__, User.__table__
+    latencies, errors = [], 0
+    with app.app_context():
+        while time.time() < deadline:
+            started = time.perf_counter()
+            try:
+                if mode == 'row':
+                    db.session.execute(tracks.update().where(tracks.c.id == track_id)
+                                       .values(plays=tracks.c.plays + 1, earnings=tracks.c.earnings + 0.01))
+                    db.session.execute(users.update().where(users.c.id == artist_id)
+                                       .values(balance=users.c.balance + 0.01))
+                else:
+                    sharded_counters.add('track_plays', track_id, 1)
+                    sharded_counters.add('track_earnings', track_id, 1)
+                    sharded_counters.add('balance', artist_id, 1)
+                db.session.execute(ListeningHistory.__table__.insert().values(
+                    streamer_id=streamer_id, track_id=track_id, earnings=0.01, listened_at=datetime.utcnow()))
+                if hold:
+                    time.sleep(hold)
+                db.session.commit()
+                latencies.append(time.perf_counter() - started)
+            except OperationalError:
+                db.session.rollback()
+                errors += 1
+    results.put((latencies, errors))
+
+
+def percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+def run(mode, workers, ids, args):
+    from database import db, MusicTrack
+    from counters import sharded_counters
+
+    deadline = time.time() + args.warmup + args.duration
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=worker, args=(mode, ids, deadline, args.hold_ms / 1000,
+                                                                      args.shards, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    samples = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    latencies = sorted(latency for worker_latencies, _ in samples for latency in worker_latencies)
+    committed = len(latencies)
+    sharded_counters.compact()
+    plays = db.session.query(MusicTrack.plays).filter(MusicTrack.id == ids[0]).scalar()
+    return {
+        'committed': committed,
+        # Workers start at different times; count the whole window
+        'rate': committed / (args.warmup + args.duration),
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'errors': sum(errors for _, errors in samples),
+        'plays': plays,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', default='1,2,4,8', help='worker process counts to try')
+    parser.add_argument('--modes', default='row,sharded')
+    parser.add_argument('--duration', type=float, default=5, help='seconds per run')
+    parser.add_argument('--warmup', type=float, default=1, help='seconds for workers to start')
+    parser.add_argument('--hold-ms', type=float, default=0, help='extra time each transaction stays open')
+    parser.add_argument('--shards', type=int, default=8)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='hot-counters-')
+    os.environ.setdefault('DATABASE_URL', f'sqlite:///{os.path.join(workdir, "bench.db")}')
+    os.chdir(workdir)  # keep logs and index files out of the source tree
+
+    from app import create_app
+    from database import db, MusicTrack, ListeningHistory
+
+    try:
+        app = create_app({'COUNTER_SHARDS': args.shards})
+        ids = seed(app)
+        print(f'{"mode":>8} {"workers":>8} {"credits":>8} {"credits/s":>10} {"p50 ms":>8} {"p99 ms":>8} '
+              f'{"errors":>7} {"plays ok":>9}')
+        for mode in args.modes.split(','):
+            for workers in [int(n) for n in args.workers.split(',')]:
+                with app.app_context():
+                    before = db.session.query(MusicTrack.plays).filter(MusicTrack.id == ids[0]).scalar()
+                    row = run(mode, workers, ids, args)
+                    history = ListeningHistory.query.count()
+                print(f'{mode:>8} {workers:8d} {row["committed"]:8d} {row["rate"]:10.1f} {row["p50_ms"]:8.2f} '
+                      f'{row["p99_ms"]:8.2f} {row["errors"]:7d} '
+                      f'{"yes" if row["plays"] - before == row["committed"] and row["plays"] == history else "NO":>9}')
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,328 @@
+"""Load test for the core streamer, artist and admin journeys.
+
+Seeds a throwaway SQLite database with synthetic_data, then runs concurrent virtual users
+against the app through the WSGI test client (default) or a local
+gunicorn. Prints p50/p95/p99 latency and throughput per endpoint and
+writes them to JSON so runs from different commits can be compared.
+
+    python benchmarks/load_test.py --streamers 2000 --tracks 5000 --requests 5000
+    python benchmarks/load_test.py --mode gunicorn --workers 4 --concurrency 16
+    python benchmarks/load_test.py --compare benchmarks/results/load-abc1234.json
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PASSWORD = 'benchmark'
+
+
+def zipf_index(count, rng):
+    """1-based index with frequency roughly 1/rank."""
+    return max(1, int(count ** rng.random()))
+
+
+def seed(app, args):
+    from werkzeug.security import generate_password_hash
+    from database import db
+    from charts import charts
+    from synthetic_data import generate
+
+    with app.app_context():
+        db.create_all()
+        # Hashing is deliberately slow, so every account shares one hash
+        return generate(streamers=args.streamers, artists=args.artists, tracks=args.tracks, listens=args.history,
+                        days=90, password_hash=generate_password_hash(PASSWORD), seed=args.seed, charts=charts)
+
+
+class TestClientSession:
+    """One virtual user on the in-process WSGI test client."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None, json_body=None, headers=None):
+        response = self.client.open(path, method=method, data=data, json=json_body, headers=headers)
+        return response.status_code, response.get_data()
+
+    def backdate_ad(self, seconds):
+        with self.client.session_transaction() as session:
+            session['ad_start_time'] = time.time() - seconds
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpSession:
+    """One virtual user talking HTTP to a running server."""
+
+    def __init__(self, app, base_url):
+        self.app = app
+        self.base_url = base_url
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect)
+
+    def request(self, method, path, data=None, json_body=None, headers=None):
+        headers = dict(headers or {})
+        body = None
+        if json_body is not None:
+            body = json.dumps(json_body).encode()
+            headers['Content-Type'] = 'application/json'
+        elif data is not None:
+            body = urllib.parse.urlencode(data).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        req = urllib.request.Request(self.base_url + path, data=body, method=method, headers=headers)
+        try:
+            with self.opener.open(req, timeout=60) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as error:
+            return error.code, error.read()
+
+    def backdate_ad(self, seconds):
+        # Re-sign the session cookie the way the app would
+        serializer = self.app.session_interface.get_signing_serializer(self.app)
+        for cookie in self.cookies:
+            if cookie.name == self.app.config['SESSION_COOKIE_NAME']:
+                session = serializer.loads(cookie.value)
+                session['ad_start_time'] = time.time() - seconds
+                cookie.value = serializer.dumps(session)
+
+
+class Recorder:
+    def __init__(self, limit, deadline):
+        self.lock = threading.Lock()
+        self.samples = {}  # name -> [(seconds, status)]
+        self.count = 0
+        self.limit = limit
+        self.deadline = deadline
+
+    def done(self):
+        return self.count >= self.limit or (self.deadline and time.time() >= self.deadline)
+
+    def call(self, session, name, method, path, **kwargs):
+        started = time.perf_counter()
+        status, body = session.request(method, path, **kwargs)
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.samples.setdefault(name, []).append((elapsed, status))
+            self.count += 1
+        return status, body
+
+
+def login(recorder, session, email):
+    recorder.call(session, 'POST /login', 'POST', '/login', data={'email': email, 'password': PASSWORD})
+
+
+def streamer_journey(recorder, session, rng, scale):
+    login(recorder, session, f'streamer{rng.randint(1, scale["streamers"])}@example.test')
+    recorder.call(session, 'GET /dashboard', 'GET', '/dashboard')
+    recorder.call(session, 'POST /api/start_ad', 'POST', '/api/start_ad')
+    session.backdate_ad(31)  # the ad itself lasts 30 seconds
+    recorder.call(session, 'POST /api/complete_ad', 'POST', '/api/complete_ad')
+    for _ in range(rng.randint(3, 8)):
+        if recorder.done():
+            break
+        status, body = recorder.call(session, 'POST /api/play_track', 'POST',
+                                     f'/api/play_track/{zipf_index(scale["tracks"], rng)}',
+                                     headers={'Idempotency-Key': uuid.uuid4().hex})
+        if status == 200:
+            token = json.loads(body).get('play_token')
+            recorder.call(session, 'POST /api/play/heartbeat', 'POST', '/api/play/heartbeat',
+                          json_body={'t': token, 'p': 10})
+    recorder.call(session, 'GET /api/user_stats', 'GET', '/api/user_stats')
+
+
+def artist_journey(recorder, session, rng, scale):
+    login(recorder, session, f'artist{rng.randint(1, scale["artists"])}@example.test')
+    recorder.call(session, 'GET /artist/dashboard', 'GET', '/artist/dashboard')
+    recorder.call(session, 'GET /upload', 'GET', '/upload')
+    recorder.call(session, 'GET /referral', 'GET', '/referral')
+
+
+def admin_journey(recorder, session, rng, scale):
+    login(recorder, session, 'admin1@example.test')
+    recorder.call(session, 'GET /admin', 'GET', '/admin')
+    report = rng.choice(['overview', 'earnings', 'users', 'music'])
+    recorder.call(session, f'GET /admin/reports/data?type={report}', 'GET',
+                  f'/admin/reports/data?type={report}&period={rng.choice(["7d", "30d", "90d"])}')
+    export = rng.choice(['users', 'tracks', 'earnings', 'withdrawals'])
+    recorder.call(session, f'GET /admin/export/{export}', 'GET', f'/admin/export/{export}')
+
+
+JOURNEYS = [(streamer_journey, 0.8), (artist_journey, 0.15), (admin_journey, 0.05)]
+
+
+def percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def summarize(samples, wall_time):
+    def stats(rows):
+        latencies = sorted(seconds for seconds, _ in rows)
+        return {
+            'requests': len(rows),
+            'errors': sum(1 for _, status in rows if status >= 500),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2),
+            'statuses': {str(s): sum(1 for _, status in rows if status == s) for s in sorted({s for _, s in rows})},
+        }
+
+    everything = [row for rows in samples.values() for row in rows]
+    total = stats(everything)
+    total['duration_s'] = round(wall_time, 2)
+    total['throughput_rps'] = round(len(everything) / wall_time, 1)
+    return total, {name: stats(rows) for name, rows in sorted(samples.items())}
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', False
+
+
+def start_gunicorn(workers, env):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{port}',
+                                '--log-level', 'warning', 'wsgi:app'], cwd=os.getcwd(), env=env)
+    base_url = f'http://127.0.0.1:{port}'
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(base_url + '/login', timeout=1).close()
+            return process, base_url
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise SystemExit('gunicorn did not start')
+
+
+def print_table(total, endpoints, baseline=None):
+    print(f'{"endpoint":42} {"n":>6} {"err":>4} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9}')
+    rows = list(endpoints.items()) + [('TOTAL', total)]
+    for name, row in rows:
+        line = f'{name[:42]:42} {row["requests"]:6d} {row["errors"]:4d}'
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            line += f' {row[key]:9.1f}'
+        if baseline is not None:
+            before = baseline['total'] if name == 'TOTAL' else baseline['endpoints'].get(name)
+            if before and before['p95_ms']:
+                line += f'  p95 {(row["p95_ms"] / before["p95_ms"] - 1) * 100:+.0f}%'
+        print(line)
+    print(f'{total["throughput_rps"]} req/s over {total["duration_s"]}s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--streamers', type=int, default=1000)
+    parser.add_argument('--artists', type=int, default=100)
+    parser.add_argument('--tracks', type=int, default=2000)
+    parser.add_argument('--history', type=int, default=100000, help='listening history rows')
+    parser.add_argument('--requests', type=int, default=2000, help='stop after this many requests')
+    parser.add_argument('--duration', type=float, default=None, help='or after this many seconds')
+    parser.add_argument('--concurrency', type=int, default=8, help='virtual users running at once')
+    parser.add_argument('--mode', choices=['testclient', 'gunicorn'], default='testclient')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='results file (default benchmarks/results/load-<commit>.json)')
+    parser.add_argument('--compare', help='earlier results file to compare p95 against')
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    workdir = tempfile.mkdtemp(prefix='load-test-')
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(workdir, "bench.db")}'
+    os.chdir(workdir)  # keep part files and logs out of the source tree
+
+    from app import create_app
+    app = create_app()
+
+    started = time.time()
+    counts = seed(app, args)
+    print(f'Seeded {", ".join(f"{n} {table}" for table, n in counts.items())} in {time.time() - started:.1f}s')
+
+    server = None
+    if args.mode == 'gunicorn':
+        server, base_url = start_gunicorn(args.workers, dict(os.environ, PYTHONPATH=ROOT))
+        make_session = lambda: HttpSession(app, base_url)
+    else:
+        make_session = lambda: TestClientSession(app)
+
+    scale = {'streamers': args.streamers, 'artists': args.artists, 'tracks': args.tracks}
+    recorder = Recorder(args.requests, time.time() + args.duration if args.duration else None)
+    journeys, weights = zip(*JOURNEYS)
+
+    def virtual_user(index):
+        user_rng = random.Random(args.seed * 1000 + index)
+        while not recorder.done():
+            journey = user_rng.choices(journeys, weights)[0]
+            journey(recorder, make_session(), user_rng, scale)
+
+    threads = [threading.Thread(target=virtual_user, args=(i,)) for i in range(args.concurrency)]
+    started = time.time()
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        wall_time = time.time() - started
+        if server is not None:
+            server.terminate()
+            server.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    total, endpoints = summarize(recorder.samples, wall_time)
+    commit, dirty = git_commit()
+    results = {
+        'meta': {
+            'commit': commit, 'dirty': dirty, 'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'mode': args.mode, 'workers': args.workers if args.mode == 'gunicorn' else None,
+            'concurrency': args.concurrency, 'seed': args.seed,
+            'scale': dict(scale, history=args.history), 'python': platform.python_version(),
+        },
+        'total': total,
+        'endpoints': endpoints,
+    }
+
+    print_table(total, endpoints, baseline)
+
+    output = output or os.path.join(ROOT, 'benchmarks', 'results', f'load-{commit}{"-dirty" if dirty else ""}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'Results written to {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""Offline evaluation and timing for the co-occurrence recommender.
+
+Holds out each streamer's last few distinct tracks, builds neighbors from
+the rest, and checks how many held-out tracks appear in the top K.
+A popularity ranking is reported alongside as the baseline to beat.
+
+    python benchmarks/recommendations_eval.py --streamers 20000 --tracks 50000
+    python benchmarks/recommendations_eval.py --db instance/music_platform.db
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import LRUCache
+from recommendations import compute_neighbors, pack_neighbors, rank_candidates, unpack_neighbors
+
+
+def synthetic_history(streamers, tracks, clusters, listens, rng):
+    """Listening sessions where each streamer favours one or two taste clusters."""
+    per_cluster = tracks // clusters
+    history = {}
+    for streamer in range(1, streamers + 1):
+        tastes = rng.sample(range(clusters), rng.choice((1, 1, 2)))
+        plays = []
+        for _ in range(max(5, int(rng.expovariate(1 / listens)))):
+            if rng.random() < 0.15:
+                track = rng.randint(1, tracks)  # exploration outside the usual taste
+            else:
+                cluster = rng.choice(tastes)
+                rank = int(per_cluster ** rng.random())  # Zipf-like inside the cluster
+                track = cluster * per_cluster + rank
+            plays.append(track)
+        history[streamer] = plays
+    return history
+
+
+def history_from_db(path):
+    conn = sqlite3.connect(path)
+    history = {}
+    rows = conn.execute('SELECT streamer_id, track_id FROM listening_history '
+                        'WHERE track_id IS NOT NULL ORDER BY listened_at')
+    for streamer_id, track_id in rows:
+        history.setdefault(streamer_id, []).append(track_id)
+    return history
+
+
+def split(history, holdout):
+    train, test = {}, {}
+    for streamer, plays in history.items():
+        distinct = list(dict.fromkeys(reversed(plays)))  # most recent first
+        if len(distinct) <= holdout:
+            train[streamer] = plays
+            continue
+        held = set(distinct[:holdout])
+        test[streamer] = held
+        train[streamer] = [track for track in plays if track not in held]
+    return train, test
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--streamers', type=int, default=20000)
+    parser.add_argument('--tracks', type=int, default=50000)
+    parser.add_argument('--clusters', type=int, default=200)
+    parser.add_argument('--listens', type=int, default=40, help='mean listens per streamer')
+    parser.add_argument('--db', help='evaluate on listening_history from this SQLite file instead')
+    parser.add_argument('--holdout', type=int, default=3)
+    parser.add_argument('--k', type=int, default=20)
+    parser.add_argument('--top-n', type=int, default=50)
+    parser.add_argument('--history-size', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if args.db:
+        history = history_from_db(args.db)
+    else:
+        history = synthetic_history(args.streamers, args.tracks, args.clusters, args.listens, rng)
+    train, test = split(history, args.holdout)
+    print(f'{len(history)} streamers, {sum(len(p) for p in history.values())} listens, '
+          f'{len(test)} evaluated with {args.holdout} held-out tracks each')
+
+    streamer_ids, track_ids = [], []
+    for streamer, plays in train.items():
+        for track in set(plays):
+            streamer_ids.append(streamer)
+            track_ids.append(track)
+
+    started = time.perf_counter()
+    neighbors = compute_neighbors(streamer_ids, track_ids, top_n=args.top_n)
+    build_seconds = time.perf_counter() - started
+
+    # Round-trip through the packed format the web workers read
+    packed = {track: pack_neighbors(*entry) for track, entry in neighbors.items()}
+    table_bytes = sum(len(ids) + len(scores) for ids, scores in packed.values())
+
+    class Row:
+        def __init__(self, blobs):
+            self.neighbor_ids, self.scores = blobs
+
+    popularity = [track for track, _ in Counter(track_ids).most_common(args.k + args.history_size)]
+
+    hits = baseline_hits = 0
+    timings = []
+    cache = LRUCache(max_entries=len(test))
+    for streamer, held in test.items():
+        recent = list(dict.fromkeys(reversed(train[streamer])))[:args.history_size]
+        started = time.perf_counter()
+        rows = {track: unpack_neighbors(Row(packed[track])) for track in recent if track in packed}
+        ranked = rank_candidates(recent, rows, limit=args.k)
+        timings.append((time.perf_counter() - started) * 1000)
+        cache.set(streamer, ranked)
+
+        hits += len(held & {track for track, _ in ranked})
+        heard = set(recent)
+        baseline = [track for track in popularity if track not in heard][:args.k]
+        baseline_hits += len(held & set(baseline))
+
+    started = time.perf_counter()
+    for streamer in test:
+        cache.get(streamer)
+    cached_us = (time.perf_counter() - started) / max(1, len(test)) * 1e6
+
+    total = len(test) * args.holdout
+    print(f'build: {build_seconds:.2f}s for {len(neighbors)} tracks, '
+          f'neighbor table {table_bytes / 1e6:.1f} MB')
+    print(f'recall@{args.k}: {hits / total:.3f}   popularity baseline: {baseline_hits / total:.3f}')
+    print(f'uncached request: mean {statistics.mean(timings):.3f} ms  '
+          f'p50 {percentile(timings, 50):.3f} ms  p95 {percentile(timings, 95):.3f} ms  '
+          f'p99 {percentile(timings, 99):.3f} ms')
+    print(f'cached request: {cached_us:.2f} us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""Query latency benchmark for the track search index.
+
+Builds a throwaway SQLite database with a synthetic catalog, then times
+search_tracks() for a mix of one- and two-word prefix queries.
+
+    python benchmarks/search_benchmark.py --tracks 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import text
+
+from database import db, User, MusicTrack
+from search import search_tracks, create_search_index, rebuild_search_index
+
+GENRES = ['pop', 'rock', 'hip-hop', 'rnb', 'jazz', 'electronic', 'country', 'classical', 'afrobeat', 'gospel']
+SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'ne', 'so', 'tu', 'vi', 'zan', 'dor', 'bel', 'fin', 'gra', 'hol', 'jen', 'mor']
+
+
+def make_vocabulary(size, rng):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def zipf_word(vocabulary, rng):
+    # Rank-frequency roughly 1/r, like real titles
+    index = int(len(vocabulary) ** rng.random()) - 1
+    return vocabulary[index]
+
+
+def seed(app, tracks, artists, rng, vocabulary):
+    with app.app_context():
+        db.create_all()
+        conn = db.session.connection()
+        # Load without the per-row trigger and index everything in one pass at the end
+        conn.execute(text('DROP TRIGGER IF EXISTS track_search_ai'))
+        conn.execute(User.__table__.insert(), [{
+            'id': i, 'username': f'artist_{zipf_word(vocabulary, rng)}_{i}', 'email': f'a{i}@bench.local',
+            'password': 'x', 'user_type': 'artist', 'referral_code': f'B{i:08d}', 'balance': 0.0,
+            'is_active': True, 'is_banned': False
+        } for i in range(1, artists + 1)])
+
+        batch = []
+        for i in range(1, tracks + 1):
+            title = ' '.join(zipf_word(vocabulary, rng) for _ in range(rng.randint(1, 4)))
+            description = ' '.join(zipf_word(vocabulary, rng) for _ in range(rng.randint(0, 12)))
+            batch.append({'id': i, 'title': title, 'artist_id': rng.randint(1, artists), 'filename': f'{i}.mp3',
+                          'duration': rng.randint(90, 420), 'plays': 0, 'earnings': 0.0,
+                          'genre': rng.choice(GENRES), 'description': description, 'is_active': True})
+            if len(batch) == 50000:
+                conn.execute(MusicTrack.__table__.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(MusicTrack.__table__.insert(), batch)
+
+        rebuild_search_index(conn)
+        # Put the trigger back so the schema matches production
+        create_search_index(conn)
+        db.session.commit()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tracks', type=int, default=1000000)
+    parser.add_argument('--artists', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--vocabulary', type=int, default=20000)
+    parser.add_argument('--db', help='SQLite file to use (default: a temporary file)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(args.vocabulary, rng)
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'search_bench.db')
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    db.init_app(app)
+
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        started = time.perf_counter()
+        seed(app, args.tracks, args.artists, rng, vocabulary)
+        print(f'seeded {args.tracks} tracks in {time.perf_counter() - started:.1f}s ({path})')
+
+    queries = []
+    for _ in range(args.queries):
+        words = [zipf_word(vocabulary, rng) for _ in range(1 if rng.random() < 0.7 else 2)]
+        # Cut the last word to exercise prefix matching
+        words[-1] = words[-1][:max(2, len(words[-1]) - rng.randint(0, 3))]
+        queries.append(' '.join(words))
+
+    with app.app_context():
+        search_tracks(queries[0])  # warm the page cache
+        timings = []
+        hits = []
+        for query in queries:
+            started = time.perf_counter()
+            result = search_tracks(query, page=rng.randint(1, 3))
+            timings.append((time.perf_counter() - started) * 1000)
+            hits.append(result['total'])
+
+    print(f'{len(queries)} queries over {args.tracks} tracks')
+    print(f'  mean {statistics.mean(timings):8.2f} ms   median hits {int(statistics.median(hits))}')
+    for pct in (50, 95, 99):
+        print(f'  p{pct:<3} {percentile(timings, pct):8.2f} ms')
+    print(f'  max  {max(timings):8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
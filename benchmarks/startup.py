@@ -0,0 +1,101 @@
+"""Cold-start benchmark: how long a fresh worker takes to get a WSGI app.
+
+Each run is a new interpreter in an empty directory with its own SQLite
+file, timing the import plus app creation the way gunicorn does it. Pass
+--ref to time an older commit too (checked out into a temporary git
+worktree), and --modules to list the slowest imports of this tree.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --ref HEAD~1 --runs 10 --modules 15
+"""
+import argparse
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Trees from before the app factory build the app when app.py is imported
+LOAD_APP = '''
+import os, sys, time
+sys.path.insert(0, sys.argv[1])
+started = time.perf_counter()
+if os.path.exists(os.path.join(sys.argv[1], 'wsgi.py')):
+    from wsgi import app
+else:
+    from app import app
+print(time.perf_counter() - started)
+'''
+
+
+def time_startup(tree, runs):
+    samples = []
+    for _ in range(runs):
+        workdir = tempfile.mkdtemp(prefix='startup-')
+        try:
+            env = dict(os.environ, DATABASE_URL=f'sqlite:///{os.path.join(workdir, "startup.db")}')
+            output = subprocess.run([sys.executable, '-c', LOAD_APP, tree], cwd=workdir, env=env,
+                                    capture_output=True, text=True, check=True).stdout
+            samples.append(float(output.strip().splitlines()[-1]))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return samples
+
+
+def slowest_imports(tree, count):
+    """(cumulative microseconds, module) for the slowest top-level imports."""
+    workdir = tempfile.mkdtemp(prefix='startup-')
+    try:
+        env = dict(os.environ, DATABASE_URL=f'sqlite:///{os.path.join(workdir, "startup.db")}')
+        stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', LOAD_APP, tree], cwd=workdir, env=env,
+                                capture_output=True, text=True, check=True).stderr
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    rows = []
+    for line in stderr.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)', line)
+        # Modules imported by app.py/wsgi.py themselves, and what those import
+        if match and 2 <= len(match.group(2)) <= 6 and match.group(3) not in ('app', 'wsgi'):
+            rows.append((int(match.group(1)), match.group(3)))
+    return sorted(rows, reverse=True)[:count]
+
+
+def describe(label, samples):
+    print(f'{label:<12} median {statistics.median(samples) * 1000:7.0f} ms   '
+          f'min {min(samples) * 1000:7.0f} ms   max {max(samples) * 1000:7.0f} ms   ({len(samples)} runs)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--ref', help='git revision to compare against, e.g. HEAD~1')
+    parser.add_argument('--modules', type=int, default=0, help='show the N slowest imports')
+    args = parser.parse_args()
+
+    current = time_startup(ROOT, args.runs)
+    describe('working tree', current)
+
+    if args.ref:
+        worktree = tempfile.mkdtemp(prefix='startup-ref-')
+        try:
+            subprocess.run(['git', 'worktree', 'add', '--detach', worktree, args.ref], cwd=ROOT,
+                           capture_output=True, check=True)
+            baseline = time_startup(worktree, args.runs)
+        finally:
+            subprocess.run(['git', 'worktree', 'remove', '--force', worktree], cwd=ROOT, capture_output=True)
+            shutil.rmtree(worktree, ignore_errors=True)
+        describe(args.ref, baseline)
+        print(f'speedup      {statistics.median(baseline) / statistics.median(current):.1f}x')
+
+    if args.modules:
+        print()
+        for micros, module in slowest_imports(ROOT, args.modules):
+            print(f'{micros / 1000:8.1f} ms  {module}')
+
+
+if __name__ == '__main__':
+    main()
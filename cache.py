@@ -0,0 +1,205 @@
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from flask import request
+from markupsafe import Markup
+
+
+class LRUCache:
+    """Thread-safe in-process cache with LRU eviction and an optional TTL."""
+
+    def __init__(self, max_entries=1024, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.time():
+                del self.entries[key]
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl if ttl is not None else self.ttl
+        expires_at = time.time() + ttl if ttl else None
+        with self.lock:
+            self.entries[key] = (expires_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class SQLiteCache:
+    """Cache shared by every worker on the host through a SQLite file."""
+
+    def __init__(self, path, ttl=None):
+        self.path = path
+        self.ttl = ttl
+        self.local = threading.local()
+        self.writes = 0
+
+    def connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS cache ('
+                         'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)')
+            self.local.conn = conn
+        return conn
+
+    def get(self, key, default=None):
+        try:
+            row = self.connection().execute(
+                'SELECT value, expires_at FROM cache WHERE key = ?', (key,)).fetchone()
+        except sqlite3.Error:
+            return default
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return default
+        return pickle.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl if ttl is not None else self.ttl
+        expires_at = time.time() + ttl if ttl else None
+        try:
+            conn = self.connection()
+            conn.execute('INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)',
+                         (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires_at))
+            self.writes += 1
+            if self.writes % 500 == 0:
+                conn.execute('DELETE FROM cache WHERE expires_at < ?', (time.time(),))
+        except sqlite3.Error:
+            pass
+
+    def delete(self, key):
+        try:
+            self.connection().execute('DELETE FROM cache WHERE key = ?', (key,))
+        except sqlite3.Error:
+            pass
+
+    def clear(self):
+        try:
+            self.connection().execute('DELETE FROM cache')
+        except sqlite3.Error:
+            pass
+
+
+class FragmentCache:
+    """Caches rendered template fragments and other derived data.
+
+    Every entry is tied to one or more namespaces such as ``catalog`` or
+    ``artist:12``. Each namespace has a version token that is part of the
+    cache key, so ``invalidate('catalog')`` makes every entry built from the
+    catalog unreachable at once without scanning the backend.
+
+    CACHE_BACKEND picks the store for entries: ``lru`` keeps them in each
+    worker, ``sqlite`` shares them between workers through
+    CACHE_SQLITE_PATH. The version tokens are always kept in that SQLite
+    file, so an invalidation or ``clear()`` in one worker reaches every
+    worker on the host; hosts behind a load balancer need their own way
+    to hear about changes or a short CACHE_DEFAULT_TTL.
+
+    It also adds ETags to JSON GET responses under CACHE_ETAG_PREFIXES and
+    answers matching If-None-Match requests with 304 Not Modified.
+    """
+
+    def __init__(self, app=None):
+        self.backend = LRUCache()
+        self.versions = self.backend
+        self.default_ttl = 300
+        self.etag_prefixes = ('/api/',)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_BACKEND', 'lru')
+        app.config.setdefault('CACHE_MAX_ENTRIES', 5000)
+        app.config.setdefault('CACHE_SQLITE_PATH', 'fragment_cache.db')
+        app.config.setdefault('CACHE_DEFAULT_TTL', 300)
+        app.config.setdefault('CACHE_ETAG_PREFIXES', ('/api/',))
+
+        self.default_ttl = app.config['CACHE_DEFAULT_TTL']
+        self.versions = SQLiteCache(app.config['CACHE_SQLITE_PATH'])
+        if app.config['CACHE_BACKEND'] == 'sqlite':
+            self.backend = self.versions
+            self.backend.ttl = self.default_ttl
+        else:
+            self.backend = LRUCache(app.config['CACHE_MAX_ENTRIES'], self.default_ttl)
+        self.etag_prefixes = tuple(app.config['CACHE_ETAG_PREFIXES'])
+        app.after_request(self.conditional_response)
+        app.extensions['fragment_cache'] = self
+
+    def version(self, namespace):
+        key = f'version:{namespace}'
+        token = self.versions.get(key)
+        if token is None:
+            # A version lost with the file gets a fresh token, never an old one
+            token = uuid.uuid4().hex[:12]
+            self.versions.set(key, token, ttl=0)
+        return token
+
+    def invalidate(self, *namespaces):
+        for namespace in namespaces:
+            self.versions.set(f'version:{namespace}', uuid.uuid4().hex[:12], ttl=0)
+
+    def make_key(self, name, namespaces):
+        # '*' is in every key, so clear() reaches the entries of every worker
+        versions = ','.join(f'{ns}={self.version(ns)}' for ns in ('*', *namespaces))
+        return f'{name}|{versions}'
+
+    def cached(self, name, namespaces, loader, ttl=None):
+        """Return the cached value for `name`, building it with `loader` on a miss."""
+        key = self.make_key(name, namespaces)
+        value = self.backend.get(key)
+        if value is None:
+            value = loader()
+            self.backend.set(key, value, ttl=ttl)
+        return value
+
+    def fragment(self, name, namespaces, render, ttl=None):
+        """Cached HTML from `render()`, safe to output in a template."""
+        return Markup(self.cached(name, namespaces, lambda: str(render()), ttl=ttl))
+
+    def clear(self):
+        self.backend.clear()
+        self.invalidate('*')
+
+    def conditional_response(self, response):
+        if (request.method == 'GET' and response.status_code == 200
+                and response.mimetype == 'application/json'
+                and request.path.startswith(self.etag_prefixes)):
+            response.add_etag()
+            response.headers.setdefault('Cache-Control', 'private, no-cache')
+            response.make_conditional(request)
+        return response
+
+
+fragment_cache = FragmentCache()
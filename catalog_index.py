@@ -0,0 +1,296 @@
+import fcntl
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from database import db, MusicTrack, User
+from counters import sharded_counters
+
+MAGIC = b'CATIDX01'
+HEADER = struct.Struct('=8sIQd')  # magic, tracks, string table bytes, built at
+ACTIVE = 1
+STRINGS = 3  # title, artist name, genre
+
+
+def _columns(count):
+    """(name, array typecode, length) of every column, in file order."""
+    return [
+        ('ids', 'q', count),
+        ('artist_ids', 'q', count),
+        ('plays', 'q', count),
+        ('durations', 'i', count),
+        ('by_plays', 'i', count),  # positions, most played first
+        ('offsets', 'I', count * STRINGS + 1),
+        ('flags', 'B', count),
+    ]
+
+
+def _padding(size):
+    return -size % 8
+
+
+def write_index(path, rows, built_at=None):
+    """Write rows of (id, artist_id, plays, duration, is_active, title, artist_name, genre)
+    sorted by id to `path`, replacing any previous index atomically.
+
+    Columns are written in native byte order; the file is only meant to be
+    read on the host that built it.
+    """
+    columns = {name: array(code) for name, code, _ in _columns(0)}
+    strings = bytearray()
+    columns['offsets'].append(0)
+    for track_id, artist_id, plays, duration, is_active, title, artist_name, genre in rows:
+        columns['ids'].append(track_id)
+        columns['artist_ids'].append(artist_id)
+        columns['plays'].append(plays or 0)
+        columns['durations'].append(duration or 0)
+        columns['flags'].append(ACTIVE if is_active else 0)
+        for value in (title, artist_name, genre):
+            strings += (value or '').encode()
+            columns['offsets'].append(len(strings))
+    plays = columns['plays']
+    columns['by_plays'].extend(sorted(range(len(plays)), key=lambda i: -plays[i]))
+
+    partial = f'{path}.{os.getpid()}.partial'
+    with open(partial, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(plays), len(strings), built_at or time.time()))
+        f.write(bytes(_padding(HEADER.size)))
+        for name, _, _ in _columns(0):
+            data = columns[name].tobytes()
+            f.write(data)
+            f.write(bytes(_padding(len(data))))
+        f.write(strings)
+        f.flush()
+        os.fsync(f.fileno())
+    # Readers keep the file they mapped; new snapshots see the new one
+    os.replace(partial, path)
+
+
+class CatalogEntry:
+    """One track as read from the index."""
+
+    __slots__ = ('id', 'artist_id', 'plays', 'duration', 'is_active', 'title', 'artist_name', 'genre')
+
+    def __init__(self, **values):
+        for name, value in values.items():
+            setattr(self, name, value)
+
+
+class CatalogSnapshot:
+    """A read-only mapping of one index file.
+
+    The columns are memoryviews over the mapping, so every worker that maps
+    the same file shares its pages and nothing is copied until an entry is
+    read.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.stat = os.fstat(f.fileno())
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, string_bytes, self.built_at = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a catalog index')
+
+        view = memoryview(self.map)
+        offset = HEADER.size + _padding(HEADER.size)
+        for name, code, length in _columns(count):
+            size = length * struct.calcsize(code)
+            setattr(self, name, view[offset:offset + size].cast(code))
+            offset += size + _padding(size)
+        self.strings = view[offset:offset + string_bytes]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def string(self, position, field):
+        index = position * STRINGS + field
+        return str(self.strings[self.offsets[index]:self.offsets[index + 1]], 'utf-8')
+
+    def entry(self, position):
+        return CatalogEntry(
+            id=self.ids[position],
+            artist_id=self.artist_ids[position],
+            plays=self.plays[position],
+            duration=self.durations[position],
+            is_active=bool(self.flags[position] & ACTIVE),
+            title=self.string(position, 0),
+            artist_name=self.string(position, 1),
+            genre=self.string(position, 2) or None,
+        )
+
+    def get(self, track_id):
+        position = bisect_left(self.ids, track_id)
+        if position < len(self.ids) and self.ids[position] == track_id:
+            return self.entry(position)
+        return None
+
+    def active(self):
+        """Active tracks in id order"""
+        return [self.entry(position) for position in range(len(self.ids)) if self.flags[position] & ACTIVE]
+
+    def top(self, limit, artist_id=None):
+        """Most played active tracks, optionally for one artist"""
+        top = []
+        for position in self.by_plays:
+            if not self.flags[position] & ACTIVE:
+                continue
+            if artist_id is not None and self.artist_ids[position] != artist_id:
+                continue
+            top.append(self.entry(position))
+            if len(top) == limit:
+                break
+        return top
+
+
+class CatalogIndex:
+    """Columnar catalog of every track, shared by all workers on a host.
+
+    Track ids, artist ids, play counts, durations and flags are stored as
+    fixed-width columns, with titles, artist names and genres in a string
+    table, in one file at CATALOG_INDEX_PATH. Workers map it read-only
+    instead of each querying and holding the catalog.
+
+    Builds never run inside a request once there is an index to serve. A
+    worker that changes the catalog calls rebuild(), which starts a build
+    in a background thread, and an index older than CATALOG_INDEX_MAX_AGE
+    is rebuilt the same way by whichever worker notices first; requests
+    keep reading the old file meanwhile. A build writes a new file under
+    an exclusive file lock, so one worker builds at a time, and renames it
+    over the old one. Other workers notice the new file within
+    CATALOG_INDEX_CHECK_SECONDS. With CATALOG_INDEX_IN_PROCESS off, only
+    `flask build-catalog-index` (e.g. from cron) builds; run it at deploy
+    so the first request does not have to.
+    """
+
+    def __init__(self, app=None):
+        self.lock = threading.Lock()
+        self.thread_lock = threading.Lock()
+        self.thread = None
+        self.wanted = None  # None, or whether the next background build follows a catalog change
+        self.app = None
+        self.current = None
+        self.checked_at = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CATALOG_INDEX_PATH', 'catalog.idx')
+        app.config.setdefault('CATALOG_INDEX_MAX_AGE', 60)
+        app.config.setdefault('CATALOG_INDEX_CHECK_SECONDS', 1)
+        app.config.setdefault('CATALOG_INDEX_IN_PROCESS', True)
+
+        self.app = app
+        self.path = app.config['CATALOG_INDEX_PATH']
+        self.max_age = app.config['CATALOG_INDEX_MAX_AGE']
+        self.check_seconds = app.config['CATALOG_INDEX_CHECK_SECONDS']
+        self.in_process = app.config['CATALOG_INDEX_IN_PROCESS']
+        self.current = None
+        self.checked_at = 0
+        app.extensions['catalog_index'] = self
+
+    def snapshot(self):
+        """The current index; maps a newer file and starts rebuilding a stale one."""
+        current = self.current
+        if current is not None and time.time() - self.checked_at < self.check_seconds:
+            return current
+
+        with self.lock:
+            now = time.time()
+            if self.current is not None and now - self.checked_at < self.check_seconds:
+                return self.current
+            # Other threads keep the current snapshot while this one checks
+            self.checked_at = now
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                stat = None
+            if stat is not None and (self.current is None or not self.same_file(self.current.stat, stat)):
+                self.current = CatalogSnapshot(self.path)
+            if self.current is None:
+                # Nothing to serve yet
+                self.build(wait=True)
+            elif now - self.current.built_at > self.max_age:
+                self.start_build(changed=False)
+            return self.current
+
+    def rebuild(self):
+        """Rebuild after a change to the catalog; call after committing it. Does not wait."""
+        self.start_build(changed=True)
+
+    def start_build(self, changed):
+        """Build in this worker's background thread, starting it if needed."""
+        if not self.in_process:
+            return
+        with self.thread_lock:
+            self.wanted = bool(self.wanted) or changed
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='catalog-index', daemon=True)
+                self.thread.start()
+
+    def run(self):
+        with self.app.app_context():
+            try:
+                while True:
+                    with self.thread_lock:
+                        changed, self.wanted = self.wanted, None
+                        if changed is None:
+                            self.thread = None
+                            return
+                    try:
+                        # A build already running elsewhere may have started before the change
+                        if changed:
+                            self.build(wait=True)
+                        else:
+                            self.build(wait=False, older_than=time.time() - self.max_age)
+                    except Exception:
+                        db.session.rollback()
+                        self.app.logger.exception('Catalog index build failed')
+            finally:
+                db.session.remove()
+
+    def build(self, wait, older_than=None):
+        """Write a new index under the build lock and map it.
+
+        Without `wait`, gives up when another worker is already building.
+        With `older_than`, skips the build when the file on disk was
+        written since.
+        """
+        with open(f'{self.path}.lock', 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+            except BlockingIOError:
+                return False
+            try:
+                if older_than is not None:
+                    latest = CatalogSnapshot(self.path)
+                    if latest.built_at > older_than:
+                        self.current = latest
+                        return False
+                built_at = time.time()
+                # Include plays that are still in counter shards
+                pending = sharded_counters.pending('track_plays')
+                rows = db.session.query(MusicTrack.id, MusicTrack.artist_id, MusicTrack.plays,
+                                        MusicTrack.duration, MusicTrack.is_active, MusicTrack.title,
+                                        User.username, MusicTrack.genre)\
+                    .join(User, User.id == MusicTrack.artist_id)\
+                    .order_by(MusicTrack.id)\
+                    .yield_per(10000)
+                if pending:
+                    rows = ((row[0], row[1], (row[2] or 0) + pending.get(row[0], 0)) + tuple(row[3:]) for row in rows)
+                write_index(self.path, rows, built_at)
+                self.current = CatalogSnapshot(self.path)
+                return True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def same_file(a, b):
+        return (a.st_ino, a.st_mtime_ns, a.st_size) == (b.st_ino, b.st_mtime_ns, b.st_size)
+
+
+catalog_index = CatalogIndex()
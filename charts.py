@@ -0,0 +1,232 @@
+import math
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import datetime
+
+from database import db, MusicTrack, TrackChartScore, ChartEpoch, upsert
+
+
+class TopK:
+    """Scores for every key plus the highest `capacity` of them kept sorted.
+
+    Scores only ever go up (see Charts), so a key outside the top list can
+    only enter it when it is updated. That keeps updates O(K) and reads a
+    plain slice.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.scores = {}
+        self.ranked = []  # (-score, key), best first
+        self.members = set()
+
+    def add(self, key, amount):
+        self.set(key, self.scores.get(key, 0.0) + amount)
+
+    def set(self, key, score):
+        old = self.scores.get(key)
+        if old is not None and score <= old:
+            return
+        self.scores[key] = score
+        if key in self.members:
+            del self.ranked[bisect_left(self.ranked, (-old, key))]
+            insort(self.ranked, (-score, key))
+        elif len(self.ranked) < self.capacity:
+            insort(self.ranked, (-score, key))
+            self.members.add(key)
+        elif score > -self.ranked[-1][0]:
+            insort(self.ranked, (-score, key))
+            self.members.add(key)
+            _, dropped = self.ranked.pop()
+            self.members.discard(dropped)
+
+    def top(self, limit):
+        return [(key, -score) for score, key in self.ranked[:limit]]
+
+
+class Charts:
+    """Trending charts from exponentially time-decayed play counts.
+
+    Every play adds exp(lambda * (t - epoch)) to its track, artist and genre
+    ("forward decay"). Stored scores are never decayed; dividing by
+    exp(lambda * (now - epoch)) at read time gives the decayed score, and the
+    ordering is the same at any moment. Because stored scores only grow, the
+    database rollup can be incremented atomically from any worker.
+
+    Track scores are persisted in TrackChartScore. Artist and genre charts
+    are sums over their tracks and are rebuilt from the track rollups on
+    startup. Each worker refreshes rows changed by other workers every
+    CHARTS_REFRESH_SECONDS.
+
+    Weights double every half-life, so the epoch has to move forward
+    before they overflow a float after about 1000 half-lives. The epoch
+    is shared through the ChartEpoch row: a play more than
+    CHARTS_RESCALE_HALF_LIVES after it moves the epoch to the play time and
+    scales every stored score down in the same transaction, and
+    `flask charts-rescale` does the same on demand. Plays read the epoch
+    under a shared row lock, so none is weighted against a stale one, and
+    workers drop their in-memory charts when they see it change.
+    """
+
+    def __init__(self, app=None):
+        self.lock = threading.RLock()
+        self.loaded = False
+        self.last_refresh = None
+        self.tracks = None
+        self.epoch = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CHARTS_HALF_LIFE_HOURS', 72)
+        # Scores grow by 2x per half-life from this date until the first rescale
+        app.config.setdefault('CHARTS_EPOCH', datetime(2025, 1, 1))
+        app.config.setdefault('CHARTS_RESCALE_HALF_LIVES', 64)
+        app.config.setdefault('CHARTS_TOP_K', 100)
+        app.config.setdefault('CHARTS_REFRESH_SECONDS', 60)
+
+        self.decay_rate = math.log(2) / (app.config['CHARTS_HALF_LIFE_HOURS'] * 3600)
+        self.initial_epoch = app.config['CHARTS_EPOCH']
+        self.epoch = self.initial_epoch
+        self.rescale_seconds = app.config['CHARTS_RESCALE_HALF_LIVES'] * math.log(2) / self.decay_rate
+        self.capacity = app.config['CHARTS_TOP_K']
+        self.refresh_seconds = app.config['CHARTS_REFRESH_SECONDS']
+        self.reset()
+        app.extensions['charts'] = self
+
+    def reset(self):
+        with self.lock:
+            self.tracks = TopK(self.capacity)
+            self.artists = TopK(self.capacity)
+            self.genres = TopK(self.capacity)
+            self.tracks_by_genre = {}
+            self.tracks_by_artist = {}
+            self.loaded = False
+
+    def weight(self, when, epoch=None):
+        """Forward-decayed weight of one play at `when`."""
+        return math.exp(self.decay_rate * (when - (epoch or self.epoch)).total_seconds())
+
+    def decayed(self, score, now=None):
+        """Convert a stored score to the play count it is worth right now."""
+        return score / self.weight(now or datetime.utcnow())
+
+    def _apply(self, track_id, artist_id, genre, amount):
+        self.tracks.add(track_id, amount)
+        self.artists.add(artist_id, amount)
+        genre = genre or ''
+        self.genres.add(genre, amount)
+        if genre not in self.tracks_by_genre:
+            self.tracks_by_genre[genre] = TopK(self.capacity)
+        self.tracks_by_genre[genre].add(track_id, amount)
+        if artist_id not in self.tracks_by_artist:
+            self.tracks_by_artist[artist_id] = TopK(self.capacity)
+        self.tracks_by_artist[artist_id].add(track_id, amount)
+
+    def current_epoch(self, lock=False):
+        """The shared epoch; `lock` holds it for the rest of the transaction so no rescale runs meanwhile."""
+        query = db.session.query(ChartEpoch.epoch).filter_by(id=1)
+        epoch = query.with_for_update(read=True).scalar() if lock else query.scalar()
+        if epoch is None and lock:
+            # The first play creates the row, so there is one to lock
+            table = ChartEpoch.__table__
+            db.session.execute(upsert(db.session, table).values(id=1, epoch=self.initial_epoch)
+                               .on_conflict_do_nothing(index_elements=[table.c.id]))
+            epoch = query.with_for_update(read=True).scalar()
+        return epoch or self.initial_epoch
+
+    def _use_epoch(self, epoch):
+        """Start this worker's charts over when another worker moved the epoch."""
+        with self.lock:
+            if epoch != self.epoch:
+                self.epoch = epoch
+                self.reset()
+
+    def record_play(self, track, when=None):
+        """Count a credited play. Runs inside the caller's transaction."""
+        when = when or datetime.utcnow()
+        epoch = self.current_epoch(lock=True)
+        if (when - epoch).total_seconds() > self.rescale_seconds:
+            epoch = self._rescale(when)
+        self._use_epoch(epoch)
+        amount = self.weight(when, epoch)
+        table = TrackChartScore.__table__
+        statement = upsert(db.session, table).values(track_id=track.id, score=amount, updated_at=datetime.utcnow())
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.track_id],
+            set_={'score': table.c.score + amount, 'updated_at': statement.excluded.updated_at}
+        ))
+        with self.lock:
+            if self.loaded:
+                self._apply(track.id, track.artist_id, track.genre, amount)
+
+    def _load_rows(self, since=None):
+        query = db.session.query(TrackChartScore.track_id, TrackChartScore.score,
+                                 MusicTrack.artist_id, MusicTrack.genre)\
+            .join(MusicTrack, MusicTrack.id == TrackChartScore.track_id)
+        if since is not None:
+            query = query.filter(TrackChartScore.updated_at >= since)
+        for track_id, score, artist_id, genre in query.yield_per(10000):
+            # Only the part this worker has not counted yet is added
+            delta = score - self.tracks.scores.get(track_id, 0.0)
+            if delta > 0:
+                self._apply(track_id, artist_id, genre, delta)
+
+    def ensure_loaded(self):
+        """Build the charts from the rollups, then keep them fresh."""
+        now = time.time()
+        if self.loaded and now - self.last_refresh < self.refresh_seconds:
+            return
+        self._use_epoch(self.current_epoch())
+        with self.lock:
+            if not self.loaded:
+                self._load_rows()
+                self.loaded = True
+            else:
+                # Small overlap so rows committed during the last refresh are not missed
+                self._load_rows(since=datetime.utcfromtimestamp(self.last_refresh - 5))
+            self.last_refresh = now
+
+    def _top(self, chart, limit):
+        self.ensure_loaded()
+        with self.lock:
+            return [(key, self.decayed(score)) for key, score in chart.top(limit)]
+
+    def top_tracks(self, limit=20, genre=None, artist_id=None):
+        self.ensure_loaded()
+        if genre is not None:
+            chart = self.tracks_by_genre.get(genre)
+        elif artist_id is not None:
+            chart = self.tracks_by_artist.get(artist_id)
+        else:
+            chart = self.tracks
+        if chart is None:
+            return []
+        return self._top(chart, limit)
+
+    def top_artists(self, limit=20):
+        return self._top(self.artists, limit)
+
+    def top_genres(self, limit=20):
+        return self._top(self.genres, limit)
+
+    def rescale(self, new_epoch=None):
+        """Move the shared epoch forward, by default to now, so stored scores stay small. Commits."""
+        epoch = self._rescale(new_epoch or datetime.utcnow())
+        db.session.commit()
+        self._use_epoch(epoch)
+        return epoch
+
+    def _rescale(self, new_epoch):
+        # Waits for plays holding the epoch, and makes later ones wait for this
+        old_epoch = db.session.query(ChartEpoch.epoch).filter_by(id=1).with_for_update().scalar() \
+            or self.initial_epoch
+        factor = math.exp(-self.decay_rate * (new_epoch - old_epoch).total_seconds())
+        table = TrackChartScore.__table__
+        db.session.execute(table.update().values(score=table.c.score * factor))
+        db.session.merge(ChartEpoch(id=1, epoch=new_epoch))
+        return new_epoch
+
+
+charts = Charts()
@@ -0,0 +1,267 @@
+import hashlib
+import os
+import shutil
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from database import db, User, MusicTrack, UploadSession, UploadChunk, upsert
+from settings import platform_settings
+
+
+class UploadError(Exception):
+    """A rejected upload request; `status` is the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def verify_checksum(data, checksum):
+    """Check `data` against a 'sha256=<hex>' or 'crc32=<hex>' checksum."""
+    algorithm, _, expected = (checksum or '').partition('=')
+    expected = expected.strip().lower()
+    if algorithm == 'sha256':
+        actual = hashlib.sha256(data).hexdigest()
+    elif algorithm == 'crc32':
+        actual = f'{zlib.crc32(data) & 0xffffffff:08x}'
+    else:
+        raise UploadError('Chunk checksum missing or unsupported; send sha256=<hex> or crc32=<hex>')
+    if actual != expected.zfill(len(actual)):
+        raise UploadError('Chunk checksum mismatch', 422)
+    return f'{algorithm}={actual}'
+
+
+class ChunkedUploads:
+    """Resumable uploads sent as fixed-size, individually checksummed chunks.
+
+    ``create`` preallocates a part file of the final size. Chunks can then
+    arrive in any order and from parallel requests; each is verified and
+    written at its own offset, and recorded in UploadChunk. A client that
+    lost its connection asks ``status`` which chunks are still missing.
+    ``complete`` moves the finished file into UPLOAD_FOLDER.
+
+    A request holds at most one chunk in memory. Sessions idle for longer
+    than UPLOAD_SESSION_TTL are removed by ``sweep``, which also runs now
+    and then when new uploads are created.
+
+    Preallocated space is only handed out within limits: an artist may
+    have UPLOAD_MAX_OPEN_SESSIONS uploads open at once, and all open
+    uploads together may reserve UPLOAD_MAX_RESERVED_BYTES.
+    """
+
+    def __init__(self, app=None):
+        self.last_sweep = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('UPLOAD_CHUNK_SIZE', 4 * 1024 * 1024)
+        app.config.setdefault('UPLOAD_MAX_SIZE', 500 * 1024 * 1024)
+        app.config.setdefault('UPLOAD_PARTS_FOLDER', 'upload_parts')
+        app.config.setdefault('UPLOAD_SESSION_TTL', 24 * 60 * 60)
+        app.config.setdefault('UPLOAD_MAX_OPEN_SESSIONS', 3)
+        app.config.setdefault('UPLOAD_MAX_RESERVED_BYTES', 4 * 1024 * 1024 * 1024)
+
+        self.chunk_size = app.config['UPLOAD_CHUNK_SIZE']
+        self.max_size = app.config['UPLOAD_MAX_SIZE']
+        self.parts_folder = app.config['UPLOAD_PARTS_FOLDER']
+        self.upload_folder = app.config['UPLOAD_FOLDER']
+        self.ttl = app.config['UPLOAD_SESSION_TTL']
+        self.max_open_sessions = app.config['UPLOAD_MAX_OPEN_SESSIONS']
+        self.max_reserved_bytes = app.config['UPLOAD_MAX_RESERVED_BYTES']
+        os.makedirs(self.parts_folder, exist_ok=True)
+        app.extensions['chunked_uploads'] = self
+
+    def part_path(self, upload_id):
+        return os.path.join(self.parts_folder, f'{upload_id}.part')
+
+    def create(self, artist_id, filename, size, title, genre='', description=''):
+        if size <= 0:
+            raise UploadError('File is empty')
+        if size > self.max_size:
+            raise UploadError(f'File is larger than {self.max_size // (1024 * 1024)}MB', 413)
+
+        if time.time() - self.last_sweep > 600:
+            self.sweep()
+
+        upload = UploadSession(
+            id=uuid.uuid4().hex,
+            artist_id=artist_id,
+            filename=filename,
+            title=title,
+            genre=genre,
+            description=description,
+            size=size,
+            chunk_size=self.chunk_size,
+            chunk_count=(size + self.chunk_size - 1) // self.chunk_size,
+        )
+        # Counted after the insert so parallel creates are checked one at a
+        # time: Postgres locks the artist's row, SQLite holds the write lock
+        db.session.query(User.id).filter_by(id=artist_id).with_for_update().one()
+        db.session.add(upload)
+        db.session.flush()
+        open_sessions = UploadSession.query.filter_by(artist_id=artist_id).count()
+        reserved = db.session.query(func.sum(UploadSession.size)).scalar()
+        if open_sessions > self.max_open_sessions:
+            db.session.rollback()
+            raise UploadError(f'At most {self.max_open_sessions} uploads can be in progress; '
+                              'finish or cancel one first', 429)
+        if reserved > self.max_reserved_bytes:
+            db.session.rollback()
+            raise UploadError('Not enough upload space right now; try again later', 507)
+        db.session.commit()
+
+        # Reserve the space up front so chunks can be written at any offset
+        with open(self.part_path(upload.id), 'wb') as f:
+            if hasattr(os, 'posix_fallocate'):
+                try:
+                    os.posix_fallocate(f.fileno(), 0, size)
+                except OSError:
+                    f.truncate(size)
+            else:
+                f.truncate(size)
+        return upload
+
+    def get(self, upload_id, artist_id):
+        upload = UploadSession.query.get(upload_id)
+        if upload is None or upload.artist_id != artist_id:
+            raise UploadError('Upload not found', 404)
+        return upload
+
+    def received(self, upload):
+        return sorted(index for (index,) in db.session.query(UploadChunk.chunk_index)
+                      .filter(UploadChunk.session_id == upload.id))
+
+    def status(self, upload):
+        return {
+            'upload_id': upload.id,
+            'size': upload.size,
+            'chunk_size': upload.chunk_size,
+            'chunk_count': upload.chunk_count,
+            'received': self.received(upload),
+        }
+
+    def write_chunk(self, upload, index, data, checksum):
+        if not 0 <= index < upload.chunk_count:
+            raise UploadError('Chunk index out of range')
+        offset = index * upload.chunk_size
+        expected = min(upload.chunk_size, upload.size - offset)
+        if len(data) != expected:
+            raise UploadError(f'Chunk {index} must be {expected} bytes, got {len(data)}')
+        checksum = verify_checksum(data, checksum)
+
+        try:
+            fd = os.open(self.part_path(upload.id), os.O_WRONLY)
+        except FileNotFoundError:
+            raise UploadError('Upload not found', 404)  # finalized, aborted or swept meanwhile
+        try:
+            written = 0
+            while written < len(data):
+                written += os.pwrite(fd, data[written:], offset + written)
+        finally:
+            os.close(fd)
+
+        # The session row goes first, so a chunk is never recorded for a removed session
+        now = datetime.utcnow()
+        touched = db.session.execute(UploadSession.__table__.update()
+                                     .where(UploadSession.__table__.c.id == upload.id)
+                                     .values(updated_at=now)).rowcount
+        if not touched:
+            db.session.rollback()
+            raise UploadError('Upload not found', 404)
+
+        # A chunk sent twice (a retry after a lost response) just overwrites
+        table = UploadChunk.__table__
+        statement = upsert(db.session, table).values(session_id=upload.id, chunk_index=index,
+                                               checksum=checksum, received_at=now)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.session_id, table.c.chunk_index],
+            set_={'checksum': statement.excluded.checksum, 'received_at': now}
+        ))
+        db.session.commit()
+
+    def complete(self, upload):
+        """Move a fully received upload into UPLOAD_FOLDER and return the new filename.
+
+        The upload's rows are deleted in the session, to be committed with
+        the track that uses the file. If that fails, `restore` moves the
+        file back so the upload can be finalized again.
+        """
+        missing = upload.chunk_count - len(self.received(upload))
+        if missing:
+            raise UploadError(f'{missing} chunks are still missing', 409)
+        # Tracks may have been added since the upload was created
+        max_tracks = platform_settings['max_tracks_per_artist']
+        if MusicTrack.query.filter_by(artist_id=upload.artist_id).count() >= max_tracks:
+            raise UploadError(f'You have reached the maximum limit of {max_tracks} tracks')
+
+        unique_filename = f'{uuid.uuid4()}_{upload.filename}'
+        try:
+            self._move(self.part_path(upload.id), os.path.join(self.upload_folder, unique_filename))
+        except FileNotFoundError:
+            raise UploadError('Upload is already being finalized', 409)
+        self._delete(upload)
+        return unique_filename
+
+    def restore(self, upload_id, filename):
+        """Undo `complete` after the caller rolled back without adding the track."""
+        if db.session.query(UploadSession.id).filter_by(id=upload_id).scalar() is None:
+            return  # the track was committed after all
+        self._move(os.path.join(self.upload_folder, filename), self.part_path(upload_id))
+
+    def abort(self, upload):
+        self._delete(upload)
+        db.session.commit()
+        self._remove_part(upload.id)
+
+    def _delete(self, upload):
+        UploadChunk.query.filter_by(session_id=upload.id).delete(synchronize_session=False)
+        db.session.delete(upload)
+
+    def _move(self, source, target):
+        try:
+            os.replace(source, target)
+        except FileNotFoundError:
+            raise
+        except OSError:
+            # Parts folder on another filesystem
+            shutil.move(source, target)
+
+    def _remove_part(self, upload_id):
+        try:
+            os.remove(self.part_path(upload_id))
+        except FileNotFoundError:
+            pass
+
+    def sweep(self, max_age=None):
+        """Delete sessions idle for longer than `max_age` seconds and their part files."""
+        self.last_sweep = time.time()
+        max_age = max_age if max_age is not None else self.ttl
+        cutoff = datetime.utcnow() - timedelta(seconds=max_age)
+        stale = [upload_id for (upload_id,) in db.session.query(UploadSession.id)
+                 .filter(UploadSession.updated_at < cutoff)]
+        if stale:
+            UploadChunk.query.filter(UploadChunk.session_id.in_(stale)).delete(synchronize_session=False)
+            UploadSession.query.filter(UploadSession.id.in_(stale)).delete(synchronize_session=False)
+            db.session.commit()
+            for upload_id in stale:
+                self._remove_part(upload_id)
+
+        # Part files whose session row is gone (e.g. a crash between steps)
+        known = {upload_id for (upload_id,) in db.session.query(UploadSession.id)}
+        removed_orphans = 0
+        for name in os.listdir(self.parts_folder):
+            upload_id, ext = os.path.splitext(name)
+            path = os.path.join(self.parts_folder, name)
+            if ext == '.part' and upload_id not in known and os.path.getmtime(path) < self.last_sweep - max_age:
+                self._remove_part(upload_id)
+                removed_orphans += 1
+        return len(stale) + removed_orphans
+
+
+chunked_uploads = ChunkedUploads()
@@ -0,0 +1,360 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from werkzeug.security import generate_password_hash
+
+from database import db, User, MusicTrack, FraudFlag
+from charts import charts
+from recommendations import recommender, rebuild_neighbor_table
+from cache import fragment_cache
+from catalog_index import catalog_index
+from assets import assets, build_assets
+from transcode import transcode_track, find_encoder
+from analysis import analyze_track
+from chunked_upload import chunked_uploads
+from play_sessions import play_sessions
+from counters import sharded_counters
+import maintenance
+import ledger
+import fraud
+from analytics import play_analytics
+
+@click.command('sweep-uploads')
+@with_appcontext
+@click.option('--max-age', default=None, type=int, help='Seconds of inactivity before a session is removed.')
+def sweep_uploads_command(max_age):
+    """Remove abandoned chunked uploads and their part files."""
+    click.echo(f'Removed {chunked_uploads.sweep(max_age)} abandoned uploads')
+
+@click.command('build-recommendations')
+@with_appcontext
+@click.option('--top-n', default=50, help='Neighbors kept per track.')
+@click.option('--days', default=None, type=int, help='Only use listens from the last N days.')
+def build_recommendations_command(top_n, days):
+    """Rebuild the track neighbor table from listening history."""
+    since = datetime.utcnow() - timedelta(days=days) if days else None
+    started = time.time()
+    count = rebuild_neighbor_table(top_n=top_n, since=since)
+    recommender.cache.clear()
+    click.echo(f'Built neighbors for {count} tracks in {time.time() - started:.1f}s')
+
+@click.command('analyze-tracks')
+@with_appcontext
+@click.option('--all', 'reanalyze', is_flag=True, help='Also analyze tracks that already have a waveform.')
+def analyze_tracks_command(reanalyze):
+    """Compute waveforms and loudness for tracks that do not have them yet."""
+    query = MusicTrack.query
+    if not reanalyze:
+        query = query.filter(~MusicTrack.analysis.has())
+    track_ids = [track_id for (track_id,) in query.with_entities(MusicTrack.id)]
+    analyzed = 0
+    with click.progressbar(track_ids, label='Analyzing') as bar:
+        for track_id in bar:
+            if analyze_track(MusicTrack.query.get(track_id), current_app.config['UPLOAD_FOLDER'],
+                             current_app.config['WAVEFORM_POINTS']):
+                analyzed += 1
+    click.echo(f'Analyzed {analyzed} of {len(track_ids)} tracks')
+
+@click.command('transcode-tracks')
+@with_appcontext
+@click.option('--all', 'retry_all', is_flag=True, help='Also fill in missing rungs for tracks that have some renditions.')
+def transcode_tracks_command(retry_all):
+    """Build streaming renditions for tracks that do not have them yet."""
+    if find_encoder() is None:
+        raise click.ClickException('ffmpeg was not found on PATH')
+    query = MusicTrack.query
+    if not retry_all:
+        query = query.filter(~MusicTrack.renditions.any())
+    track_ids = [track_id for (track_id,) in query.with_entities(MusicTrack.id)]
+    created = 0
+    with click.progressbar(track_ids, label='Transcoding') as bar:
+        for track_id in bar:
+            created += len(transcode_track(MusicTrack.query.get(track_id), current_app.config['UPLOAD_FOLDER']))
+    click.echo(f'Created {created} renditions for {len(track_ids)} tracks')
+
+@click.command('build-assets')
+@with_appcontext
+def build_assets_command():
+    """Fingerprint and precompress static css/js for production."""
+    manifest = build_assets(current_app.static_folder)
+    assets.load_manifest()
+    click.echo(f'Built {len(manifest)} assets into static/dist')
+
+@click.command('build-catalog-index')
+@with_appcontext
+def build_catalog_index_command():
+    """Rebuild the shared catalog index file now, waiting for any build in progress."""
+    started = time.time()
+    catalog_index.build(wait=True)
+    click.echo(f'Indexed {len(catalog_index.current)} tracks into {catalog_index.path} in {time.time() - started:.1f}s')
+
+@click.command('seed-data')
+@with_appcontext
+@click.option('--streamers', default=10000, help='Streamer accounts to create.')
+@click.option('--artists', default=500, help='Artist accounts to create.')
+@click.option('--tracks', default=20000, help='Tracks to create.')
+@click.option('--listens', default=1000000, help='Listening history rows to create.')
+@click.option('--days', default=365, help='Spread the history over this many days.')
+@click.option('--admins', default=1, help='Admin accounts to create.')
+@click.option('--password', default='password', help='Password for every generated account.')
+@click.option('--seed', default=None, type=int, help='Random seed, for repeatable data.')
+@click.option('--force', is_flag=True, help='Add to a database that already has users.')
+def seed_data_command(streamers, artists, tracks, listens, days, admins, password, seed, force):
+    """Fill the database with synthetic users, tracks and activity for scale testing."""
+    from synthetic_data import generate as generate_synthetic_data
+    
+    db.create_all()
+    if User.query.first() is not None and not force:
+        raise click.ClickException('Database already has users; pass --force to add to it')
+    started = time.time()
+    counts = generate_synthetic_data(streamers=streamers, artists=artists, tracks=tracks, listens=listens,
+                                     days=days, admins=admins, password_hash=generate_password_hash(password),
+                                     seed=seed, charts=charts, progress=click.echo)
+    fragment_cache.clear()
+    recommender.cache.clear()
+    for table, count in counts.items():
+        click.echo(f'{table}: {count} rows')
+    click.echo(f'Generated in {time.time() - started:.1f}s')
+
+
+def require_sqlite():
+    if maintenance.database_path() is None:
+        raise click.ClickException('This command needs a file-backed SQLite database')
+
+def progress_bar(label):
+    """A progress(done, total) callback that draws a bar once the total is known."""
+    state = {}
+    
+    def report(done, total):
+        if 'bar' not in state:
+            state['bar'] = click.progressbar(length=total, label=label)
+        bar = state['bar']
+        bar.update(done - bar.pos)
+        if done >= total:
+            bar.render_finish()
+    return report
+
+@click.command('backup-db')
+@with_appcontext
+@click.argument('target', required=False)
+@click.option('--pages', default=1024,
+              help='Pages copied per step in rollback-journal mode; a WAL database is copied in one step.')
+@click.option('--pause', default=maintenance.PAUSE, help='Seconds to wait between steps.')
+def backup_db_command(target, pages, pause):
+    """Copy the live database with SQLite's online backup API.
+    
+    A busy database must be in WAL mode: otherwise writes between steps
+    restart the copy.
+    """
+    require_sqlite()
+    if target is None:
+        os.makedirs('backups', exist_ok=True)
+        target = os.path.join('backups', f'music_platform-{datetime.utcnow():%Y%m%d-%H%M%S}.db')
+    started = time.time()
+    copied = maintenance.backup(target, pages=pages, pause=pause, progress=progress_bar('Backing up'))
+    click.echo(f'Copied {copied} pages to {target} in {time.time() - started:.1f}s')
+
+@click.command('analyze-db')
+@with_appcontext
+@click.option('--pause', default=maintenance.PAUSE, help='Seconds to wait between tables.')
+def analyze_db_command(pause):
+    """Refresh query planner statistics, one table at a time."""
+    require_sqlite()
+    click.echo(f'Analyzed {maintenance.analyze(pause=pause, progress=progress_bar("Analyzing"))} tables')
+
+@click.command('vacuum-db')
+@with_appcontext
+@click.option('--pages', default=1000, help='Pages freed per step in incremental mode.')
+@click.option('--pause', default=maintenance.PAUSE, help='Seconds to wait between steps.')
+@click.option('--incremental', is_flag=True, help='Switch to auto_vacuum=INCREMENTAL so later runs are chunked.')
+def vacuum_db_command(pages, pause, incremental):
+    """Return free pages to the filesystem."""
+    require_sqlite()
+    freed = maintenance.vacuum(pages=pages, pause=pause, incremental=incremental, progress=progress_bar('Vacuuming'))
+    click.echo(f'Freed {freed} pages')
+
+@click.command('recompute-counters')
+@with_appcontext
+@click.option('--chunk', default=maintenance.CHUNK_ROWS, help='Rows read or written per transaction.')
+@click.option('--pause', default=maintenance.PAUSE, help='Seconds to wait between transactions.')
+def recompute_counters_command(chunk, pause):
+    """Recount track plays and chart scores from listening history.
+    
+    Earnings and balances are left alone: history does not keep the
+    artist's share of a play, and reconcile-ledger checks balances.
+    """
+    require_sqlite()
+    started = time.time()
+    bars = {}
+    
+    def report(stage, done, total):
+        if stage not in bars:
+            bars[stage] = progress_bar({'history': 'Counting', 'tracks': 'Comparing'}.get(stage, 'Writing'))
+        bars[stage](done, total)
+    
+    plays, scores = maintenance.recompute_counters(current_app.config['CHARTS_HALF_LIFE_HOURS'], charts.current_epoch(),
+                                                   chunk=chunk, pause=pause, progress=report)
+    click.echo(f'Corrected plays on {plays} tracks and {scores} chart scores in {time.time() - started:.1f}s')
+
+@click.command('charts-rescale')
+@with_appcontext
+@click.option('--epoch', default=None, type=click.DateTime(), help='New epoch in UTC (default now).')
+def charts_rescale_command(epoch):
+    """Move the chart decay epoch forward and scale stored scores down to match."""
+    old_epoch = charts.current_epoch()
+    new_epoch = charts.rescale(epoch)
+    click.echo(f'Moved the chart epoch from {old_epoch:%Y-%m-%d %H:%M:%S} to {new_epoch:%Y-%m-%d %H:%M:%S}')
+
+@click.command('purge-expired')
+@with_appcontext
+@click.option('--play-session-age', default=None, type=int,
+              help='Delete play sessions older than this many seconds (default PLAY_TOKEN_MAX_AGE).')
+@click.option('--chunk', default=maintenance.CHUNK_ROWS, help='Rows written per transaction.')
+@click.option('--pause', default=maintenance.PAUSE, help='Seconds to wait between transactions.')
+def purge_expired_command(play_session_age, chunk, pause):
+    """Lift expired bans and delete finished play sessions and abandoned uploads."""
+    require_sqlite()
+    # A session can't be credited once its play token has expired
+    age = play_session_age if play_session_age is not None else play_sessions.max_age
+    lifted, deleted = maintenance.purge_expired(age, chunk=chunk, pause=pause)
+    click.echo(f'Lifted {lifted} expired bans, deleted {deleted} play sessions')
+    click.echo(f'Removed {chunked_uploads.sweep()} abandoned uploads')
+
+@click.command('rebuild-indexes')
+@with_appcontext
+@click.option('--search/--no-search', default=True, help='Also rebuild the full-text search index.')
+@click.option('--chunk', default=maintenance.CHUNK_ROWS, help='Track ids re-indexed per transaction.')
+@click.option('--pause', default=maintenance.PAUSE, help='Seconds to wait between steps.')
+def rebuild_indexes_command(search, chunk, pause):
+    """Rebuild every index one at a time, then the search index in chunks."""
+    require_sqlite()
+    bars = {}
+    
+    def report(stage, done, total):
+        if stage not in bars:
+            bars[stage] = progress_bar('Search index' if stage == 'search' else 'Indexes')
+        bars[stage](done, total)
+    
+    count = maintenance.rebuild_indexes(search=search, chunk=chunk, pause=pause, progress=report)
+    click.echo(f'Rebuilt {count} indexes' + (' and the search index' if search else ''))
+
+@click.command('create-admin')
+@with_appcontext
+@click.option('--email', prompt=True)
+@click.option('--username', default='admin', show_default=True)
+@click.option('--password', prompt=True, hide_input=True, confirmation_prompt=True)
+def create_admin_command(email, username, password):
+    """Create an admin account, or reset the password of an existing one."""
+    user = User.query.filter_by(email=email).first()
+    if user is not None and user.user_type != 'admin':
+        raise click.ClickException(f'{email} belongs to a {user.user_type} account')
+    if user is None:
+        user = User(username=username, email=email, user_type='admin', referral_code=f'A{os.urandom(4).hex()}')
+        db.session.add(user)
+    user.password = generate_password_hash(password)
+    db.session.commit()
+    click.echo(f'Admin {user.email} is ready')
+
+@click.command('open-ledger')
+@with_appcontext
+def open_ledger_command():
+    """Record opening ledger entries for balances that predate the ledger."""
+    click.echo(f'Opened {ledger.open_balances()} balances')
+
+@click.command('snapshot-balances')
+@with_appcontext
+def snapshot_balances_command():
+    """Fold new ledger entries into each user's balance snapshot."""
+    started = time.time()
+    click.echo(f'Updated {ledger.take_snapshots()} snapshots in {time.time() - started:.1f}s')
+
+@click.command('compact-counters')
+@with_appcontext
+def compact_counters_command():
+    """Fold sharded play, earnings and balance counters into their rows."""
+    click.echo(f'Compacted {sharded_counters.compact()} counters')
+
+@click.command('reconcile-ledger')
+@with_appcontext
+@click.option('--chunk', default=ledger.CHUNK_ROWS, help='Entries read per query.')
+@click.option('--fix', is_flag=True, help='Set mismatched User.balance values to the ledger total.')
+def reconcile_ledger_command(chunk, fix):
+    """Verify every transaction, snapshot and user balance against the ledger."""
+    started = time.time()
+    report = ledger.reconcile(chunk=chunk, progress=progress_bar('Reading'))
+    click.echo(f"Checked {report['entries']} entries in {report['transactions']} transactions "
+               f"for {report['users']} users in {time.time() - started:.1f}s")
+    for transaction_id in report['unbalanced'][:20]:
+        click.echo(f'Transaction {transaction_id} does not sum to zero')
+    for user_id, snapshot, total in report['snapshots'][:20]:
+        click.echo(f'User {user_id}: snapshot {snapshot / 100:.2f}, entries {total / 100:.2f}')
+    for user_id, stored, total in report['balances'][:20]:
+        click.echo(f'User {user_id}: balance {stored / 100:.2f}, ledger {total / 100:.2f}')
+    mismatched = report['balances']
+    if fix and mismatched:
+        ledger.fix_balances(mismatched)
+        click.echo(f'Fixed {len(mismatched)} balances')
+        mismatched = []
+    if report['unbalanced'] or report['snapshots'] or mismatched:
+        raise click.ClickException(f"{len(report['unbalanced'])} unbalanced transactions, "
+                                   f"{len(report['snapshots'])} bad snapshots, "
+                                   f"{len(mismatched)} mismatched balances")
+
+@click.command('scan-fraud')
+@with_appcontext
+@click.option('--days', default=30, help='Replay the last N days of history.')
+@click.option('--top', default=20, help='Streamers listed, worst first.')
+@click.option('--record', is_flag=True, help="Flag each streamer's worst event for review.")
+def scan_fraud_command(days, top, record):
+    """Replay listening history and ad watches through the fraud detector."""
+    started = time.time()
+    report = fraud.scan(since=datetime.utcnow() - timedelta(days=days))
+    ranked = sorted(report.items(), key=lambda item: -item[1]['score'])
+    click.echo(f'{len(report)} streamers over their limits in {time.time() - started:.1f}s')
+    for streamer_id, summary in ranked[:top]:
+        click.echo(f"Streamer {streamer_id}: score {summary['score']:.2f}, {summary['flagged']} of "
+                   f"{summary['events']} events flagged, {summary['held']} over the hold score "
+                   f"({summary['reasons']})")
+    
+    if record:
+        # Earnings from history were paid long ago, so the scan only flags
+        recorded = {reference for (reference,) in db.session.query(FraudFlag.reference)
+                    .filter(FraudFlag.reference.in_([summary['reference'] for summary in report.values()]))}
+        flags = [FraudFlag(streamer_id=streamer_id, kind=summary['kind'], reference=summary['reference'],
+                           score=round(summary['score'], 2), reasons=summary['reasons'][:200])
+                 for streamer_id, summary in ranked if summary['reference'] not in recorded]
+        db.session.add_all(flags)
+        db.session.commit()
+        click.echo(f'Flagged {len(flags)} streamers for review')
+
+@click.command('rebuild-analytics')
+@with_appcontext
+@click.option('--chunk', default=100, help='Artists recounted per transaction.')
+def rebuild_analytics_command(chunk):
+    """Recount the artist analytics rollups from listening history."""
+    started = time.time()
+    artist_ids = [artist_id for (artist_id,) in db.session.query(User.id).filter_by(user_type='artist').order_by(User.id)]
+    report = progress_bar('Artists')
+    days = 0
+    for offset in range(0, len(artist_ids), chunk):
+        part = artist_ids[offset:offset + chunk]
+        days += play_analytics.rebuild(part)
+        db.session.commit()
+        fragment_cache.invalidate(*[f'artist:{artist_id}' for artist_id in part])
+        report(offset + len(part), len(artist_ids))
+    click.echo(f'Rebuilt {days} track days for {len(artist_ids)} artists in {time.time() - started:.1f}s')
+
+COMMANDS = [sweep_uploads_command, build_recommendations_command, analyze_tracks_command,
+            transcode_tracks_command, build_assets_command, build_catalog_index_command, seed_data_command,
+            backup_db_command, analyze_db_command, vacuum_db_command, recompute_counters_command,
+            charts_rescale_command, purge_expired_command, rebuild_indexes_command, create_admin_command,
+            open_ledger_command, snapshot_balances_command, compact_counters_command, reconcile_ledger_command,
+            scan_fraud_command, rebuild_analytics_command]
+
+def register_commands(app):
+    for command in COMMANDS:
+        app.cli.add_command(command)
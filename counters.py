@@ -0,0 +1,141 @@
+"""Sharded counters for rows that many credits update at once.
+
+Every credited play of a track adds to the same MusicTrack row and the
+same artist's User.balance. When one track is popular, concurrent
+credits wait on each other for those rows. add() instead bumps one of
+COUNTER_SHARDS rows in counter_shard, picked at random, so concurrent
+writers rarely meet. A counter's value is its base column plus its
+shards. compact() folds the shards back into the base columns every
+COUNTER_COMPACT_SECONDS.
+
+SQLite locks the whole database for every write, so shards cannot help
+there and only add an upsert. With COUNTER_SHARDS left as None, counters
+are sharded on other databases and updated in place on SQLite.
+"""
+import random
+import threading
+import time
+from collections import defaultdict
+
+from sqlalchemy import bindparam, func
+from sqlalchemy.engine import make_url
+
+from database import db, CounterShard, MusicTrack, User, upsert
+
+# name -> (base column, counter units per base unit); the base row has the counter's key as its id
+COUNTERS = {
+    'track_plays': (MusicTrack.__table__.c.plays, 1),
+    'track_earnings': (MusicTrack.__table__.c.earnings, 100),  # cents
+    'balance': (User.__table__.c.balance, 100),  # cents
+}
+
+
+def _base_units(name, amount):
+    scale = COUNTERS[name][1]
+    return amount / scale if scale != 1 else amount
+
+
+class ShardedCounters:
+    def __init__(self, app=None):
+        self.lock = threading.Lock()
+        self.shards = 8
+        self.compact_seconds = 30
+        self.last_compact = time.time()
+        self.compacting = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COUNTER_SHARDS', None)
+        app.config.setdefault('COUNTER_COMPACT_SECONDS', 30)
+
+        self.shards = app.config['COUNTER_SHARDS']
+        if self.shards is None:
+            backend = make_url(app.config['SQLALCHEMY_DATABASE_URI']).get_backend_name()
+            self.shards = 0 if backend == 'sqlite' else 8
+        self.compact_seconds = app.config['COUNTER_COMPACT_SECONDS']
+        app.extensions['sharded_counters'] = self
+
+    def add(self, name, key, amount, session=None):
+        """Add `amount` counter units to a random shard in the caller's session; does not commit."""
+        if name not in COUNTERS:
+            raise KeyError(f'Unknown counter {name}')
+        if session is None:
+            session = db.session
+        if not self.shards:
+            column = COUNTERS[name][0]
+            session.execute(column.table.update().where(column.table.c.id == key)
+                            .values({column.name: func.coalesce(column, 0) + _base_units(name, amount)}))
+            if name == 'balance':
+                session.info.setdefault('moved_balances', set()).add(key)
+            return
+        table = CounterShard.__table__
+        statement = upsert(session, table).values(name=name, key=key, shard=random.randrange(self.shards),
+                                                  value=amount)
+        session.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.name, table.c.key, table.c.shard],
+            set_={'value': table.c.value + statement.excluded.value}
+        ))
+
+    def pending(self, name, keys=None):
+        """{key: counter units not yet folded into the base column}"""
+        query = db.session.query(CounterShard.key, func.sum(CounterShard.value))\
+            .filter(CounterShard.name == name)
+        if keys is not None:
+            query = query.filter(CounterShard.key.in_(list(keys)))
+        return dict(query.group_by(CounterShard.key).all())
+
+    def compact_due(self):
+        return not self.compacting and time.time() - self.last_compact >= self.compact_seconds
+
+    def compact(self):
+        """Fold every shard into its base column. Commits.
+
+        Only the amounts read are subtracted from the shards, so adds
+        made meanwhile stay for the next pass. Returns the number of
+        counters folded.
+        """
+        with self.lock:
+            if self.compacting:
+                return 0
+            self.compacting = True
+            self.last_compact = time.time()
+        try:
+            shards = CounterShard.__table__
+            rows = db.session.query(CounterShard.name, CounterShard.key, CounterShard.shard, CounterShard.value)\
+                .filter(CounterShard.value != 0)\
+                .all()
+            if not rows:
+                return 0
+            db.session.execute(
+                shards.update()
+                .where(shards.c.name == bindparam('n'))
+                .where(shards.c.key == bindparam('k'))
+                .where(shards.c.shard == bindparam('s'))
+                .values(value=shards.c.value - bindparam('v')),
+                [{'n': name, 'k': key, 's': shard, 'v': value} for name, key, shard, value in rows]
+            )
+
+            totals = defaultdict(lambda: defaultdict(int))
+            for name, key, _, value in rows:
+                totals[name][key] += value
+            for name, deltas in totals.items():
+                column = COUNTERS[name][0]
+                db.session.execute(
+                    column.table.update()
+                    .where(column.table.c.id == bindparam('k'))
+                    .values({column.name: func.coalesce(column, 0) + bindparam('delta')}),
+                    [{'k': key, 'delta': _base_units(name, delta)} for key, delta in deltas.items()]
+                )
+            # Balances read from User.balance have moved now
+            db.session.info.setdefault('moved_balances', set()).update(totals.get('balance', ()))
+
+            db.session.execute(shards.delete().where(shards.c.value == 0))
+            db.session.commit()
+            return sum(len(deltas) for deltas in totals.values())
+        finally:
+            with self.lock:
+                self.compacting = False
+
+
+sharded_counters = ShardedCounters()
@@ -1,10 +1,23 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from datetime import datetime
 import os
 
 db = SQLAlchemy()
 
+def upsert(bind, table):
+    """An INSERT for `table` with the on_conflict_do_* methods of the database behind `bind`.
+    
+    `bind` is a session or a connection. Postgres and SQLite spell ON
+    CONFLICT the same way, but SQLAlchemy only offers it per dialect.
+    """
+    dialect = bind.dialect if hasattr(bind, 'dialect') else bind.get_bind().dialect
+    if dialect.name == 'postgresql':
+        return postgresql_insert(table)
+    return sqlite_insert(table)
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -62,6 +75,153 @@ class Referral(db.Model):
     bonus_paid = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class PlaySession(db.Model):
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex, carried in the signed play token
+    streamer_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    track_id = db.Column(db.Integer, db.ForeignKey('music_track.id'), nullable=False)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_heartbeat = db.Column(db.DateTime, nullable=True)  # None until a queued session's first heartbeat
+    last_position = db.Column(db.Float, nullable=True)  # playback position the client last reported
+    listened_seconds = db.Column(db.Float, default=0.0)
+    required_seconds = db.Column(db.Float, nullable=False)
+    credited = db.Column(db.Boolean, default=False)
+    credited_at = db.Column(db.DateTime, nullable=True)
+
+class ActivePlay(db.Model):
+    streamer_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    play_session_id = db.Column(db.String(32), nullable=False)  # the one session of the streamer that accrues time
+    claimed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class TrackChartScore(db.Model):
+    track_id = db.Column(db.Integer, db.ForeignKey('music_track.id'), primary_key=True)
+    score = db.Column(db.Float, default=0.0)  # forward-decayed play count, see charts.py
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class ChartEpoch(db.Model):
+    id = db.Column(db.Integer, primary_key=True)  # a single row, id 1
+    epoch = db.Column(db.DateTime, nullable=False)  # stored chart scores are relative to this, see charts.py
+
+class TrackNeighbors(db.Model):
+    track_id = db.Column(db.Integer, db.ForeignKey('music_track.id'), primary_key=True)
+    neighbor_ids = db.Column(db.LargeBinary, nullable=False)  # packed int32, best first
+    scores = db.Column(db.LargeBinary, nullable=False)  # packed float32, parallel to neighbor_ids
+    built_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class TrackRendition(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    track_id = db.Column(db.Integer, db.ForeignKey('music_track.id'), nullable=False, index=True)
+    quality = db.Column(db.String(20), nullable=False)  # 'low', 'medium' or 'high', see transcode.py
+    bitrate_kbps = db.Column(db.Integer, nullable=False)
+    format = db.Column(db.String(10), default='mp3')
+    filename = db.Column(db.String(300), nullable=False)  # relative to UPLOAD_FOLDER
+    size_bytes = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (db.UniqueConstraint('track_id', 'quality'),)
+
+class TrackAnalysis(db.Model):
+    track_id = db.Column(db.Integer, db.ForeignKey('music_track.id'), primary_key=True)
+    waveform = db.Column(db.LargeBinary, nullable=False)  # one uint8 peak per point, 255 = full scale
+    points = db.Column(db.Integer, default=0)
+    loudness_lufs = db.Column(db.Float, nullable=True)  # integrated loudness, None for silence
+    peak_dbfs = db.Column(db.Float, nullable=True)
+    duration = db.Column(db.Float, default=0.0)  # seconds, exact
+    analyzed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class UploadSession(db.Model):
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex, also names the part file
+    artist_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    filename = db.Column(db.String(300), nullable=False)  # original name, already secure_filename'd
+    title = db.Column(db.String(200), nullable=False)
+    genre = db.Column(db.String(50))
+    description = db.Column(db.Text)
+    size = db.Column(db.BigInteger, nullable=False)
+    chunk_size = db.Column(db.Integer, nullable=False)
+    chunk_count = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # abandoned sessions are swept by this
+
+class UploadChunk(db.Model):
+    session_id = db.Column(db.String(32), db.ForeignKey('upload_session.id'), primary_key=True)
+    chunk_index = db.Column(db.Integer, primary_key=True)
+    checksum = db.Column(db.String(80), nullable=False)  # 'sha256=<hex>' or 'crc32=<hex>' as verified
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class PlatformSetting(db.Model):
+    key = db.Column(db.String(50), primary_key=True)  # a name from settings.SETTINGS
+    value = db.Column(db.String(50), nullable=False)  # str() of the value, parsed with its type on load
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+
+class SettingsVersion(db.Model):
+    id = db.Column(db.Integer, primary_key=True)  # a single row, id 1
+    version = db.Column(db.Integer, nullable=False, default=0)  # bumped with every settings write
+
+class LedgerTransaction(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # play, ad, referral, withdrawal, refund, adjustment, opening
+    reference = db.Column(db.String(50), nullable=True)  # e.g. 'play_session:<id>' or 'withdrawal:<id>'
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)  # admin behind an adjustment
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class LedgerEntry(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    transaction_id = db.Column(db.Integer, db.ForeignKey('ledger_transaction.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)  # None for platform accounts
+    account = db.Column(db.String(20), nullable=False)  # 'balance' for users, see ledger.py for the rest
+    amount_cents = db.Column(db.BigInteger, nullable=False)  # credit positive, debit negative
+    __table_args__ = (db.Index('ix_ledger_entry_user_id_id', 'user_id', 'id'),)
+
+class BalanceSnapshot(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    entry_id = db.Column(db.Integer, nullable=False)  # last LedgerEntry.id included
+    balance_cents = db.Column(db.BigInteger, nullable=False)
+    taken_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class CounterShard(db.Model):
+    name = db.Column(db.String(20), primary_key=True)  # a counter from counters.COUNTERS
+    key = db.Column(db.Integer, primary_key=True)  # id of the row the counter belongs to
+    shard = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)  # not yet folded into the row, in counter units
+
+class DailyPlayStats(db.Model):
+    track_id = db.Column(db.Integer, primary_key=True)  # kept after the track is deleted
+    day = db.Column(db.Date, primary_key=True)  # UTC
+    artist_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    plays = db.Column(db.Integer, nullable=False, default=0)
+    earnings_cents = db.Column(db.BigInteger, nullable=False, default=0)  # the artist's share
+    __table_args__ = (db.Index('ix_daily_play_stats_artist_id_day', 'artist_id', 'day'),)
+
+class DailyListenerSketch(db.Model):
+    scope = db.Column(db.String(6), primary_key=True)  # track or artist
+    key = db.Column(db.Integer, primary_key=True)  # track or artist id
+    day = db.Column(db.Date, primary_key=True)  # UTC
+    register = db.Column(db.SmallInteger, primary_key=True)  # HyperLogLog register, see analytics.py
+    rank = db.Column(db.SmallInteger, nullable=False)
+
+class FraudFlag(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    streamer_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    kind = db.Column(db.String(10), nullable=False)  # play or ad
+    reference = db.Column(db.String(50), nullable=True, index=True)  # 'play_session:<id>' or 'ad_watch:<id>'
+    track_id = db.Column(db.Integer, db.ForeignKey('music_track.id'), nullable=True)
+    score = db.Column(db.Float, nullable=False)
+    reasons = db.Column(db.String(200), nullable=False)  # signals over their limit, e.g. 'streamer_plays_hour 52/40'
+    status = db.Column(db.String(10), nullable=False, default='flagged')  # flagged, held, released, cleared, forfeited
+    held_cents = db.Column(db.BigInteger, nullable=False, default=0)  # streamer earnings withheld
+    artist_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    artist_cents = db.Column(db.BigInteger, nullable=False, default=0)  # artist earnings of a held play
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    reviewed_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    reviewed_at = db.Column(db.DateTime, nullable=True)
+
+class ActivityEvent(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    uid = db.Column(db.String(32), unique=True, nullable=False)  # set when published, so workers can dedupe
+    kind = db.Column(db.String(20), nullable=False, index=True)  # see activity.ICONS
+    message = db.Column(db.String(200), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 # Now define relationships after all models are created
 def setup_relationships():
     # User relationships
@@ -75,6 +235,13 @@ def setup_relationships():
     # ListeningHistory relationship
     ListeningHistory.track = db.relationship('MusicTrack', backref='listens')
     
+    # Renditions and analysis go away with their track
+    MusicTrack.renditions = db.relationship('TrackRendition', backref='track', lazy=True, cascade='all, delete-orphan')
+    MusicTrack.analysis = db.relationship('TrackAnalysis', uselist=False, lazy=True, cascade='all, delete-orphan')
+    
+    # Received chunks go away with their upload session
+    UploadSession.chunks = db.relationship('UploadChunk', lazy=True, cascade='all, delete-orphan')
+    
     # Referral relationships are already defined above
 
 # Call this function after all models are defined
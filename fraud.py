@@ -0,0 +1,301 @@
+"""Streaming play-fraud detection.
+
+Every play start and completed ad is counted inline against sliding
+windows per streamer, per client IP, per referral group and per track.
+The counts live in fixed-size count-min sketches, so memory does not
+grow with the number of accounts and scoring an event is a few hash
+lookups. An event's score is its worst count over that signal's limit:
+at FRAUD_FLAG_SCORE the event is recorded as a FraudFlag for review, at
+FRAUD_HOLD_SCORE its earnings are also withheld until an admin releases
+or forfeits them.
+
+Counts are per worker. Behind a load balancer that spreads one client
+over N workers, each sees about 1/N of its events, so set FRAUD_LIMITS
+accordingly. scan() replays the stored history through one detector for
+an exact view of past days.
+"""
+import heapq
+import random
+import threading
+import time
+from array import array
+from collections import namedtuple
+from datetime import datetime
+from operator import sub
+
+from database import db, FraudFlag, ListeningHistory, AdWatch, User
+from activity import activity_feed
+
+# name -> (event, subject, window seconds, ring buckets, can hold earnings)
+SIGNALS = {
+    'streamer_plays_hour': ('play', 'streamer', 3600, 6, True),
+    'streamer_plays_day': ('play', 'streamer', 86400, 12, True),  # one account cycling tracks around the clock
+    'ip_plays_hour': ('play', 'ip', 3600, 6, True),
+    'group_plays_hour': ('play', 'group', 3600, 6, True),  # a referrer and the accounts they referred
+    'track_plays_hour': ('play', 'track', 3600, 6, False),  # popular tracks are flagged, never held
+    'streamer_ads_hour': ('ad', 'streamer', 3600, 6, True),
+    'ip_ads_hour': ('ad', 'ip', 3600, 6, True),
+}
+
+# Events per window; FRAUD_LIMITS overrides any of them
+LIMITS = {
+    'streamer_plays_hour': 40,
+    'streamer_plays_day': 400,
+    'ip_plays_hour': 120,
+    'group_plays_hour': 300,
+    'track_plays_hour': 3000,
+    'streamer_ads_hour': 6,
+    'ip_ads_hour': 20,
+}
+
+Verdict = namedtuple('Verdict', 'score action reasons')  # action is None, 'flag' or 'hold'
+
+
+def referral_group(referred_by, referral_code):
+    """Key shared by a referrer and everyone who signed up with their code."""
+    return referred_by or referral_code
+
+
+class SlidingSketch:
+    """Count-min sketch of events per key over a sliding window.
+
+    The window is a ring of `buckets` tables of depth x width counters plus
+    a running total table. An event bumps one cell per row in the current
+    bucket and in the total. Moving on to a new bucket subtracts the one
+    that falls out of the window from the total and clears it. A key's
+    estimate is the smallest of its total cells, which never undercounts
+    and overcounts only by collisions, about events in the window / width.
+    """
+
+    def __init__(self, window, buckets, width, depth):
+        self.span = window / buckets
+        self.width = width
+        self.seeds = [random.getrandbits(62) for _ in range(depth)]
+        size = width * depth
+        self.buckets = [array('I', bytes(4 * size)) for _ in range(buckets)]
+        self.total = array('I', bytes(4 * size))
+        self.slot = None  # absolute number of the current bucket
+
+    def advance(self, now):
+        slot = int(now // self.span)
+        # Late events count in the current bucket
+        if self.slot is not None and slot <= self.slot:
+            return
+        count = len(self.buckets)
+        if self.slot is None or slot - self.slot >= count:
+            size = len(self.total)
+            self.buckets = [array('I', bytes(4 * size)) for _ in range(count)]
+            self.total = array('I', bytes(4 * size))
+        else:
+            for expired in range(self.slot + 1, slot + 1):
+                bucket = self.buckets[expired % count]
+                self.total = array('I', map(sub, self.total, bucket))
+                self.buckets[expired % count] = array('I', bytes(4 * len(bucket)))
+        self.slot = slot
+
+    def add(self, key, now):
+        """Count one event for `key` and return its estimated count in the window."""
+        self.advance(now)
+        bucket = self.buckets[self.slot % len(self.buckets)]
+        total = self.total
+        width = self.width
+        estimate = None
+        for row, seed in enumerate(self.seeds):
+            cell = row * width + hash((seed, key)) % width
+            bucket[cell] += 1
+            total[cell] += 1
+            if estimate is None or total[cell] < estimate:
+                estimate = total[cell]
+        return estimate
+
+
+class FraudDetector:
+    """Scores plays and ads against sliding-window limits; see the module docstring."""
+
+    def __init__(self, app=None):
+        self.lock = threading.Lock()
+        self.limits = dict(LIMITS)
+        self.flag_score = 1.0
+        self.hold_score = 2.0
+        self.alert_seconds = 3600
+        self.alerted = {}  # streamer id -> when the admin feed last heard about them
+        self.sketches = {}
+        self.width = 8192
+        self.depth = 4
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FRAUD_LIMITS', {})
+        app.config.setdefault('FRAUD_FLAG_SCORE', 1.0)
+        app.config.setdefault('FRAUD_HOLD_SCORE', 2.0)
+        app.config.setdefault('FRAUD_SKETCH_WIDTH', 8192)
+        app.config.setdefault('FRAUD_SKETCH_DEPTH', 4)
+        app.config.setdefault('FRAUD_ALERT_SECONDS', 3600)
+
+        self.limits = dict(LIMITS, **app.config['FRAUD_LIMITS'])
+        self.flag_score = app.config['FRAUD_FLAG_SCORE']
+        self.hold_score = app.config['FRAUD_HOLD_SCORE']
+        self.width = app.config['FRAUD_SKETCH_WIDTH']
+        self.depth = app.config['FRAUD_SKETCH_DEPTH']
+        self.alert_seconds = app.config['FRAUD_ALERT_SECONDS']
+        self.reset()
+        app.extensions['fraud_detector'] = self
+
+    def reset(self):
+        """Start every window empty."""
+        with self.lock:
+            self.sketches = {name: SlidingSketch(window, buckets, self.width, self.depth)
+                             for name, (_, _, window, buckets, _) in SIGNALS.items()}
+            self.alerted = {}
+
+    def copy(self):
+        """A detector with the same limits and empty windows, for replaying history."""
+        other = FraudDetector()
+        other.limits = dict(self.limits)
+        other.flag_score, other.hold_score = self.flag_score, self.hold_score
+        other.width, other.depth = self.width, self.depth
+        other.reset()
+        return other
+
+    def score_play(self, streamer_id, track_id, ip=None, group=None, now=None):
+        """Count a play start and return its Verdict."""
+        return self.score('play', {'streamer': streamer_id, 'ip': ip, 'group': group, 'track': track_id}, now)
+
+    def score_ad(self, streamer_id, ip=None, now=None):
+        """Count a completed ad and return its Verdict."""
+        return self.score('ad', {'streamer': streamer_id, 'ip': ip}, now)
+
+    def score(self, event, subjects, now=None):
+        if now is None:
+            now = time.time()
+        worst = held = 0.0
+        reasons = []
+        with self.lock:
+            for name, (signal_event, subject, _, _, can_hold) in SIGNALS.items():
+                key = subjects.get(subject)
+                if signal_event != event or key is None:
+                    continue
+                count = self.sketches[name].add(key, now)
+                ratio = count / self.limits[name]
+                if ratio >= self.flag_score:
+                    reasons.append(f'{name} {count}/{self.limits[name]}')
+                worst = max(worst, ratio)
+                if can_hold:
+                    held = max(held, ratio)
+        if held >= self.hold_score:
+            return Verdict(worst, 'hold', ', '.join(reasons))
+        if worst >= self.flag_score:
+            return Verdict(worst, 'flag', ', '.join(reasons))
+        return Verdict(worst, None, '')
+
+    def record(self, session, streamer_id, kind, verdict, reference=None, track_id=None, held_cents=0,
+               username=None):
+        """Add a FraudFlag for a flagged or held event to `session`; does not commit.
+
+        The admin feed hears about a streamer at most once per
+        FRAUD_ALERT_SECONDS per worker.
+        """
+        flag = FraudFlag(
+            streamer_id=streamer_id,
+            kind=kind,
+            reference=reference,
+            track_id=track_id,
+            score=round(verdict.score, 2),
+            reasons=verdict.reasons[:200],
+            status='held' if verdict.action == 'hold' else 'flagged',
+            held_cents=held_cents if verdict.action == 'hold' else 0,
+        )
+        session.add(flag)
+
+        now = time.time()
+        with self.lock:
+            alert = now - self.alerted.get(streamer_id, 0) >= self.alert_seconds
+            if alert:
+                if len(self.alerted) > 10000:
+                    self.alerted = {key: when for key, when in self.alerted.items()
+                                    if now - when < self.alert_seconds}
+                self.alerted[streamer_id] = now
+        if alert:
+            activity_feed.publish('fraud', f'{username or f"Streamer {streamer_id}"} {flag.status} for review: '
+                                           f'{verdict.reasons}', streamer_id)
+        return flag
+
+    def flag_for(self, reference, session=None):
+        """The FraudFlag of an event in any status, or None."""
+        if session is None:
+            session = db.session
+        return session.query(FraudFlag).filter(FraudFlag.reference == reference).first()
+
+    def hold(self, flag, held_cents, artist_id=None, artist_cents=0, session=None):
+        """Put an event's earnings on its held flag; does not commit.
+
+        Only while the flag is still held, so a review claiming it at the
+        same time either sees the amounts or leaves the event to be paid.
+        Returns whether the earnings are held.
+        """
+        if session is None:
+            session = db.session
+        held = session.query(FraudFlag)\
+            .filter(FraudFlag.id == flag.id, FraudFlag.status == 'held')\
+            .update({'held_cents': held_cents, 'artist_id': artist_id, 'artist_cents': artist_cents},
+                    synchronize_session=False)
+        session.refresh(flag)
+        return bool(held)
+
+
+fraud_detector = FraudDetector()
+
+
+def _timestamp(value):
+    return (value - datetime(1970, 1, 1)).total_seconds()
+
+
+def scan(since=None, until=None, detector=None, chunk=10000, progress=None):
+    """Replay listening history and ad watches in time order through a fresh detector.
+
+    Stored history has no client IPs, so only the streamer, referral
+    group and track signals apply. Returns {streamer id: summary} for
+    every streamer with a flagged event, where a summary has the event
+    count, flagged and would-be-held events and the worst event's score,
+    reasons, kind and reference.
+    """
+    detector = (detector or fraud_detector).copy()
+
+    def rows(query, column):
+        if since is not None:
+            query = query.filter(column >= since)
+        if until is not None:
+            query = query.filter(column < until)
+        return query.order_by(column).yield_per(chunk)
+
+    plays = rows(db.session.query(ListeningHistory.listened_at, ListeningHistory.id, ListeningHistory.streamer_id,
+                                  ListeningHistory.track_id, User.referred_by, User.referral_code)
+                 .join(User, User.id == ListeningHistory.streamer_id), ListeningHistory.listened_at)
+    ads = rows(db.session.query(AdWatch.watched_at, AdWatch.id, AdWatch.streamer_id), AdWatch.watched_at)
+    events = heapq.merge(((row, 'play') for row in plays), ((row, 'ad') for row in ads),
+                         key=lambda item: item[0][0])
+
+    counts, report = {}, {}
+    for done, (row, kind) in enumerate(events, start=1):
+        now = _timestamp(row[0])
+        streamer_id = row[2]
+        if kind == 'play':
+            verdict = detector.score_play(streamer_id, row[3], group=referral_group(row[4], row[5]), now=now)
+            reference = f'listening_history:{row[1]}'
+        else:
+            verdict = detector.score_ad(streamer_id, now=now)
+            reference = f'ad_watch:{row[1]}'
+        counts[streamer_id] = counts.get(streamer_id, 0) + 1
+        if verdict.action:
+            summary = report.setdefault(streamer_id, {'events': 0, 'flagged': 0, 'held': 0, 'score': 0.0})
+            summary['flagged'] += 1
+            summary['held'] += verdict.action == 'hold'
+            if verdict.score > summary['score']:
+                summary.update(score=verdict.score, reasons=verdict.reasons, kind=kind, reference=reference,
+                               action=verdict.action)
+        if progress and done % chunk == 0:
+            progress(done)
+    for streamer_id, summary in report.items():
+        summary['events'] = counts[streamer_id]
+    return report
@@ -0,0 +1,22 @@
+"""Gunicorn settings, read automatically by `gunicorn wsgi:app`.
+
+Dashboard event streams (live.py) stay open for up to LIVE_MAX_SECONDS
+and hold a thread each, so workers are threaded rather than sync. Keep
+LIVE_MAX_CONNECTIONS below `threads` so every worker has threads left
+for ordinary requests; a sync worker gets its streams refused and the
+dashboards poll instead.
+
+create_app sizes the database pool from GUNICORN_THREADS so no request
+thread waits on a connection; the database must accept `workers *
+threads` connections, or put a pooler such as PgBouncer in front of it.
+"""
+import multiprocessing
+import os
+
+wsgi_app = 'wsgi:app'
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:8000')
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 256))  # LIVE_MAX_CONNECTIONS streams plus ordinary requests
+timeout = 30  # gthread workers check in from their main loop, so open streams do not time out
+keepalive = 5
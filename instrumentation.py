@@ -0,0 +1,182 @@
+import logging
+import threading
+import time
+from collections import Counter
+
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the shape Prometheus expects."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+class Instrumentation:
+    """Per-request latency and SQL metrics, N+1 detection and a slow-query log.
+
+    Each request records its wall time and, through SQLAlchemy cursor
+    events, how many statements it ran and how long they took. A statement
+    repeated METRICS_N_PLUS_ONE_THRESHOLD times or more in one request is
+    reported as a likely N+1 pattern. Statements slower than
+    SLOW_QUERY_THRESHOLD_MS go to the slow-query log together with the route
+    that issued them.
+
+    Metrics are kept per worker process; scrape every worker, or run one
+    worker per scrape target.
+    """
+
+    def __init__(self, app=None):
+        self.lock = threading.Lock()
+        self.latency = {}        # (endpoint, method) -> Histogram
+        self.query_counts = {}   # endpoint -> Histogram
+        self.query_seconds = Counter()
+        self.responses = Counter()  # (endpoint, method, status) -> count
+        self.n_plus_one = Counter()
+        self.slow_queries = Counter()
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_TOKEN', None)
+        app.config.setdefault('METRICS_N_PLUS_ONE_THRESHOLD', 10)
+        app.config.setdefault('SLOW_QUERY_THRESHOLD_MS', 100)
+        app.config.setdefault('SLOW_QUERY_LOG', None)
+
+        self.app = app
+        self.n_plus_one_threshold = app.config['METRICS_N_PLUS_ONE_THRESHOLD']
+        self.slow_threshold = app.config['SLOW_QUERY_THRESHOLD_MS'] / 1000.0
+        self.slow_log = logging.getLogger(f'{app.import_name}.slow_queries')
+        if app.config['SLOW_QUERY_LOG'] and not self.slow_log.handlers:
+            handler = logging.FileHandler(app.config['SLOW_QUERY_LOG'])
+            handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            self.slow_log.addHandler(handler)
+            self.slow_log.setLevel(logging.INFO)
+
+        app.before_request(self.start_request)
+        app.after_request(self.finish_request)
+        # Engine events are process-wide; an app factory may call this more than once
+        if not event.contains(Engine, 'before_cursor_execute', self.before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', self.before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self.after_cursor_execute)
+        app.extensions['instrumentation'] = self
+
+    def start_request(self):
+        g.metrics_started = time.perf_counter()
+        g.query_count = 0
+        g.query_seconds = 0.0
+        g.statements = Counter()
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('query_started')
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+
+        endpoint, route = '-', '-'
+        if has_request_context() and 'metrics_started' in g:
+            g.query_count += 1
+            g.query_seconds += elapsed
+            g.statements[statement] += 1
+            endpoint = request.endpoint or 'none'
+            route = f'{request.method} {request.path} ({endpoint})'
+
+        if elapsed >= self.slow_threshold:
+            with self.lock:
+                self.slow_queries[endpoint] += 1
+            self.slow_log.warning('slow query %.1fms route=%s statement=%s params=%.200r',
+                                  elapsed * 1000, route, ' '.join(statement.split()), parameters)
+
+    def finish_request(self, response):
+        if 'metrics_started' not in g:
+            return response
+        elapsed = time.perf_counter() - g.metrics_started
+        endpoint = request.endpoint or 'none'
+
+        repeated = [(statement, count) for statement, count in g.statements.items()
+                    if count >= self.n_plus_one_threshold]
+        for statement, count in repeated:
+            self.app.logger.warning('Possible N+1 in %s %s: statement ran %d times: %s',
+                                    request.method, request.path, count, ' '.join(statement.split())[:300])
+
+        with self.lock:
+            key = (endpoint, request.method)
+            if key not in self.latency:
+                self.latency[key] = Histogram(LATENCY_BUCKETS)
+                self.query_counts.setdefault(endpoint, Histogram(QUERY_COUNT_BUCKETS))
+            self.latency[key].observe(elapsed)
+            self.query_counts[endpoint].observe(g.query_count)
+            self.query_seconds[endpoint] += g.query_seconds
+            self.responses[(endpoint, request.method, response.status_code)] += 1
+            if repeated:
+                self.n_plus_one[endpoint] += 1
+
+        response.headers['Server-Timing'] = (f'db;dur={g.query_seconds * 1000:.1f};desc="{g.query_count} queries", '
+                                             f'app;dur={elapsed * 1000:.1f}')
+        return response
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+
+        def histogram(name, help_text, series):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for labels, hist in series:
+                for bound, count in zip(hist.buckets, hist.counts):
+                    lines.append(f'{name}_bucket{_labels(**labels, le=bound)} {count}')
+                lines.append(f'{name}_bucket{_labels(**labels, le="+Inf")} {hist.count}')
+                lines.append(f'{name}_sum{_labels(**labels)} {hist.sum:.6f}')
+                lines.append(f'{name}_count{_labels(**labels)} {hist.count}')
+
+        def counter(name, help_text, series):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for labels, value in series:
+                lines.append(f'{name}{_labels(**labels)} {value}')
+
+        with self.lock:
+            histogram('http_request_duration_seconds', 'Request latency by endpoint.',
+                      [({'endpoint': e, 'method': m}, h) for (e, m), h in sorted(self.latency.items())])
+            counter('http_responses_total', 'Responses by endpoint and status.',
+                    [({'endpoint': e, 'method': m, 'status': s}, n) for (e, m, s), n in sorted(self.responses.items())])
+            histogram('db_queries_per_request', 'SQL statements executed per request.',
+                      [({'endpoint': e}, h) for e, h in sorted(self.query_counts.items())])
+            counter('db_query_seconds_total', 'Time spent in SQL statements.',
+                    [({'endpoint': e}, f'{s:.6f}') for e, s in sorted(self.query_seconds.items())])
+            counter('db_n_plus_one_requests_total', 'Requests that repeated one statement past the N+1 threshold.',
+                    [({'endpoint': e}, n) for e, n in sorted(self.n_plus_one.items())])
+            counter('db_slow_queries_total', 'Statements slower than SLOW_QUERY_THRESHOLD_MS.',
+                    [({'endpoint': e}, n) for e, n in sorted(self.slow_queries.items())])
+        return '\n'.join(lines) + '\n'
+
+
+instrumentation = Instrumentation()
@@ -0,0 +1,256 @@
+"""Double-entry ledger of every balance change, in integer cents.
+
+Each change is a LedgerTransaction with two or more LedgerEntry rows that
+sum to zero: the user side on the 'balance' account and the platform side
+on one of the accounts below. Entries are never updated or deleted; a
+correction is a new transaction.
+
+A user's balance is their BalanceSnapshot plus the entries after it.
+User.balance is still moved with every posting so pages can read it
+directly, and reconcile() checks it against the ledger. Postings for
+users in `sharded` move it through counter shards instead (see
+counters.py), so User.balance catches up when they are compacted. The users whose
+balance moved are noted in the session so live streams hear about it
+once the transaction commits.
+"""
+from datetime import datetime
+from itertools import chain
+
+from sqlalchemy import func, select
+
+from database import db, User, LedgerTransaction, LedgerEntry, BalanceSnapshot, CounterShard, upsert
+from counters import sharded_counters
+
+BALANCE = 'balance'          # a user's spendable balance
+PAYOUTS = 'payouts'          # what the platform paid for plays, ads and referrals
+WITHDRAWALS = 'withdrawals'  # requested withdrawals not yet paid out or refunded
+ADJUSTMENTS = 'adjustments'  # admin corrections
+OPENING = 'opening'          # balances that existed before the ledger
+
+CHUNK_ROWS = 1000000
+
+
+def cents(amount):
+    """Dollars to whole cents."""
+    return int(round(amount * 100))
+
+
+def post(kind, entries, reference=None, created_by=None, move_balances=True, sharded=(), session=None):
+    """Record one transaction in the caller's session; does not commit.
+
+    `entries` are (user_id, account, amount_cents) with user_id None for
+    platform accounts, and must sum to zero. Balances of the users in
+    `sharded` move through counter shards. `session` defaults to
+    db.session.
+    """
+    if not entries or sum(amount for _, _, amount in entries) != 0:
+        raise ValueError(f'Unbalanced {kind} transaction: {entries}')
+    if session is None:
+        session = db.session
+    transaction = LedgerTransaction(kind=kind, reference=reference, created_by=created_by)
+    session.add(transaction)
+    session.flush()
+    session.execute(LedgerEntry.__table__.insert(), [
+        {'transaction_id': transaction.id, 'user_id': user_id, 'account': account, 'amount_cents': amount}
+        for user_id, account, amount in entries
+    ])
+    if move_balances:
+        users = User.__table__
+        for user_id, _, amount in entries:
+            if user_id is not None and amount and user_id in sharded:
+                sharded_counters.add('balance', user_id, amount, session=session)
+            elif user_id is not None and amount:
+                session.execute(users.update().where(users.c.id == user_id)
+                                .values(balance=users.c.balance + amount / 100))
+                session.info.setdefault('moved_balances', set()).add(user_id)
+    return transaction
+
+
+def transfer(kind, user_id, amount_cents, account, reference=None, created_by=None, session=None):
+    """Credit a user from a platform account, or debit them into it when negative."""
+    return post(kind, [(user_id, BALANCE, amount_cents), (None, account, -amount_cents)],
+                reference=reference, created_by=created_by, session=session)
+
+
+def balance(user_id):
+    """A user's balance in cents: their snapshot plus the ledger tail."""
+    snapshot = BalanceSnapshot.query.get(user_id)
+    through = snapshot.entry_id if snapshot else 0
+    tail = db.session.query(func.coalesce(func.sum(LedgerEntry.amount_cents), 0))\
+        .filter(LedgerEntry.user_id == user_id, LedgerEntry.id > through)\
+        .scalar()
+    return (snapshot.balance_cents if snapshot else 0) + tail
+
+
+def statement(user_id, limit=100):
+    """(created_at, kind, reference, amount_cents) for a user's latest entries, newest first."""
+    return db.session.query(LedgerTransaction.created_at, LedgerTransaction.kind, LedgerTransaction.reference,
+                            LedgerEntry.amount_cents)\
+        .join(LedgerTransaction, LedgerTransaction.id == LedgerEntry.transaction_id)\
+        .filter(LedgerEntry.user_id == user_id)\
+        .order_by(LedgerEntry.id.desc())\
+        .limit(limit)\
+        .all()
+
+
+def take_snapshots():
+    """Fold every user's ledger tail into their snapshot. Commits.
+
+    Returns the number of snapshots that moved.
+    """
+    through = db.session.query(func.max(LedgerEntry.id)).scalar()
+    if through is None:
+        return 0
+    floor = db.session.query(func.min(BalanceSnapshot.entry_id)).scalar() or 0
+    deltas = db.session.query(LedgerEntry.user_id, func.sum(LedgerEntry.amount_cents))\
+        .outerjoin(BalanceSnapshot, BalanceSnapshot.user_id == LedgerEntry.user_id)\
+        .filter(LedgerEntry.user_id.isnot(None))\
+        .filter(LedgerEntry.id > floor, LedgerEntry.id <= through)\
+        .filter(LedgerEntry.id > func.coalesce(BalanceSnapshot.entry_id, 0))\
+        .group_by(LedgerEntry.user_id)\
+        .all()
+    if deltas:
+        table = BalanceSnapshot.__table__
+        insert = upsert(db.session, table)
+        db.session.execute(insert.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={'balance_cents': table.c.balance_cents + insert.excluded.balance_cents,
+                  'entry_id': insert.excluded.entry_id, 'taken_at': insert.excluded.taken_at}
+        ), [{'user_id': user_id, 'entry_id': through, 'balance_cents': delta, 'taken_at': datetime.utcnow()}
+            for user_id, delta in deltas])
+    db.session.commit()
+    return len(deltas)
+
+
+def open_balances():
+    """Give users with a balance but no ledger entries an opening transaction. Commits.
+
+    For databases that had balances before the ledger existed. Returns the
+    number of users opened.
+    """
+    unledgered = db.session.query(User.id, User.balance)\
+        .filter(User.balance != 0)\
+        .filter(~select(LedgerEntry.id).where(LedgerEntry.user_id == User.id).exists())\
+        .all()
+    opened = 0
+    for user_id, amount in unledgered:
+        if cents(amount):
+            post('opening', [(user_id, BALANCE, cents(amount)), (None, OPENING, -cents(amount))],
+                 move_balances=False)
+            opened += 1
+    db.session.commit()
+    return opened
+
+
+def reconcile(chunk=CHUNK_ROWS, progress=None):
+    """Check the whole ledger in one pass over its entries.
+
+    Verifies that every transaction sums to zero, that every snapshot
+    equals the entries it covers, and that User.balance equals the
+    ledger total. Entries are read `chunk` rows at a time and summed per
+    user and per transaction with NumPy. Users who look wrong are checked
+    again with one query each, so writes made during the pass are not
+    reported. Returns a dict of counts and mismatches.
+    """
+    import numpy as np
+
+    last_entry = db.session.query(func.max(LedgerEntry.id)).scalar() or 0
+    last_transaction = db.session.query(func.max(LedgerTransaction.id)).scalar() or 0
+    users = db.session.query(User.id, User.balance).all()
+    size = max([user_id for user_id, _ in users] +
+               [db.session.query(func.max(LedgerEntry.user_id)).scalar() or 0]) + 1
+
+    stored = np.zeros(size, dtype=np.int64)
+    if users:
+        ids, balances = zip(*[(user_id, amount or 0.0) for user_id, amount in users])
+        stored[list(ids)] = np.rint(np.array(balances, dtype=np.float64) * 100).astype(np.int64)
+    # Credits still in counter shards have not reached User.balance
+    for user_id, pending in sharded_counters.pending('balance').items():
+        if user_id < size:
+            stored[user_id] += pending
+    through = np.zeros(size, dtype=np.int64)
+    snapshot = np.zeros(size, dtype=np.int64)
+    for user_id, entry_id, balance_cents in db.session.query(BalanceSnapshot.user_id, BalanceSnapshot.entry_id,
+                                                              BalanceSnapshot.balance_cents):
+        through[user_id] = entry_id
+        snapshot[user_id] = balance_cents
+
+    # Float64 sums of whole cents are exact below 2**53 cents
+    totals = np.zeros(size)
+    covered = np.zeros(size)
+    transactions = np.zeros(last_transaction + 1)
+    # Plain DB-API tuples; building Row objects costs more than the sums
+    cursor = db.session.connection().connection.cursor()
+    position = 0
+    read = 0
+    while position < last_entry:
+        cursor.execute(f'SELECT id, transaction_id, coalesce(user_id, 0), amount_cents FROM ledger_entry '
+                       f'WHERE id > {position} AND id <= {last_entry} ORDER BY id LIMIT {int(chunk)}')
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        block = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=len(rows) * 4).reshape(-1, 4)
+        entry_ids, transaction_ids, owners, amounts = block.T
+        weights = amounts.astype(np.float64)
+        totals += np.bincount(owners, weights, minlength=size)
+        covered += np.bincount(owners, weights * (entry_ids <= through[owners]), minlength=size)
+        transactions += np.bincount(transaction_ids, weights, minlength=last_transaction + 1)
+        position = int(entry_ids[-1])
+        read += len(rows)
+        if progress:
+            progress(position, last_entry)
+
+    totals = np.rint(totals).astype(np.int64)
+    covered = np.rint(covered).astype(np.int64)
+    totals[0] = covered[0] = 0  # platform accounts
+    has_snapshot = through > 0
+
+    suspects = np.flatnonzero((totals != stored) | (has_snapshot & (covered != snapshot)))
+    balances, snapshots = [], []
+    for user_id in suspects.tolist():
+        # One statement reads both sides at the same moment
+        entries = LedgerEntry.__table__
+        shards = CounterShard.__table__
+        row = db.session.execute(select(
+            User.__table__.c.balance,
+            select(func.coalesce(func.sum(shards.c.value), 0))
+            .where(shards.c.name == 'balance', shards.c.key == user_id).scalar_subquery(),
+            select(func.coalesce(func.sum(entries.c.amount_cents), 0))
+            .where(entries.c.user_id == user_id).scalar_subquery(),
+            select(BalanceSnapshot.balance_cents).where(BalanceSnapshot.user_id == user_id).scalar_subquery(),
+            select(func.coalesce(func.sum(entries.c.amount_cents), 0))
+            .where(entries.c.user_id == user_id)
+            .where(entries.c.id <= select(BalanceSnapshot.entry_id)
+                   .where(BalanceSnapshot.user_id == user_id).scalar_subquery())
+            .scalar_subquery(),
+        ).where(User.__table__.c.id == user_id)).first()
+        if row is None:
+            continue
+        user_balance, pending, total, snapshot_cents, snapshot_total = row
+        if cents(user_balance or 0) + pending != total:
+            balances.append((user_id, cents(user_balance or 0) + pending, total))
+        if snapshot_cents is not None and snapshot_cents != snapshot_total:
+            snapshots.append((user_id, snapshot_cents, snapshot_total))
+
+    return {
+        'entries': read,
+        'transactions': last_transaction,
+        'users': len(users),
+        'unbalanced': np.flatnonzero(np.rint(transactions) != 0).tolist(),
+        'balances': balances,
+        'snapshots': snapshots,
+    }
+
+
+def fix_balances(mismatches):
+    """Set User.balance to the ledger total for (user_id, stored, ledger) rows. Commits.
+
+    Whatever is still in counter shards is left out, since compacting
+    them adds it.
+    """
+    users = User.__table__
+    pending = sharded_counters.pending('balance', [user_id for user_id, _, _ in mismatches])
+    for user_id, _, total in mismatches:
+        db.session.execute(users.update().where(users.c.id == user_id)
+                           .values(balance=(total - pending.get(user_id, 0)) / 100))
+    db.session.commit()
@@ -0,0 +1,219 @@
+import json
+import queue
+import threading
+import time
+
+from flask import Response, jsonify
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from activity import activity_feed, serialize
+
+
+class Subscription:
+    """One open event stream."""
+
+    def __init__(self, user_id, channels, size):
+        self.user_id = user_id
+        self.channels = channels
+        self.queue = queue.Queue(size)
+        self.closed = None  # why the stream must end: 'resync', 'replaced' or 'banned'
+        self.wake_at = None  # monotonic time the stream's update function wants to run again
+
+
+class LiveUpdates:
+    """In-process pub/sub behind the server-sent event streams.
+
+    Views publish small deltas to channels ('admins', 'user:<id>') and
+    every open stream subscribed to the channel gets them through its own
+    bounded queue. A stream that falls LIVE_QUEUE_SIZE events behind is
+    told to resync instead of blocking the publisher.
+
+    Each stream holds a worker thread (or greenlet under gevent, where
+    queue and threading are patched), so streams are limited to
+    LIVE_MAX_CONNECTIONS per worker and LIVE_MAX_PER_USER per user, the
+    oldest of a user's streams making way for a new one. A server that
+    handles one request per worker at a time (sync gunicorn workers) gets
+    no streams at all; gunicorn.conf.py runs threaded workers. A refused
+    stream is answered 503 with Retry-After: LIVE_RETRY_SECONDS, and the
+    client polls until a stream is accepted again. Streams send a
+    comment every LIVE_HEARTBEAT_SECONDS so proxies keep them open and dead
+    clients are noticed, and end after LIVE_MAX_SECONDS so browsers
+    reconnect and threads are recycled.
+
+    Publishing only reaches streams in the same worker. Streams re-read
+    their state on every heartbeat, which picks up changes made by other
+    workers at heartbeat latency.
+    """
+
+    def __init__(self, app=None):
+        self.lock = threading.Lock()
+        self.channels = {}      # channel -> set of subscriptions
+        self.connections = {}   # user id -> that user's subscriptions, oldest first
+        self.count = 0
+        self.max_connections = 200
+        self.max_per_user = 3
+        self.heartbeat_seconds = 15
+        self.max_seconds = 300
+        self.queue_size = 100
+        self.retry_seconds = 30
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('LIVE_MAX_CONNECTIONS', 200)
+        app.config.setdefault('LIVE_MAX_PER_USER', 3)
+        app.config.setdefault('LIVE_HEARTBEAT_SECONDS', 15)
+        app.config.setdefault('LIVE_MAX_SECONDS', 300)
+        app.config.setdefault('LIVE_QUEUE_SIZE', 100)
+        app.config.setdefault('LIVE_RETRY_SECONDS', 30)
+
+        self.max_connections = app.config['LIVE_MAX_CONNECTIONS']
+        self.max_per_user = app.config['LIVE_MAX_PER_USER']
+        self.heartbeat_seconds = app.config['LIVE_HEARTBEAT_SECONDS']
+        self.max_seconds = app.config['LIVE_MAX_SECONDS']
+        self.queue_size = app.config['LIVE_QUEUE_SIZE']
+        self.retry_seconds = app.config['LIVE_RETRY_SECONDS']
+        app.extensions['live_updates'] = self
+
+    def publish(self, channel, name, data=None):
+        """Send an event to every stream on `channel`; never blocks."""
+        with self.lock:
+            subscriptions = list(self.channels.get(channel, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.queue.put_nowait((name, data))
+            except queue.Full:
+                self.close(subscription, 'resync')
+
+    def close(self, subscription, reason):
+        """End a stream at its next wake-up."""
+        if subscription.closed is None:
+            subscription.closed = reason
+        try:
+            subscription.queue.put_nowait(None)
+        except queue.Full:
+            pass  # the stream checks `closed` before reading its queue
+
+    def kick(self, user_id, reason='banned'):
+        """End every stream of a user in this worker."""
+        with self.lock:
+            subscriptions = list(self.connections.get(user_id, ()))
+        for subscription in subscriptions:
+            self.close(subscription, reason)
+
+    def connect(self, user_id, channels, environ=None):
+        """Register a stream, or return None when this worker is at its limit.
+
+        Also None when `environ` shows a server that runs one request per
+        worker at a time, where a stream would block the whole worker.
+        """
+        if environ is not None and not environ.get('wsgi.multithread'):
+            return None
+        subscription = Subscription(user_id, channels, self.queue_size)
+        with self.lock:
+            mine = self.connections.setdefault(user_id, [])
+            replaced = mine[:len(mine) + 1 - self.max_per_user] if self.max_per_user else []
+            if self.count - len(replaced) >= self.max_connections:
+                return None
+            for old in replaced:
+                self._remove(old)
+            mine.append(subscription)
+            self.count += 1
+            for channel in channels:
+                self.channels.setdefault(channel, set()).add(subscription)
+        for old in replaced:
+            self.close(old, 'replaced')
+        return subscription
+
+    def disconnect(self, subscription):
+        with self.lock:
+            self._remove(subscription)
+
+    def _remove(self, subscription):
+        mine = self.connections.get(subscription.user_id, [])
+        if subscription not in mine:
+            return
+        mine.remove(subscription)
+        if not mine:
+            del self.connections[subscription.user_id]
+        self.count -= 1
+        for channel in subscription.channels:
+            members = self.channels.get(channel)
+            if members is not None:
+                members.discard(subscription)
+                if not members:
+                    del self.channels[channel]
+
+    def stream(self, subscription, update):
+        """The text/event-stream body for a subscription.
+
+        `update(subscription, event)` turns a published (name, data) event,
+        or None on a heartbeat or at `subscription.wake_at`, into a list of
+        (name, data) to send.
+        """
+        deadline = time.monotonic() + self.max_seconds
+        try:
+            yield 'retry: 2000\n\n'  # reconnect quickly after LIVE_MAX_SECONDS
+            yield from self._format(update(subscription, None))
+            next_beat = time.monotonic() + self.heartbeat_seconds
+            while subscription.closed is None:
+                now = time.monotonic()
+                if now >= deadline:
+                    break
+                wake = min(next_beat, deadline, subscription.wake_at or deadline)
+                try:
+                    item = subscription.queue.get(timeout=max(0.0, wake - now))
+                except queue.Empty:
+                    item = None
+                if subscription.closed is not None:
+                    break
+                if item is not None:
+                    yield from self._format(update(subscription, item))
+                    continue
+                if subscription.wake_at is not None and time.monotonic() >= subscription.wake_at:
+                    subscription.wake_at = None
+                if time.monotonic() >= next_beat:
+                    next_beat = time.monotonic() + self.heartbeat_seconds
+                    yield ': ping\n\n'
+                yield from self._format(update(subscription, None))
+            if subscription.closed is not None:
+                yield from self._format([(subscription.closed, None)])
+        finally:
+            self.disconnect(subscription)
+
+    def refused(self, body):
+        """503 for a refused stream; Retry-After says when to try streaming again."""
+        response = jsonify(dict(body, error='Live updates are unavailable; poll instead',
+                                retry_after=self.retry_seconds))
+        response.status_code = 503
+        response.headers['Retry-After'] = str(self.retry_seconds)
+        return response
+
+    def response(self, subscription, update):
+        return Response(self.stream(subscription, update), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    def _format(self, messages):
+        for name, data in messages:
+            yield f'event: {name}\ndata: {json.dumps(data)}\n\n'
+
+
+live_updates = LiveUpdates()
+
+
+@activity_feed.subscribe
+def push_activity(event):
+    live_updates.publish('admins', 'activity', serialize(event))
+
+
+@event.listens_for(Session, 'after_commit')
+def push_balances(session):
+    # ledger.post() notes whose balance moved; tell them once it is committed
+    for user_id in session.info.pop('moved_balances', ()):
+        live_updates.publish(f'user:{user_id}', 'balance')
+
+
+@event.listens_for(Session, 'after_rollback')
+def forget_balances(session):
+    session.info.pop('moved_balances', None)
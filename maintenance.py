@@ -0,0 +1,299 @@
+"""Offline maintenance for the SQLite database.
+
+Every job here works in small steps, each its own short transaction,
+with a pause in between, so it can run against the live database while
+request workers keep writing. They are meant for `flask` CLI commands,
+not request handlers.
+"""
+import math
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from database import db, TrackChartScore, upsert
+from search import reindex_tracks
+
+CHUNK_ROWS = 5000
+PAUSE = 0.05  # seconds between steps, for writers waiting on the lock
+
+
+def _timestamp(value):
+    """A datetime in the text form SQLAlchemy stores for DateTime columns."""
+    return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+def database_path():
+    """Path of the SQLite file behind db.engine, or None for other databases."""
+    url = db.engine.url
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        return None
+    return url.database
+
+
+def connect():
+    """A separate autocommit connection; jobs open their own transactions."""
+    conn = sqlite3.connect(database_path(), timeout=30, isolation_level=None)
+    conn.execute('PRAGMA busy_timeout = 30000')
+    return conn
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _write_chunks(conn, sql, rows, chunk, pause, progress):
+    done = 0
+    for part in _chunks(rows, chunk):
+        conn.execute('BEGIN IMMEDIATE')
+        conn.executemany(sql, part)
+        conn.execute('COMMIT')
+        done += len(part)
+        if progress:
+            progress(done, len(rows))
+        time.sleep(pause)
+    return done
+
+
+def backup(target, pages=1024, pause=PAUSE, progress=None):
+    """Copy the live database to `target` with SQLite's online backup API.
+
+    In WAL mode the copy is a single step: one read transaction, which
+    writers do not wait for. In rollback-journal mode a step holds off
+    writers, so `pages` pages are copied per step with `pause` seconds in
+    between; a write between steps restarts the copy, so a busy database
+    needs WAL mode (PRAGMA journal_mode=WAL) to be backed up reliably. The
+    copy is written next to `target` and only moved into place once it
+    passes quick_check. Returns the number of pages copied.
+    """
+    partial = target + '.partial'
+    source = connect()
+    destination = sqlite3.connect(partial)
+    try:
+        def step(status, remaining, total):
+            if progress:
+                progress(total - remaining, total)
+            time.sleep(pause)
+
+        wal = source.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        source.backup(destination, pages=-1 if wal else pages, progress=step)
+        check = destination.execute('PRAGMA quick_check').fetchone()[0]
+        copied = destination.execute('PRAGMA page_count').fetchone()[0]
+    finally:
+        destination.close()
+        source.close()
+    if check != 'ok':
+        os.remove(partial)
+        raise sqlite3.DatabaseError(f'Backup failed quick_check: {check}')
+    os.replace(partial, target)
+    return copied
+
+
+def analyze(pause=PAUSE, progress=None):
+    """Refresh query planner statistics one table at a time.
+
+    analysis_limit makes ANALYZE sample each index instead of reading all
+    of it, which keeps every step short on large tables.
+    """
+    conn = connect()
+    try:
+        conn.execute('PRAGMA analysis_limit = 1000')
+        tables = [name for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' "
+            "AND sql NOT LIKE 'CREATE VIRTUAL TABLE%' ORDER BY name")]
+        for done, table in enumerate(tables, start=1):
+            conn.execute(f'ANALYZE "{table}"')
+            if progress:
+                progress(done, len(tables))
+            time.sleep(pause)
+        conn.execute('PRAGMA optimize')
+        return len(tables)
+    finally:
+        conn.close()
+
+
+def vacuum(pages=1000, pause=PAUSE, incremental=False, progress=None):
+    """Give free pages back to the filesystem; returns how many were freed.
+
+    In auto_vacuum=INCREMENTAL mode the free list is released `pages` at a
+    time. Otherwise this is a full VACUUM, which rewrites the file and
+    blocks writers until it finishes; `incremental` switches the database
+    to incremental mode during that VACUUM so later runs can be chunked.
+    """
+    conn = connect()
+    try:
+        free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+            remaining = free
+            while remaining:
+                # executescript steps the pragma to completion; execute frees one page
+                conn.executescript(f'PRAGMA incremental_vacuum({int(pages)})')
+                remaining = conn.execute('PRAGMA freelist_count').fetchone()[0]
+                if progress:
+                    progress(free - remaining, free)
+                time.sleep(pause)
+            return free
+        if incremental:
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+        if progress:
+            progress(free, free)
+        return free
+    finally:
+        conn.close()
+
+
+def recompute_counters(half_life_hours, epoch, chunk=CHUNK_ROWS, pause=PAUSE, progress=None):
+    """Bring MusicTrack.plays and the chart rollups back in line with ListeningHistory.
+
+    History up to the newest row at the start is counted one range of ids
+    per short read. Tracks are then compared a range of ids at a time, each
+    range in its own read that also counts the history written since the
+    start, so only the difference is added back and plays credited while
+    this runs are not lost. Plays still in counter shards count as stored.
+    `progress(stage, done, total)` hears about the 'history', 'tracks' and
+    'writing' stages.
+
+    Earnings and balances are not recomputed. History keeps the streamer's
+    share of a play but not the artist's, and balances come from the
+    ledger, which `flask reconcile-ledger` checks. Chart scores assume
+    `epoch` stays put, so do not run this while scores are being rescaled.
+    Returns (plays fixed, scores fixed).
+    """
+    conn = connect()
+    try:
+        try:
+            conn.execute('SELECT exp(0)')
+        except sqlite3.OperationalError:
+            conn.create_function('exp', 1, math.exp, deterministic=True)  # SQLite built without math functions
+
+        # listening_history has no track_id index, so it is read in primary key ranges
+        history = """
+            SELECT track_id, count(*), sum(exp(:rate * (julianday(listened_at) - julianday(:epoch)) * 86400.0))
+            FROM listening_history WHERE {} AND track_id IS NOT NULL GROUP BY track_id
+        """
+        rate = math.log(2) / (half_life_hours * 3600)
+        params = {'rate': rate, 'epoch': _timestamp(epoch)}
+        watermark = conn.execute('SELECT max(id) FROM listening_history').fetchone()[0] or 0
+        counted = {}
+        for first in range(1, watermark + 1, chunk):
+            for track_id, count, score in conn.execute(history.format('id BETWEEN :first AND :last'),
+                                                       dict(params, first=first, last=min(first + chunk - 1, watermark))):
+                plays_so_far, score_so_far = counted.get(track_id, (0, 0.0))
+                counted[track_id] = (plays_so_far + count, score_so_far + score)
+            if progress:
+                progress('history', min(first + chunk - 1, watermark), watermark)
+            time.sleep(pause)
+
+        plays, scores = [], []
+        now = datetime.utcnow()
+        last_track = conn.execute('SELECT max(id) FROM music_track').fetchone()[0] or 0
+        for first in range(1, last_track + 1, chunk):
+            last = min(first + chunk - 1, last_track)
+            conn.execute('BEGIN')
+            rows = conn.execute("""
+                SELECT t.id, coalesce(t.plays, 0) + coalesce(c.plays, 0), coalesce(s.score, 0)
+                FROM music_track t
+                LEFT JOIN track_chart_score s ON s.track_id = t.id
+                LEFT JOIN (SELECT key, sum(value) AS plays FROM counter_shard
+                           WHERE name = 'track_plays' AND key BETWEEN :first AND :last GROUP BY key) c
+                       ON c.key = t.id
+                WHERE t.id BETWEEN :first AND :last
+            """, {'first': first, 'last': last}).fetchall()
+            recent = {track_id: (count, score) for track_id, count, score in conn.execute(
+                history.format('id > :watermark AND track_id BETWEEN :first AND :last'),
+                dict(params, watermark=watermark, first=first, last=last))}
+            conn.execute('COMMIT')
+
+            for track_id, stored_plays, stored_score in rows:
+                older_plays, older_score = counted.get(track_id, (0, 0.0))
+                newer_plays, newer_score = recent.get(track_id, (0, 0.0))
+                if older_plays + newer_plays != stored_plays:
+                    plays.append((older_plays + newer_plays - stored_plays, track_id))
+                computed = older_score + newer_score
+                if abs(computed - stored_score) > 1e-9 * max(1.0, abs(computed)):
+                    scores.append((track_id, computed - stored_score, now))
+            if progress:
+                progress('tracks', last, last_track)
+            time.sleep(pause)
+
+        total = len(plays) + len(scores)
+        report = (lambda done, _: progress('writing', done, total)) if progress else None
+        _write_chunks(conn, 'UPDATE music_track SET plays = plays + ? WHERE id = ?', plays, chunk, pause, report)
+        table = TrackChartScore.__table__
+        done = 0
+        for part in _chunks(scores, chunk):
+            with db.engine.begin() as connection:
+                statement = upsert(connection, table)
+                connection.execute(statement.on_conflict_do_update(
+                    index_elements=[table.c.track_id],
+                    set_={'score': table.c.score + statement.excluded.score,
+                          'updated_at': statement.excluded.updated_at}
+                ), [{'track_id': track_id, 'score': delta, 'updated_at': when} for track_id, delta, when in part])
+            done += len(part)
+            if progress:
+                progress('writing', len(plays) + done, total)
+            time.sleep(pause)
+        return len(plays), len(scores)
+    finally:
+        conn.close()
+
+
+def purge_expired(play_session_age, chunk=CHUNK_ROWS, pause=PAUSE, now=None):
+    """Lift bans past their expiry and delete play sessions older than `play_session_age` seconds.
+
+    Returns (bans lifted, play sessions deleted).
+    """
+    now = now or datetime.utcnow()
+    conn = connect()
+    try:
+        banned = conn.execute('SELECT id FROM user WHERE is_banned = 1 AND ban_expiry IS NOT NULL '
+                              'AND ban_expiry < ?', (_timestamp(now),)).fetchall()
+        lifted = _write_chunks(conn, 'UPDATE user SET is_banned = 0, ban_expiry = NULL, ban_reason = NULL, '
+                                     'banned_at = NULL WHERE id = ? AND is_banned = 1',
+                               banned, chunk, pause, None)
+
+        cutoff = _timestamp(now - timedelta(seconds=play_session_age))
+        stale = conn.execute('SELECT id FROM play_session WHERE started_at < ?', (cutoff,)).fetchall()
+        deleted = _write_chunks(conn, 'DELETE FROM play_session WHERE id = ?', stale, chunk, pause, None)
+        return lifted, deleted
+    finally:
+        conn.close()
+
+
+def rebuild_indexes(search=True, chunk=CHUNK_ROWS, pause=PAUSE, progress=None):
+    """REINDEX each index on its own, then rebuild the search index a range of track ids at a time.
+
+    Returns the number of b-tree indexes rebuilt.
+    """
+    conn = connect()
+    try:
+        names = [name for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' ORDER BY name")]
+        for done, name in enumerate(names, start=1):
+            conn.execute(f'REINDEX "{name}"')
+            if progress:
+                progress('indexes', done, len(names))
+            time.sleep(pause)
+
+        has_search = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'track_search'").fetchone()
+        if search and has_search:
+            first, last = conn.execute('SELECT min(id), max(id) FROM music_track').fetchone()
+            if first is not None:
+                for start in range(first, last + 1, chunk):
+                    with db.engine.begin() as connection:
+                        reindex_tracks(connection, start, start + chunk - 1)
+                    if progress:
+                        progress('search', min(start + chunk, last + 1) - first, last + 1 - first)
+                    time.sleep(pause)
+            # Merge the index segments a few hundred pages at a time
+            while True:
+                before = conn.total_changes
+                conn.execute("INSERT INTO track_search (track_search, rank) VALUES ('merge', 500)")
+                if conn.total_changes - before < 2:
+                    break
+                time.sleep(pause)
+        return len(names)
+    finally:
+        conn.close()
@@ -0,0 +1,183 @@
+import sqlite3
+import threading
+import time
+import json
+
+
+class RingCache:
+    """Fixed-size ring buffer with a key index.
+
+    New entries overwrite the oldest slot, so memory stays constant no matter
+    how many plays come through. Lookups and inserts are O(1).
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.keys = [None] * capacity
+        self.stamps = [0.0] * capacity
+        self.values = [None] * capacity
+        self.index = {}
+        self.head = 0
+
+    def get(self, key):
+        slot = self.index.get(key)
+        if slot is None:
+            return None
+        return self.stamps[slot], self.values[slot]
+
+    def put(self, key, stamp, value=None):
+        slot = self.head
+        old_key = self.keys[slot]
+        # Only drop the old key if it still points at this slot
+        if old_key is not None and self.index.get(old_key) == slot:
+            del self.index[old_key]
+        self.keys[slot] = key
+        self.stamps[slot] = stamp
+        self.values[slot] = value
+        self.index[key] = slot
+        self.head = (slot + 1) % self.capacity
+
+    def clear(self):
+        self.keys = [None] * self.capacity
+        self.stamps = [0.0] * self.capacity
+        self.values = [None] * self.capacity
+        self.index = {}
+        self.head = 0
+
+
+class SQLiteFallback:
+    """Shared store so gunicorn workers see each other's recent plays."""
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self.writes = 0
+
+    def connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS recent_plays ('
+                         'key TEXT PRIMARY KEY, stamp REAL NOT NULL, payload TEXT)')
+            self.local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self.connection().execute(
+            'SELECT stamp, payload FROM recent_plays WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]) if row[1] else None
+
+    def put(self, key, stamp, value=None):
+        conn = self.connection()
+        conn.execute('INSERT OR REPLACE INTO recent_plays (key, stamp, payload) VALUES (?, ?, ?)',
+                     (key, stamp, json.dumps(value) if value is not None else None))
+        self.writes += 1
+
+    def prune(self, older_than):
+        self.connection().execute('DELETE FROM recent_plays WHERE stamp < ?', (older_than,))
+
+
+class PlayGuard:
+    """Rejects replayed and too-frequent play requests before they hit the database.
+
+    Two kinds of keys are tracked:
+    - (streamer_id, track_id): a play of the same track by the same streamer
+      inside PLAY_MIN_INTERVAL seconds is refused.
+    - (streamer_id, idempotency key): a retried request gets the original
+      response back instead of being credited twice.
+    """
+
+    def __init__(self, app=None):
+        self.lock = threading.Lock()
+        self.min_interval = 30
+        self.idempotency_ttl = 24 * 60 * 60
+        self.recent = RingCache(65536)
+        self.fallback = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PLAY_MIN_INTERVAL', 30)
+        app.config.setdefault('PLAY_IDEMPOTENCY_TTL', 24 * 60 * 60)
+        app.config.setdefault('PLAY_DEDUPE_CAPACITY', 65536)
+        app.config.setdefault('PLAY_DEDUPE_SQLITE', None)
+
+        self.min_interval = app.config['PLAY_MIN_INTERVAL']
+        self.idempotency_ttl = app.config['PLAY_IDEMPOTENCY_TTL']
+        self.recent = RingCache(app.config['PLAY_DEDUPE_CAPACITY'])
+        if app.config['PLAY_DEDUPE_SQLITE']:
+            self.fallback = SQLiteFallback(app.config['PLAY_DEDUPE_SQLITE'])
+        app.extensions['play_guard'] = self
+
+    def _lookup(self, key):
+        hit = self.recent.get(key)
+        if hit is None and self.fallback is not None:
+            try:
+                hit = self.fallback.get(key)
+            except sqlite3.Error:
+                hit = None
+            if hit is not None:
+                self.recent.put(key, hit[0], hit[1])
+        return hit
+
+    def _store(self, key, stamp, value=None):
+        self.recent.put(key, stamp, value)
+        if self.fallback is not None:
+            try:
+                self.fallback.put(key, stamp, value)
+                if self.fallback.writes % 1000 == 0:
+                    self.fallback.prune(stamp - max(self.min_interval, self.idempotency_ttl))
+            except sqlite3.Error:
+                pass
+
+    def replayed(self, streamer_id, idempotency_key):
+        """Return the stored response for a retried request, or None."""
+        if not idempotency_key:
+            return None
+        key = f'i:{streamer_id}:{idempotency_key}'
+        with self.lock:
+            hit = self._lookup(key)
+        if hit is None or time.time() - hit[0] > self.idempotency_ttl:
+            return None
+        return hit[1]
+
+    def acquire(self, streamer_id, track_id):
+        """Reserve a play slot; False if the same track was played too recently."""
+        key = f'p:{streamer_id}:{track_id}'
+        now = time.time()
+        with self.lock:
+            hit = self._lookup(key)
+            if hit is not None and now - hit[0] < self.min_interval:
+                return False
+            self._store(key, now)
+        return True
+
+    def retry_after(self, streamer_id, track_id):
+        """Seconds until the streamer may be credited for this track again."""
+        hit = self.recent.get(f'p:{streamer_id}:{track_id}')
+        if hit is None:
+            return 0
+        return max(0, int(self.min_interval - (time.time() - hit[0])) + 1)
+
+    def release(self, streamer_id, track_id):
+        """Give back a reservation when the play could not be recorded."""
+        with self.lock:
+            self._store(f'p:{streamer_id}:{track_id}', 0.0)
+
+    def remember(self, streamer_id, idempotency_key, response):
+        """Store the response for an idempotency key so retries get it back."""
+        if not idempotency_key:
+            return
+        with self.lock:
+            self._store(f'i:{streamer_id}:{idempotency_key}', time.time(), response)
+
+    def clear(self):
+        with self.lock:
+            self.recent.clear()
+
+
+play_guard = PlayGuard()
@@ -0,0 +1,312 @@
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from sqlalchemy import bindparam, exists
+
+from database import db, PlaySession, ActivePlay, upsert
+
+MAX_STAMPS = 32  # buffered heartbeats kept per session between flushes
+FLUSH_CHUNK = 500  # sessions looked up per query in a flush
+
+
+class PlaySessions:
+    """Heartbeat-based play validation.
+
+    Starting a play creates a PlaySession row and hands the client a signed
+    token. The client then sends a small heartbeat every few seconds while
+    audio is playing. Heartbeats only touch memory: each worker buffers the
+    server time and playback position of every heartbeat it takes, and
+    every PLAY_HEARTBEAT_FLUSH_INTERVAL seconds writes them in one
+    transaction. The flush that brings a session's listened time up to
+    PLAY_CREDIT_FRACTION of the track duration credits it.
+
+    Listened time comes from the server clock, not the client. A heartbeat
+    adds at most two heartbeat intervals since the one before and the total
+    never exceeds the wall-clock time since the session started, so seeking
+    or sending heartbeats faster does not earn credit sooner. A flush merges
+    a session's buffered heartbeats onto the last_heartbeat in its row,
+    skipping any at or before it, and only writes if the row still holds
+    that value. Heartbeats spread over several workers, retried or
+    duplicated are therefore counted once, whichever worker flushes first;
+    a flush that loses the race merges its heartbeats again next time. A
+    worker that exits loses at most its unflushed heartbeats.
+
+    Only one session per streamer accrues time, the one named in their
+    ActivePlay row. Starting a play or the first heartbeat of a queued
+    session takes that over and closes the previous session for good, so a
+    client heartbeating several queued tokens at once earns one play.
+    """
+
+    def __init__(self, app=None):
+        self.lock = threading.Lock()
+        self.serializer = None
+        self.stream_serializer = None
+        self.credit_callback = None
+        self.pending = {}    # session id -> [(server time, position)] since the last flush
+        self.credited = set()
+        self.last_flush = time.time()
+        self.flushing = False
+        self.flush_interval = 15
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PLAY_CREDIT_FRACTION', 0.5)
+        app.config.setdefault('PLAY_CREDIT_FALLBACK_SECONDS', 30)
+        app.config.setdefault('PLAY_HEARTBEAT_INTERVAL', 10)
+        app.config.setdefault('PLAY_HEARTBEAT_FLUSH_INTERVAL', 15)
+        app.config.setdefault('PLAY_TOKEN_MAX_AGE', 6 * 60 * 60)
+        app.config.setdefault('PLAY_STREAM_URL_MAX_AGE', 30 * 60)
+        app.config.setdefault('PLAY_QUEUE_MAX', 10)
+
+        self.fraction = app.config['PLAY_CREDIT_FRACTION']
+        self.fallback_seconds = app.config['PLAY_CREDIT_FALLBACK_SECONDS']
+        self.interval = app.config['PLAY_HEARTBEAT_INTERVAL']
+        self.flush_interval = app.config['PLAY_HEARTBEAT_FLUSH_INTERVAL']
+        self.pending, self.credited = {}, set()
+        self.max_age = app.config['PLAY_TOKEN_MAX_AGE']
+        self.stream_max_age = app.config['PLAY_STREAM_URL_MAX_AGE']
+        self.serializer = URLSafeTimedSerializer(app.config['SECRET_KEY'], salt='play-session')
+        self.stream_serializer = URLSafeTimedSerializer(app.config['SECRET_KEY'], salt='stream-url')
+        app.extensions['play_sessions'] = self
+
+    def credit_handler(self, callback):
+        """Register the function that credits a qualified play.
+
+        It is called as ``callback(play_session)`` inside the crediting
+        transaction and must not commit.
+        """
+        self.credit_callback = callback
+        return callback
+
+    def required_seconds(self, track):
+        if track.duration:
+            return max(1.0, track.duration * self.fraction)
+        return float(self.fallback_seconds)
+
+    def start(self, streamer_id, track, session=None):
+        """Open a play session for a track and return its signed token.
+
+        Commits `session`, which defaults to db.session.
+        """
+        if session is None:
+            session = db.session
+        now = datetime.utcnow()
+        play = PlaySession(
+            id=uuid.uuid4().hex,
+            streamer_id=streamer_id,
+            track_id=track.id,
+            started_at=now,
+            last_heartbeat=now,
+            required_seconds=self.required_seconds(track),
+        )
+        session.add(play)
+        self._claim(session, streamer_id, play.id, now)
+        session.commit()
+        return self.serializer.dumps([play.id, streamer_id])
+
+    def start_many(self, streamer_id, tracks, session=None):
+        """Open play sessions for queued tracks in one commit; returns their tokens in order.
+
+        Listened time starts at a session's first heartbeat, so tracks
+        waiting in the queue do not accrue any, and that heartbeat closes
+        the session that was playing before.
+        """
+        if session is None:
+            session = db.session
+        plays = [PlaySession(
+            id=uuid.uuid4().hex,
+            streamer_id=streamer_id,
+            track_id=track.id,
+            required_seconds=self.required_seconds(track),
+        ) for track in tracks]
+        session.add_all(plays)
+        session.commit()
+        return [self.serializer.dumps([play.id, streamer_id]) for play in plays]
+
+    def stream_token(self, streamer_id, filename):
+        """Sign a short-lived grant for one streamer to fetch an upload."""
+        return self.stream_serializer.dumps([filename, streamer_id])
+
+    def stream_file(self, token):
+        """Return (filename, streamer id) for a valid stream token, or None."""
+        try:
+            filename, streamer_id = self.stream_serializer.loads(token, max_age=self.stream_max_age)
+        except (BadSignature, SignatureExpired, ValueError, TypeError):
+            return None
+        return filename, streamer_id
+
+    def decode(self, token):
+        """Return (session id, streamer id) for a valid token, or None."""
+        try:
+            session_id, streamer_id = self.serializer.loads(token, max_age=self.max_age)
+        except (BadSignature, SignatureExpired, ValueError, TypeError):
+            return None
+        return session_id, streamer_id
+
+    def heartbeat(self, session_id, position=None, now=None):
+        """Buffer a heartbeat for the next flush.
+
+        Returns True once a flush in this worker has seen the session
+        credited.
+        """
+        if now is None:
+            now = datetime.utcnow()
+        with self.lock:
+            if session_id in self.credited:
+                return True
+            stamps = self.pending.setdefault(session_id, [])
+            stamps.append((now, position))
+            if len(stamps) > MAX_STAMPS:
+                del stamps[0]  # only the latest matter; a gap is capped like any other
+        return False
+
+    def is_credited(self, session_id):
+        with self.lock:
+            return session_id in self.credited
+
+    def flush_due(self):
+        return not self.flushing and time.time() - self.last_flush >= self.flush_interval
+
+    def flush(self):
+        """Write buffered heartbeats and credit sessions that qualified; commits.
+
+        Returns the number of sessions credited.
+        """
+        with self.lock:
+            if self.flushing:
+                return 0
+            self.flushing = True
+            pending, self.pending = self.pending, {}
+            self.last_flush = time.time()
+        retry = pending
+        try:
+            credited, retry = self._write(pending)
+            return len(credited)
+        finally:
+            with self.lock:
+                # Heartbeats another worker's flush overtook are merged again next time
+                for session_id, stamps in retry.items():
+                    self.pending[session_id] = stamps + self.pending.get(session_id, [])
+                self.flushing = False
+
+    def _write(self, pending):
+        """Merge buffered stamps into their sessions' rows; returns (sessions credited, stamps to retry)."""
+        if not pending:
+            return [], {}
+        table = PlaySession.__table__
+        active = ActivePlay.__table__
+        plays = {}
+        ids = list(pending)
+        for offset in range(0, len(ids), FLUSH_CHUNK):
+            plays.update((play.id, play) for play in PlaySession.query
+                         .filter(PlaySession.id.in_(ids[offset:offset + FLUSH_CHUNK]))
+                         .populate_existing())
+        streamer_ids = list({play.streamer_id for play in plays.values()})
+        accruing = {}
+        for offset in range(0, len(streamer_ids), FLUSH_CHUNK):
+            accruing.update(db.session.query(ActivePlay.streamer_id, ActivePlay.play_session_id)
+                            .filter(ActivePlay.streamer_id.in_(streamer_ids[offset:offset + FLUSH_CHUNK])))
+
+        claims, updates, credited = [], [], []
+        for session_id, stamps in pending.items():
+            play = plays.get(session_id)
+            if play is None:
+                continue
+            if play.credited:
+                credited.append(session_id)
+                continue
+            stamps = sorted(stamps, key=lambda stamp: stamp[0])
+            last, position = play.last_heartbeat, play.last_position or 0.0
+            if accruing.get(play.streamer_id) != session_id:
+                if last is not None:
+                    continue  # another session of the streamer took over
+                # A queued session's first heartbeat starts its clock and makes it the one that accrues
+                (last, first_position), stamps = stamps[0], stamps[1:]
+                position = first_position or 0.0
+                claims.append((last, play.streamer_id, session_id, first_position))
+
+            # Stamps at or before the row's clock were counted by another worker's flush
+            expected, listened = last, play.listened_seconds or 0.0
+            for at, at_position in stamps:
+                if at <= last:
+                    continue
+                # Paused audio does not move the position forward
+                if at_position is None or at_position > position:
+                    listened += min((at - last).total_seconds(), self.interval * 2)
+                last = at
+                if at_position is not None:
+                    position = at_position
+            if last == expected:
+                continue
+            listened = min(listened, (last - play.started_at).total_seconds())
+            updates.append({'sid': session_id, 'streamer': play.streamer_id, 'expected': expected,
+                            'last': last, 'position': position, 'listened': listened,
+                            'credit': listened >= play.required_seconds,
+                        'credit_time': last if listened >= play.required_seconds else None})
+
+        # In stamp order, so of two queued sessions started together the later one accrues
+        for at, streamer_id, session_id, first_position in sorted(claims, key=lambda claim: claim[0]):
+            claimed = db.session.execute(
+                table.update()
+                .where(table.c.id == session_id)
+                .where(table.c.last_heartbeat == None)
+                .values(last_heartbeat=at, last_position=first_position)
+            ).rowcount
+            if claimed:
+                self._claim(db.session, streamer_id, session_id, at)
+
+        newly, retry = [], {}
+        if updates:
+            # Only while the row's clock is the one the time was merged onto and the session still accrues
+            db.session.execute(
+                table.update()
+                .where(table.c.id == bindparam('sid'))
+                .where(table.c.credited == False)
+                .where(table.c.last_heartbeat == bindparam('expected'))
+                .where(exists()
+                       .where(active.c.streamer_id == bindparam('streamer'))
+                       .where(active.c.play_session_id == bindparam('sid')))
+                .values(last_heartbeat=bindparam('last'), last_position=bindparam('position'),
+                        listened_seconds=bindparam('listened'), credited=bindparam('credit'),
+                        credited_at=bindparam('credit_time')),
+                updates
+            )
+            written = {update['sid']: update for update in updates}
+            for play in PlaySession.query.filter(PlaySession.id.in_(list(written))).populate_existing():
+                update = written[play.id]
+                if play.last_heartbeat == update['last']:
+                    if update['credit']:
+                        newly.append(play)
+                elif play.credited:
+                    credited.append(play.id)
+                else:
+                    retry[play.id] = pending[play.id]
+        for play in newly:
+            credited.append(play.id)
+            if self.credit_callback is not None:
+                self.credit_callback(play)
+        db.session.commit()
+
+        with self.lock:
+            if len(self.credited) > 100000:
+                self.credited.clear()  # only kept so late heartbeats get a quick answer
+            self.credited.update(credited)
+        return newly, retry
+
+    def _claim(self, session, streamer_id, session_id, now):
+        """Make a session the streamer's only accruing one; does not commit."""
+        active = ActivePlay.__table__
+        statement = upsert(session, active).values(streamer_id=streamer_id, play_session_id=session_id,
+                                                   claimed_at=now)
+        session.execute(statement.on_conflict_do_update(
+            index_elements=[active.c.streamer_id],
+            set_={'play_session_id': statement.excluded.play_session_id,
+                  'claimed_at': statement.excluded.claimed_at}
+        ))
+
+
+play_sessions = PlaySessions()
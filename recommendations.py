@@ -0,0 +1,176 @@
+from array import array
+from datetime import datetime
+
+from database import db, ListeningHistory, MusicTrack, TrackNeighbors
+from cache import LRUCache
+
+
+def compute_neighbors(streamer_ids, track_ids, top_n=50, block_size=2048):
+    """Item-item cosine similarity from who listened to what.
+
+    `streamer_ids` and `track_ids` are parallel sequences of listens. Each
+    (streamer, track) pair counts once however often it was played. The
+    co-occurrence matrix X^T X is computed one block of tracks at a time so
+    memory stays bounded on large catalogs.
+
+    Returns {track_id: (neighbor_ids, scores)} with NumPy arrays sorted by
+    descending score.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    streamer_ids = np.asarray(streamer_ids, dtype=np.int64)
+    track_ids = np.asarray(track_ids, dtype=np.int64)
+    if not len(track_ids):
+        return {}
+
+    users, user_index = np.unique(streamer_ids, return_inverse=True)
+    items, item_index = np.unique(track_ids, return_inverse=True)
+    listens = sparse.csr_matrix(
+        (np.ones(len(item_index), dtype=np.float32), (user_index, item_index)),
+        shape=(len(users), len(items))
+    )
+    listens.data[:] = 1.0  # duplicates were summed; keep it binary
+
+    listeners = np.asarray(listens.sum(axis=0)).ravel()
+    norms = np.sqrt(listeners)
+    by_item = listens.T.tocsr()
+
+    neighbors = {}
+    for start in range(0, len(items), block_size):
+        stop = min(start + block_size, len(items))
+        block = (by_item @ listens[:, start:stop]).tocsc()
+        for column in range(stop - start):
+            item = start + column
+            lo, hi = block.indptr[column], block.indptr[column + 1]
+            other = block.indices[lo:hi]
+            counts = block.data[lo:hi]
+            keep = other != item
+            other, counts = other[keep], counts[keep]
+            if not len(other):
+                continue
+            scores = counts / (norms[item] * norms[other])
+            if len(scores) > top_n:
+                best = np.argpartition(-scores, top_n)[:top_n]
+                other, scores = other[best], scores[best]
+            order = np.argsort(-scores, kind='stable')
+            neighbors[int(items[item])] = (items[other[order]], scores[order].astype(np.float32))
+    return neighbors
+
+
+def pack_neighbors(neighbor_ids, scores):
+    """Pack neighbors into compact int32/float32 blobs for the database."""
+    return array('i', [int(n) for n in neighbor_ids]).tobytes(), array('f', [float(s) for s in scores]).tobytes()
+
+
+def unpack_neighbors(row):
+    ids = array('i')
+    ids.frombytes(row.neighbor_ids)
+    scores = array('f')
+    scores.frombytes(row.scores)
+    return ids, scores
+
+
+def rank_candidates(history, neighbors, limit=20):
+    """Score unheard tracks by summed similarity to the tracks in `history`.
+
+    `neighbors` maps a track id to (neighbor_ids, scores).
+    """
+    heard = set(history)
+    totals = {}
+    for track_id in heard:
+        entry = neighbors.get(track_id)
+        if entry is None:
+            continue
+        for neighbor_id, score in zip(*entry):
+            if neighbor_id not in heard:
+                totals[neighbor_id] = totals.get(neighbor_id, 0.0) + score
+    return sorted(totals.items(), key=lambda item: -item[1])[:limit]
+
+
+def rebuild_neighbor_table(top_n=50, since=None):
+    """Batch job: recompute the neighbor table from ListeningHistory."""
+    query = db.session.query(ListeningHistory.streamer_id, ListeningHistory.track_id)\
+        .filter(ListeningHistory.track_id.isnot(None))\
+        .distinct()
+    if since is not None:
+        query = query.filter(ListeningHistory.listened_at >= since)
+
+    streamer_ids, track_ids = array('q'), array('q')
+    for streamer_id, track_id in query.yield_per(100000):
+        streamer_ids.append(streamer_id)
+        track_ids.append(track_id)
+
+    neighbors = compute_neighbors(streamer_ids, track_ids, top_n=top_n)
+
+    now = datetime.utcnow()
+    table = TrackNeighbors.__table__
+    db.session.execute(table.delete())
+    batch = []
+    for track_id, (neighbor_ids, scores) in neighbors.items():
+        packed_ids, packed_scores = pack_neighbors(neighbor_ids, scores)
+        batch.append({'track_id': track_id, 'neighbor_ids': packed_ids, 'scores': packed_scores, 'built_at': now})
+        if len(batch) == 10000:
+            db.session.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+    db.session.commit()
+    return len(neighbors)
+
+
+class Recommender:
+    """Per-streamer "listeners also played" recommendations.
+
+    Answers come from an LRU cache keyed by streamer. A miss costs three
+    small indexed queries: the streamer's recent history, the neighbor rows
+    for those tracks and an active check on the candidates.
+    """
+
+    def __init__(self, app=None):
+        self.cache = LRUCache()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RECOMMENDATIONS_CACHE_SIZE', 10000)
+        app.config.setdefault('RECOMMENDATIONS_CACHE_TTL', 15 * 60)
+        app.config.setdefault('RECOMMENDATIONS_HISTORY_SIZE', 50)
+
+        self.cache = LRUCache(app.config['RECOMMENDATIONS_CACHE_SIZE'], app.config['RECOMMENDATIONS_CACHE_TTL'])
+        self.history_size = app.config['RECOMMENDATIONS_HISTORY_SIZE']
+        app.extensions['recommender'] = self
+
+    def for_streamer(self, streamer_id, limit=20):
+        depth = max(limit, 50)
+        cached = self.cache.get(streamer_id)
+        if cached is not None and cached[0] >= limit:
+            return cached[1][:limit]
+
+        history = [track_id for (track_id,) in db.session.query(ListeningHistory.track_id)
+                   .filter(ListeningHistory.streamer_id == streamer_id,
+                           ListeningHistory.track_id.isnot(None))
+                   .order_by(ListeningHistory.listened_at.desc())
+                   .limit(self.history_size)]
+        if not history:
+            self.cache.set(streamer_id, (depth, []))
+            return []
+
+        rows = TrackNeighbors.query.filter(TrackNeighbors.track_id.in_(set(history))).all()
+        neighbors = {row.track_id: unpack_neighbors(row) for row in rows}
+        ranked = rank_candidates(history, neighbors, limit=depth)
+
+        # Drop tracks that were removed or hidden since the last build
+        active = {track_id for (track_id,) in db.session.query(MusicTrack.id)
+                  .filter(MusicTrack.id.in_([track_id for track_id, _ in ranked]),
+                          MusicTrack.is_active == True)}
+        ranked = [(track_id, score) for track_id, score in ranked if track_id in active]
+
+        self.cache.set(streamer_id, (depth, ranked))
+        return ranked[:limit]
+
+    def forget(self, streamer_id):
+        self.cache.delete(streamer_id)
+
+
+recommender = Recommender()
@@ -0,0 +1,206 @@
+import re
+
+from sqlalchemy import event, text
+
+from database import db, MusicTrack, User
+
+# FTS5 table over the searchable track fields; rowid is the MusicTrack id
+SEARCH_TABLE_DDL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS track_search USING fts5(
+    title, description, genre, artist,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+# Triggers keep the index in step with music_track and user renames
+SEARCH_TRIGGERS_DDL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS track_search_ai AFTER INSERT ON music_track BEGIN
+        INSERT INTO track_search (rowid, title, description, genre, artist)
+        VALUES (new.id, new.title, coalesce(new.description, ''), coalesce(new.genre, ''),
+                coalesce((SELECT username FROM user WHERE id = new.artist_id), ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS track_search_ad AFTER DELETE ON music_track BEGIN
+        DELETE FROM track_search WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS track_search_au
+    AFTER UPDATE OF title, description, genre, artist_id ON music_track BEGIN
+        DELETE FROM track_search WHERE rowid = old.id;
+        INSERT INTO track_search (rowid, title, description, genre, artist)
+        VALUES (new.id, new.title, coalesce(new.description, ''), coalesce(new.genre, ''),
+                coalesce((SELECT username FROM user WHERE id = new.artist_id), ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS track_search_user_au AFTER UPDATE OF username ON user BEGIN
+        UPDATE track_search SET artist = new.username
+        WHERE rowid IN (SELECT id FROM music_track WHERE artist_id = new.id);
+    END
+    """,
+]
+
+# Column weights for bm25(): title, description, genre, artist
+BM25_WEIGHTS = '10.0, 1.0, 3.0, 5.0'
+
+MAX_PER_PAGE = 100
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def is_sqlite(bind):
+    return bind.dialect.name == 'sqlite'
+
+
+def create_search_index(connection):
+    """Create the FTS table and triggers, filling the index if it is empty."""
+    connection.execute(text(SEARCH_TABLE_DDL))
+    for ddl in SEARCH_TRIGGERS_DDL:
+        connection.execute(text(ddl))
+    indexed = connection.execute(text('SELECT count(*) FROM track_search')).scalar()
+    if not indexed:
+        rebuild_search_index(connection)
+
+
+INDEX_TRACKS_SQL = """
+    INSERT INTO track_search (rowid, title, description, genre, artist)
+    SELECT t.id, t.title, coalesce(t.description, ''), coalesce(t.genre, ''), coalesce(u.username, '')
+    FROM music_track t LEFT JOIN user u ON u.id = t.artist_id
+"""
+
+
+def rebuild_search_index(connection):
+    """Re-index every track from scratch."""
+    connection.execute(text('DELETE FROM track_search'))
+    connection.execute(text(INDEX_TRACKS_SQL))
+    connection.execute(text("INSERT INTO track_search (track_search) VALUES ('optimize')"))
+
+
+def reindex_tracks(connection, first_id, last_id):
+    """Re-index the tracks with ids from `first_id` to `last_id` inclusive."""
+    bounds = {'first': first_id, 'last': last_id}
+    connection.execute(text('DELETE FROM track_search WHERE rowid BETWEEN :first AND :last'), bounds)
+    connection.execute(text(INDEX_TRACKS_SQL + ' WHERE t.id BETWEEN :first AND :last'), bounds)
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_search_index(target, connection, **kw):
+    if is_sqlite(connection):
+        create_search_index(connection)
+
+
+def build_match_query(query):
+    """Turn free text into an FTS5 query where every word is a prefix term.
+
+    Only word characters are kept, so user input can never inject FTS syntax.
+    """
+    terms = TERM_RE.findall(query.lower())
+    return ' '.join(f'"{term}"*' for term in terms[:10])
+
+
+def search_tracks(query, genre=None, page=1, per_page=20):
+    """Search active tracks by title, description, genre and artist name.
+
+    Results are ranked with BM25 and paginated. Genre facets count the
+    matches per genre before the genre filter is applied.
+    """
+    page = max(1, page)
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    match = build_match_query(query or '')
+    if not match:
+        return {'query': query, 'results': [], 'total': 0, 'facets': [], 'page': page, 'per_page': per_page}
+
+    if not is_sqlite(db.engine):
+        return _search_like(query, genre, page, per_page)
+
+    facet_rows = db.session.execute(text("""
+        SELECT coalesce(t.genre, '') AS genre, count(*) AS hits
+        FROM track_search s JOIN music_track t ON t.id = s.rowid
+        WHERE track_search MATCH :match AND t.is_active = 1
+        GROUP BY coalesce(t.genre, '')
+        ORDER BY hits DESC
+    """), {'match': match}).fetchall()
+    facets = [{'genre': row.genre, 'count': row.hits} for row in facet_rows]
+
+    if genre:
+        total = sum(f['count'] for f in facets if f['genre'] == genre)
+    else:
+        total = sum(f['count'] for f in facets)
+
+    rows = []
+    if total:
+        rows = db.session.execute(text(f"""
+            SELECT t.id, t.title, t.genre, t.plays, t.duration, u.username AS artist,
+                   bm25(track_search, {BM25_WEIGHTS}) AS score
+            FROM track_search s
+            JOIN music_track t ON t.id = s.rowid
+            JOIN user u ON u.id = t.artist_id
+            WHERE track_search MATCH :match AND t.is_active = 1
+              AND (:genre IS NULL OR t.genre = :genre)
+            ORDER BY score
+            LIMIT :limit OFFSET :offset
+        """), {'match': match, 'genre': genre or None,
+               'limit': per_page, 'offset': (page - 1) * per_page}).fetchall()
+
+    return {
+        'query': query,
+        'results': [{
+            'id': row.id,
+            'title': row.title,
+            'artist': row.artist,
+            'genre': row.genre,
+            'plays': row.plays,
+            'duration': row.duration,
+            'score': round(-row.score, 6)
+        } for row in rows],
+        'total': total,
+        'facets': facets,
+        'page': page,
+        'per_page': per_page
+    }
+
+
+def _search_like(query, genre, page, per_page):
+    """Slow fallback for databases without FTS5."""
+    tracks = MusicTrack.query.join(User, User.id == MusicTrack.artist_id).filter(MusicTrack.is_active == True)
+    for term in TERM_RE.findall(query.lower())[:10]:
+        pattern = f'%{term}%'
+        tracks = tracks.filter(db.or_(MusicTrack.title.ilike(pattern),
+                                      MusicTrack.description.ilike(pattern),
+                                      MusicTrack.genre.ilike(pattern),
+                                      User.username.ilike(pattern)))
+
+    facet_rows = tracks.with_entities(MusicTrack.genre, db.func.count(MusicTrack.id))\
+        .group_by(MusicTrack.genre)\
+        .order_by(db.func.count(MusicTrack.id).desc())\
+        .all()
+    facets = [{'genre': g or '', 'count': n} for g, n in facet_rows]
+
+    if genre:
+        tracks = tracks.filter(MusicTrack.genre == genre)
+    total = tracks.count()
+    page_tracks = tracks.order_by(MusicTrack.plays.desc())\
+        .offset((page - 1) * per_page)\
+        .limit(per_page)\
+        .all()
+
+    return {
+        'query': query,
+        'results': [{
+            'id': track.id,
+            'title': track.title,
+            'artist': track.artist.username,
+            'genre': track.genre,
+            'plays': track.plays,
+            'duration': track.duration,
+            'score': None
+        } for track in page_tracks],
+        'total': total,
+        'facets': facets,
+        'page': page,
+        'per_page': per_page
+    }
@@ -0,0 +1,113 @@
+import math
+import threading
+import time
+from datetime import datetime
+
+from database import db, PlatformSetting, SettingsVersion
+from cache import fragment_cache
+
+# name -> (type, default, label shown to admins)
+SETTINGS = {
+    'artist_play_earnings': (float, 0.05, 'Artist earnings per play ($)'),
+    'streamer_play_earnings': (float, 0.02, 'Streamer earnings per play ($)'),
+    'ad_earnings': (float, 0.02, 'Earnings per ad watched ($)'),
+    'referral_bonus': (float, 5.0, 'Referral bonus ($)'),
+    'min_withdrawal': (float, 10.0, 'Minimum withdrawal amount ($)'),
+    'max_tracks_per_artist': (int, 50, 'Track limit per artist'),
+    'ad_duration': (int, 30, 'Ad watch duration (seconds)'),
+    'ad_unlock_minutes': (int, 30, 'Music unlocked per ad (minutes)'),
+}
+
+
+class PlatformSettings:
+    """Platform rates and limits that admins can change at runtime.
+
+    Values are kept in PlatformSetting and read from a dict in each
+    worker, so reading one costs no query. Every write also bumps the
+    single SettingsVersion row. Workers compare that version with their
+    own at most every SETTINGS_CHECK_SECONDS and reload the table when it
+    moved, so a change reaches every worker within that delay.
+
+    Fragments that show settings should include the ``settings`` cache
+    namespace; it is invalidated whenever a worker loads a new version.
+    """
+
+    def __init__(self, app=None):
+        self.lock = threading.Lock()
+        self.values = {name: default for name, (_, default, _) in SETTINGS.items()}
+        self.version = None
+        self.last_check = 0.0
+        self.check_seconds = 5
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SETTINGS_CHECK_SECONDS', 5)
+
+        self.check_seconds = app.config['SETTINGS_CHECK_SECONDS']
+        # Values loaded for another app's database do not carry over
+        self.values = {name: default for name, (_, default, _) in SETTINGS.items()}
+        self.version = None
+        self.last_check = 0.0
+        app.jinja_env.globals['settings'] = self
+        app.extensions['platform_settings'] = self
+
+    def __getitem__(self, name):
+        self.refresh()
+        return self.values[name]
+
+    def items(self):
+        """(name, value, label) for every setting, in display order."""
+        self.refresh()
+        return [(name, self.values[name], label) for name, (_, _, label) in SETTINGS.items()]
+
+    def refresh(self, force=False):
+        """Reload the values if another worker changed them."""
+        if not force and time.time() - self.last_check < self.check_seconds:
+            return
+        # One thread checks; the others keep using the values they have
+        if not self.lock.acquire(blocking=force):
+            return
+        try:
+            self.last_check = time.time()
+            version = db.session.query(SettingsVersion.version).filter_by(id=1).scalar() or 0
+            if version == self.version:
+                return
+            values = {name: default for name, (_, default, _) in SETTINGS.items()}
+            for row in PlatformSetting.query:
+                if row.key in SETTINGS:
+                    values[row.key] = SETTINGS[row.key][0](row.value)
+            self.values = values
+            self.version = version
+        finally:
+            self.lock.release()
+        fragment_cache.invalidate('settings')
+
+    def parse(self, name, value):
+        """Convert a submitted value to the setting's type, or raise ValueError."""
+        if name not in SETTINGS:
+            raise ValueError(f'Unknown setting: {name}')
+        kind = SETTINGS[name][0]
+        try:
+            parsed = kind(value)
+        except (TypeError, ValueError):
+            raise ValueError(f'{name} must be a {"whole number" if kind is int else "number"}')
+        if not math.isfinite(parsed) or parsed < 0:
+            raise ValueError(f'{name} must not be negative')
+        return parsed
+
+    def set(self, name, value, updated_by=None):
+        """Store one setting and bump the version. Commits."""
+        value = self.parse(name, value)
+        db.session.merge(PlatformSetting(key=name, value=str(value), updated_at=datetime.utcnow(),
+                                         updated_by=updated_by))
+        table = SettingsVersion.__table__
+        bumped = db.session.execute(table.update().where(table.c.id == 1).values(version=table.c.version + 1))
+        if not bumped.rowcount:
+            db.session.add(SettingsVersion(id=1, version=1))
+        db.session.commit()
+        self.refresh(force=True)
+        return value
+
+
+platform_settings = PlatformSettings()
@@ -113,8 +113,7 @@ class AdminPanel {
             if (data.success) {
                 this.showNotification('User updated successfully', 'success');
                 this.closeEditUserModal();
-                // Reload the page to reflect changes
-                setTimeout(() => location.reload(), 1000);
+                applyUpdates(data.updates);
             } else {
                 throw new Error(data.error);
             }
@@ -137,7 +136,7 @@ class AdminPanel {
             .then(data => {
                 if (data.success) {
                     this.showNotification(`User ${action}d successfully`, 'success');
-                    location.reload();
+                    applyUpdates(data.updates);
                 } else {
                     throw new Error(data.error);
                 }
@@ -158,7 +157,7 @@ class AdminPanel {
             .then(data => {
                 if (data.success) {
                     this.showNotification('User deleted successfully', 'success');
-                    location.reload();
+                    applyUpdates(data.updates);
                 } else {
                     throw new Error(data.error);
                 }
@@ -235,7 +234,7 @@ class AdminPanel {
             .then(data => {
                 if (data.success) {
                     this.showNotification(`Track ${action}d successfully`, 'success');
-                    location.reload();
+                    applyUpdates(data.updates);
                 } else {
                     throw new Error(data.error);
                 }
@@ -256,7 +255,7 @@ class AdminPanel {
             .then(data => {
                 if (data.success) {
                     this.showNotification('Track deleted successfully', 'success');
-                    location.reload();
+                    applyUpdates(data.updates);
                 } else {
                     throw new Error(data.error);
                 }
@@ -301,7 +300,7 @@ class AdminPanel {
             .then(data => {
                 if (data.success) {
                     this.showNotification(`Withdrawal ${action}ed successfully`, 'success');
-                    location.reload();
+                    applyUpdates(data.updates);
                 } else {
                     throw new Error(data.error);
                 }
@@ -1,27 +1,43 @@
 // Chart initialization
 let performanceChart;
 
+// Analytics requests for each time filter; see analytics_response in views/artist.py
+const ANALYTICS_RANGES = {
+    week: {period: 'day', days: 7},
+    month: {period: 'day', days: 30},
+    year: {period: 'month', months: 12},
+    all: {period: 'month', start: 'all'}
+};
+let analyticsRange = 'week';
+
 function initializeChart() {
     const ctx = document.getElementById('performanceChart').getContext('2d');
     
     performanceChart = new Chart(ctx, {
         type: 'line',
         data: {
-            labels: ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'],
+            labels: [],
             datasets: [{
                 label: 'Plays',
-                data: [12, 19, 8, 15, 12, 18, 22],
+                data: [],
                 borderColor: '#667eea',
                 backgroundColor: 'rgba(102, 126, 234, 0.1)',
                 tension: 0.4,
                 fill: true
             }, {
                 label: 'Earnings ($)',
-                data: [0.60, 0.95, 0.40, 0.75, 0.60, 0.90, 1.10],
+                data: [],
                 borderColor: '#4CAF50',
                 backgroundColor: 'rgba(76, 175, 80, 0.1)',
                 tension: 0.4,
                 fill: true
+            }, {
+                label: 'Listeners',
+                data: [],
+                borderColor: '#FF9800',
+                backgroundColor: 'rgba(255, 152, 0, 0.1)',
+                tension: 0.4,
+                fill: false
             }]
         },
         options: {
@@ -44,44 +60,64 @@ function initializeChart() {
 // Time filter for chart
 function filterTime(range) {
     // Update active button
-    document.querySelectorAll('.time-btn').forEach(btn => btn.classList.remove('active'));
+    document.querySelectorAll('button.time-btn').forEach(btn => btn.classList.remove('active'));
     event.target.classList.add('active');
     
-    // In a real app, you would fetch new data based on the time range
-    console.log('Filtering for:', range);
-    
-    // Simulate data update
-    const newData = generateSampleData(range);
-    updateChartData(newData);
+    analyticsRange = range;
+    loadAnalytics();
 }
 
-function generateSampleData(range) {
-    // This would be replaced with actual API calls
-    const dataMap = {
-        week: {
-            labels: ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'],
-            plays: [12, 19, 8, 15, 12, 18, 22],
-            earnings: [0.60, 0.95, 0.40, 0.75, 0.60, 0.90, 1.10]
-        },
-        month: {
-            labels: ['Week 1', 'Week 2', 'Week 3', 'Week 4'],
-            plays: [45, 62, 38, 55],
-            earnings: [2.25, 3.10, 1.90, 2.75]
-        },
-        year: {
-            labels: ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'],
-            plays: [120, 150, 180, 160, 200, 220, 240, 230, 210, 190, 170, 160],
-            earnings: [6.00, 7.50, 9.00, 8.00, 10.00, 11.00, 12.00, 11.50, 10.50, 9.50, 8.50, 8.00]
-        }
-    };
+function analyticsStart(options) {
+    if (options.start) {
+        return options.start;
+    }
+    const start = new Date();
+    if (options.months) {
+        start.setUTCDate(1);
+        start.setUTCMonth(start.getUTCMonth() - options.months + 1);
+    } else {
+        start.setUTCDate(start.getUTCDate() - options.days + 1);
+    }
+    return start.toISOString().slice(0, 10);
+}
+
+function loadAnalytics() {
+    const options = ANALYTICS_RANGES[analyticsRange];
+    const params = new URLSearchParams({period: options.period, start: analyticsStart(options)});
+    const trackId = document.getElementById('analyticsTrack').value;
+    const url = trackId ? `/api/artist/tracks/${trackId}/analytics` : '/api/artist/analytics';
     
-    return dataMap[range] || dataMap.week;
+    fetch(`${url}?${params}`)
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                console.error('Analytics error:', data.error);
+                return;
+            }
+            updateChartData({
+                labels: data.buckets.map(bucket => bucketLabel(bucket.start, data.period)),
+                plays: data.buckets.map(bucket => bucket.plays),
+                earnings: data.buckets.map(bucket => bucket.earnings),
+                listeners: data.buckets.map(bucket => bucket.listeners)
+            });
+        })
+        .catch(error => console.error('Error loading analytics:', error));
+}
+
+function bucketLabel(start, period) {
+    const date = new Date(start + 'T00:00:00Z');
+    if (period === 'month') {
+        return date.toLocaleDateString(undefined, {month: 'short', year: 'numeric', timeZone: 'UTC'});
+    }
+    const label = date.toLocaleDateString(undefined, {month: 'short', day: 'numeric', timeZone: 'UTC'});
+    return period === 'week' ? `Week of ${label}` : label;
 }
 
 function updateChartData(data) {
     performanceChart.data.labels = data.labels;
     performanceChart.data.datasets[0].data = data.plays;
     performanceChart.data.datasets[1].data = data.earnings;
+    performanceChart.data.datasets[2].data = data.listeners;
     performanceChart.update();
 }
 
@@ -159,6 +195,7 @@ function deleteTrack(trackId) {
 // Initialize when page loads
 document.addEventListener('DOMContentLoaded', function() {
     initializeChart();
+    loadAnalytics();
     
     // Close modals when clicking outside
     window.onclick = function(event) {
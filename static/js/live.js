@@ -0,0 +1,75 @@
+// Server-sent updates for the dashboards
+//
+// connectLive('/api/events', {stats: data => ..., unlock: data => ...}, fallback)
+// calls handlers[event] with the parsed data of every event. The browser
+// reconnects by itself when the server ends a stream. When it refuses one
+// (connection limit, a server that can't hold streams, logged out) the
+// page polls with `fallback` every retrySeconds and streaming is tried
+// again less and less often, until a stream is accepted.
+function connectLive(url, handlers, fallback) {
+    const retrySeconds = 30;  // the server's LIVE_RETRY_SECONDS
+    const maxRetrySeconds = 600;
+    let source = null;
+    let pollTimer = null;
+    let delay = retrySeconds;
+
+    function startPolling() {
+        if (fallback && !pollTimer) {
+            fallback();
+            pollTimer = setInterval(fallback, retrySeconds * 1000);
+        }
+    }
+
+    function stopPolling() {
+        if (pollTimer) {
+            clearInterval(pollTimer);
+            pollTimer = null;
+        }
+    }
+
+    function open() {
+        source = new EventSource(url);
+
+        source.addEventListener('open', () => {
+            stopPolling();
+            delay = retrySeconds;
+        });
+
+        Object.keys(handlers).filter(name => name !== 'resync').forEach(name => {
+            source.addEventListener(name, event => handlers[name](JSON.parse(event.data)));
+        });
+
+        // Another tab of the same user took over this connection
+        source.addEventListener('replaced', () => source.close());
+
+        // This tab fell too far behind; start again from fresh state
+        source.addEventListener('resync', () => {
+            source.close();
+            if (handlers.resync) {
+                handlers.resync();
+            } else {
+                open();
+            }
+        });
+
+        source.addEventListener('banned', () => {
+            source.close();
+            window.location.href = '/logout';
+        });
+
+        source.onerror = () => {
+            if (source.readyState === EventSource.CLOSED) {
+                startPolling();
+                setTimeout(open, delay * 1000);
+                delay = Math.min(delay * 2, maxRetrySeconds);
+            }
+        };
+    }
+
+    if (window.EventSource) {
+        open();
+    } else {
+        startPolling();
+    }
+    return () => source && source.close();
+}
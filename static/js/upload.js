@@ -82,10 +82,10 @@ class MusicUploader {
             return;
         }
 
-        // Validate file size (16MB)
-        const maxSize = 16 * 1024 * 1024;
+        // Validate file size
+        const maxSize = parseInt(document.getElementById('uploadForm').dataset.maxSize, 10);
         if (file.size > maxSize) {
-            this.showError('File size must be less than 16MB');
+            this.showError(`File size must be less than ${Math.floor(maxSize / (1024 * 1024))}MB`);
             return;
         }
 
@@ -186,18 +186,14 @@ class MusicUploader {
         this.uploadInProgress = true;
         this.showUploadProgress();
 
-        const formData = new FormData();
-        formData.append('title', document.getElementById('title').value.trim());
-        formData.append('file', this.selectedFile);
-        
-        const genre = document.getElementById('genre').value;
-        const description = document.getElementById('description').value.trim();
-        
-        if (genre) formData.append('genre', genre);
-        if (description) formData.append('description', description);
+        const details = {
+            title: document.getElementById('title').value.trim(),
+            genre: document.getElementById('genre').value,
+            description: document.getElementById('description').value.trim()
+        };
 
         try {
-            await this.uploadFile(formData);
+            await this.uploadFile(this.selectedFile, details);
         } catch (error) {
             this.handleUploadError(error);
         } finally {
@@ -205,33 +201,95 @@ class MusicUploader {
         }
     }
 
-    async uploadFile(formData) {
-        const xhr = new XMLHttpRequest();
-        
-        return new Promise((resolve, reject) => {
-            xhr.upload.addEventListener('progress', (e) => {
-                if (e.lengthComputable) {
-                    const percentComplete = (e.loaded / e.total) * 100;
-                    this.updateProgressBar(percentComplete, 'Uploading...');
-                }
+    // Chunked, resumable upload: a dropped connection only resends the
+    // chunks the server has not confirmed, even after a page reload
+    async uploadFile(file, details) {
+        const resumeKey = `upload:${file.name}:${file.size}:${file.lastModified}`;
+        let upload = await this.resumeUpload(localStorage.getItem(resumeKey));
+        if (!upload) {
+            upload = await this.apiRequest('/api/uploads', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ filename: file.name, size: file.size, ...details })
             });
+            localStorage.setItem(resumeKey, upload.upload_id);
+        }
+
+        const received = new Set(upload.received);
+        const pending = [];
+        for (let index = 0; index < upload.chunk_count; index++) {
+            if (!received.has(index)) pending.push(index);
+        }
+
+        let done = received.size;
+        const report = () => this.updateProgressBar(done / upload.chunk_count * 100, 'Uploading...');
+        report();
+
+        // A few chunks in flight at once, written by the server in any order
+        const worker = async () => {
+            while (pending.length) {
+                const index = pending.shift();
+                const start = index * upload.chunk_size;
+                await this.sendChunk(upload.upload_id, index, file.slice(start, start + upload.chunk_size));
+                done++;
+                report();
+            }
+        };
+        await Promise.all([worker(), worker(), worker()]);
+
+        this.updateProgressBar(100, 'Finalizing...');
+        await this.apiRequest(`/api/uploads/${upload.upload_id}/finalize`, { method: 'POST' });
+        localStorage.removeItem(resumeKey);
+        this.handleUploadSuccess();
+    }
+
+    async resumeUpload(uploadId) {
+        if (!uploadId) return null;
+        try {
+            return await this.apiRequest(`/api/uploads/${uploadId}`);
+        } catch (error) {
+            return null; // expired or already finished; start over
+        }
+    }
 
-            xhr.addEventListener('load', () => {
-                if (xhr.status === 200) {
-                    this.handleUploadSuccess();
-                    resolve();
-                } else {
-                    reject(new Error(`Upload failed: ${xhr.statusText}`));
+    async sendChunk(uploadId, index, blob) {
+        const data = await blob.arrayBuffer();
+        const checksum = await this.checksum(data);
+        for (let attempt = 0; ; attempt++) {
+            try {
+                await this.apiRequest(`/api/uploads/${uploadId}/chunks/${index}`, {
+                    method: 'PUT',
+                    headers: { 'Content-Type': 'application/octet-stream', 'X-Chunk-Checksum': checksum },
+                    body: data
+                });
+                return;
+            } catch (error) {
+                if (attempt >= 5 || (error.status && error.status < 500 && error.status !== 422)) {
+                    throw error;
                 }
-            });
+                await new Promise(resolve => setTimeout(resolve, 1000 * 2 ** attempt));
+            }
+        }
+    }
 
-            xhr.addEventListener('error', () => {
-                reject(new Error('Upload failed due to network error'));
-            });
+    async checksum(data) {
+        // SubtleCrypto only exists on secure origins; fall back to CRC-32
+        if (window.crypto && crypto.subtle) {
+            const digest = await crypto.subtle.digest('SHA-256', data);
+            return 'sha256=' + Array.from(new Uint8Array(digest), b => b.toString(16).padStart(2, '0')).join('');
+        }
+        return 'crc32=' + crc32(new Uint8Array(data)).toString(16).padStart(8, '0');
+    }
 
-            xhr.open('POST', '/upload');
-            xhr.send(formData);
-        });
+    async apiRequest(url, options = {}) {
+        const response = await fetch(url, options);
+        const data = await response.json().catch(() => ({}));
+        if (!response.ok || data.success === false) {
+            const error = new Error(data.error || `Upload failed: ${response.statusText}`);
+            error.status = response.status;
+            throw error;
+        }
+        return data;
     }
 
     showUploadProgress() {
@@ -291,6 +349,27 @@ class MusicUploader {
     }
 }
 
+// CRC-32 (IEEE) for chunk checksums when SubtleCrypto is unavailable
+const CRC32_TABLE = (() => {
+    const table = new Uint32Array(256);
+    for (let n = 0; n < 256; n++) {
+        let c = n;
+        for (let k = 0; k < 8; k++) {
+            c = c & 1 ? 0xedb88320 ^ (c >>> 1) : c >>> 1;
+        }
+        table[n] = c;
+    }
+    return table;
+})();
+
+function crc32(bytes) {
+    let crc = 0xffffffff;
+    for (let i = 0; i < bytes.length; i++) {
+        crc = CRC32_TABLE[(crc ^ bytes[i]) & 0xff] ^ (crc >>> 8);
+    }
+    return (crc ^ 0xffffffff) >>> 0;
+}
+
 // Modal functions
 function closeSuccessModal() {
     const modal = document.getElementById('successModal');
@@ -0,0 +1,303 @@
+"""Bulk synthetic data for scale testing.
+
+Rows are generated as NumPy arrays a chunk at a time and written with
+``executemany`` on the raw connection, bypassing the ORM. Plays follow a
+Zipf distribution over tracks (a few hits, a long tail) and listeners are
+similarly skewed, so indexes, caches and reports see realistic hot spots.
+Counters such as MusicTrack.plays, earnings and balances are derived from
+the generated rows so they add up, and every play, ad and withdrawal is
+posted to the ledger.
+"""
+import time
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import text
+
+from database import (db, User, MusicTrack, ListeningHistory, AdWatch, Referral, Withdrawal,
+                      TrackChartScore, LedgerTransaction, LedgerEntry)
+import ledger
+
+GENRES = ['pop', 'rock', 'hip-hop', 'rnb', 'jazz', 'electronic', 'country', 'classical', 'afrobeat', 'gospel',
+          'reggae', 'blues', 'metal', 'folk', 'soul', 'latin']
+WORDS = ['night', 'summer', 'love', 'city', 'fire', 'dream', 'river', 'gold', 'blue', 'heart', 'rain', 'wild',
+         'lights', 'home', 'echo', 'storm', 'moon', 'road', 'sky', 'dance', 'shadow', 'ocean', 'stars', 'time']
+
+STREAMER_PLAY_EARNINGS = 0.02
+ARTIST_PLAY_EARNINGS = 0.05
+AD_EARNINGS = 0.02
+STREAMER_PLAY_CENTS = ledger.cents(STREAMER_PLAY_EARNINGS)
+ARTIST_PLAY_CENTS = ledger.cents(ARTIST_PLAY_EARNINGS)
+AD_CENTS = ledger.cents(AD_EARNINGS)
+PLAYS_PER_AD = 6  # one ad unlocks roughly this many plays
+CHUNK_ROWS = 500000
+
+
+class ZipfSampler:
+    """Draws ids 0..n-1 with P(rank r) proportional to 1 / r**exponent.
+
+    Ranks are mapped to ids through a random permutation so popularity is
+    not correlated with id order.
+    """
+
+    def __init__(self, n, exponent, rng):
+        weights = 1.0 / np.arange(1, n + 1, dtype=np.float64) ** exponent
+        self.cdf = np.cumsum(weights)
+        self.cdf /= self.cdf[-1]
+        self.order = rng.permutation(n)
+        self.rng = rng
+
+    def __call__(self, size):
+        ranks = np.searchsorted(self.cdf, self.rng.random(size), side='right')
+        return self.order[np.minimum(ranks, len(self.order) - 1)]
+
+
+def _timestamps(seconds):
+    """Epoch seconds to the 'YYYY-MM-DD HH:MM:SS' text SQLAlchemy stores for DateTime."""
+    return [value.replace('T', ' ') for value in np.datetime_as_string(seconds.astype('datetime64[s]')).tolist()]
+
+
+def _placeholder(conn):
+    return '?' if conn.dialect.paramstyle == 'qmark' else '%s'
+
+
+def _table(conn, table):
+    return conn.dialect.identifier_preparer.format_table(table)  # "user" is reserved outside SQLite
+
+
+def _insert(conn, table, columns, rows):
+    if not rows:
+        return  # an empty executemany is run once with no parameters
+    values = ', '.join([_placeholder(conn)] * len(columns))
+    conn.exec_driver_sql(f'INSERT INTO {_table(conn, table)} ({", ".join(columns)}) VALUES ({values})', rows)
+
+
+def _next_id(conn, table):
+    return (conn.execute(text(f'SELECT MAX(id) FROM {_table(conn, table)}')).scalar() or 0) + 1
+
+
+def _post(conn, first_id, kind, stamps, references, legs):
+    """Write one ledger transaction per element of `stamps`, ids from `first_id`.
+
+    `legs` are (user_ids, account, amount_cents) per entry, parallel to
+    `stamps`; user_ids is None for platform accounts. Returns the next id.
+    """
+    count = len(stamps)
+    if not count:
+        return first_id
+    ids = list(range(first_id, first_id + count))
+    _insert(conn, LedgerTransaction.__table__, ['id', 'kind', 'reference', 'created_at'],
+            list(zip(ids, [kind] * count, references or [None] * count, stamps)))
+    for user_ids, account, amounts in legs:
+        _insert(conn, LedgerEntry.__table__, ['transaction_id', 'user_id', 'account', 'amount_cents'],
+                list(zip(ids, user_ids.tolist() if user_ids is not None else [None] * count, [account] * count,
+                         np.broadcast_to(amounts, count).tolist())))
+    return first_id + count
+
+
+def generate(streamers=10000, artists=500, tracks=20000, listens=1000000, days=365, admins=1,
+             password_hash='', exponent=1.1, referral_rate=0.2, seed=None, charts=None, progress=None):
+    """Generate users, tracks, listening history, ad watches, referrals and withdrawals.
+
+    Must run inside an app context. New rows get ids after any existing
+    ones, and accounts use the emails ``{type}{n}@example.test`` (n from 1)
+    with `password_hash`. If `charts` is given its track rollups are filled
+    in from the generated plays. Returns the number of rows per table.
+    """
+    rng = np.random.default_rng(seed)
+    progress = progress or (lambda message: None)
+    conn = db.session.connection()
+    if conn.dialect.name == 'sqlite':
+        conn.exec_driver_sql('PRAGMA synchronous=OFF')
+    # Ledger entries would land all over their indexes; building them afterwards is about twice as fast
+    entry_indexes = list(LedgerEntry.__table__.indexes)
+    for index in entry_indexes:
+        index.drop(conn)
+
+    now = int(time.time())
+    start = now - days * 86400
+    counts = {}
+
+    # Users: signups accelerate towards the present
+    first_user = _next_id(conn, User.__table__)
+    kinds = ['admin'] * admins + ['artist'] * artists + ['streamer'] * streamers
+    user_ids = np.arange(first_user, first_user + len(kinds))
+    created = start + (rng.random(len(kinds)) ** 0.6 * (now - start)).astype(np.int64)
+    created[:admins] = start
+    numbers = {'admin': 0, 'artist': 0, 'streamer': 0}
+    emails, names = [], []
+    for kind in kinds:
+        numbers[kind] += 1
+        emails.append(f'{kind}{numbers[kind]}@example.test')
+        names.append(f'{kind}_{numbers[kind]}_{first_user}')
+    codes = [f'S{user_id:09d}' for user_id in user_ids.tolist()]
+
+    # Some streamers signed up through an earlier user's referral link
+    streamer_index = np.arange(admins + artists, len(kinds))
+    referred = streamer_index[rng.random(streamers) < referral_rate]
+    # Anyone who joined before them, other than admins
+    referrers = admins + (rng.random(len(referred)) * (referred - admins)).astype(np.int64)
+    referred_by = [None] * len(kinds)
+    for child, parent in zip(referred.tolist(), referrers.tolist()):
+        referred_by[child] = codes[parent]
+        created[child] = max(created[child], created[parent] + 3600)
+
+    artist_ids = user_ids[admins:admins + artists]
+    streamer_ids = user_ids[admins + artists:]
+
+    # Tracks: prolific artists upload more, capped at the 50-per-artist limit
+    first_track = _next_id(conn, MusicTrack.__table__)
+    track_ids = np.arange(first_track, first_track + tracks)
+    per_artist = np.minimum(ZipfSampler(artists, 0.8, rng)(tracks * 4), artists - 1)
+    owner_index = []
+    uploaded = np.zeros(artists, dtype=np.int64)
+    for index in per_artist.tolist():
+        if uploaded[index] < 50:
+            uploaded[index] += 1
+            owner_index.append(index)
+            if len(owner_index) == tracks:
+                break
+    while len(owner_index) < tracks:  # tiny artist pools can't be filled by sampling alone
+        index = int(np.argmin(uploaded))
+        uploaded[index] += 1
+        owner_index.append(index)
+    owner_index = np.array(owner_index)
+    track_owner = artist_ids[owner_index]
+    upload_at = np.maximum(created[admins + owner_index],
+                           start + (rng.random(tracks) * (now - start)).astype(np.int64))
+    durations = rng.integers(90, 420, tracks)
+    genres = rng.choice(GENRES, tracks).tolist()
+
+    _insert(conn, User.__table__,
+            ['id', 'username', 'email', 'password', 'user_type', 'referral_code', 'referred_by', 'balance',
+             'is_active', 'is_banned', 'created_at'],
+            list(zip(user_ids.tolist(), names, emails, [password_hash] * len(kinds), kinds, codes, referred_by,
+                     [0.0] * len(kinds), [True] * len(kinds), [False] * len(kinds),
+                     _timestamps(created))))
+    counts['user'] = len(kinds)
+
+    _insert(conn, MusicTrack.__table__,
+            ['id', 'title', 'artist_id', 'filename', 'duration', 'plays', 'earnings', 'genre', 'description',
+             'upload_date', 'is_active'],
+            list(zip(track_ids.tolist(),
+                     [' '.join(rng.choice(WORDS, int(rng.integers(1, 4))).tolist()).title() for _ in range(tracks)],
+                     track_owner.tolist(), ['synthetic.mp3'] * tracks, durations.tolist(), [0] * tracks,
+                     [0.0] * tracks, genres, [''] * tracks, _timestamps(upload_at),
+                     (rng.random(tracks) > 0.02).tolist())))
+    counts['music_track'] = tracks
+
+    _insert(conn, Referral.__table__, ['referrer_id', 'referred_id', 'bonus_paid', 'created_at'],
+            list(zip(user_ids[referrers].tolist(), user_ids[referred].tolist(),
+                     (rng.random(len(referred)) < 0.8).tolist(),
+                     _timestamps(created[referred]))))
+    counts['referral'] = len(referred)
+
+    # Listening history in chunks; per-track and per-user totals are kept for the counters
+    track_sampler = ZipfSampler(tracks, exponent, rng)
+    listener_sampler = ZipfSampler(streamers, 0.8, rng)
+    plays = np.zeros(tracks, dtype=np.int64)
+    streamer_plays = np.zeros(streamers, dtype=np.int64)
+    chart_scores = np.zeros(tracks, dtype=np.float64)
+    if charts is not None:
+        epoch = (charts.current_epoch() - datetime(1970, 1, 1)).total_seconds()
+    history_table = ListeningHistory.__table__
+    first_transaction = next_transaction = _next_id(conn, LedgerTransaction.__table__)
+    written = 0
+    while written < listens:
+        size = min(CHUNK_ROWS, listens - written)
+        track_index = track_sampler(size)
+        listener_index = listener_sampler(size)
+        earliest = np.maximum(upload_at[track_index], created[admins + artists + listener_index])
+        # Recent days are busier than old ones
+        listened = earliest + (rng.random(size) ** 0.7 * (now - earliest)).astype(np.int64)
+        plays += np.bincount(track_index, minlength=tracks)
+        streamer_plays += np.bincount(listener_index, minlength=streamers)
+        if charts is not None:
+            chart_scores += np.bincount(track_index, weights=np.exp(charts.decay_rate * (listened - epoch)),
+                                        minlength=tracks)
+        stamps = _timestamps(listened)
+        _insert(conn, history_table, ['streamer_id', 'track_id', 'listened_at', 'earnings'],
+                list(zip(streamer_ids[listener_index].tolist(), track_ids[track_index].tolist(),
+                         stamps, [STREAMER_PLAY_EARNINGS] * size)))
+        next_transaction = _post(conn, next_transaction, 'play', stamps, None, [
+            (track_owner[track_index], ledger.BALANCE, ARTIST_PLAY_CENTS),
+            (streamer_ids[listener_index], ledger.BALANCE, STREAMER_PLAY_CENTS),
+            (None, ledger.PAYOUTS, -ARTIST_PLAY_CENTS - STREAMER_PLAY_CENTS),
+        ])
+        written += size
+        progress(f'listening_history {written}/{listens}')
+    counts['listening_history'] = listens
+
+    # Ad watches: one per few plays for each listener
+    ads = np.ceil(streamer_plays / PLAYS_PER_AD).astype(np.int64)
+    ad_owner = np.repeat(np.arange(streamers), ads)
+    ad_at = created[admins + artists + ad_owner] + (rng.random(len(ad_owner)) ** 0.7 *
+                                                    (now - created[admins + artists + ad_owner])).astype(np.int64)
+    first_ad = _next_id(conn, AdWatch.__table__)
+    for offset in range(0, len(ad_owner), CHUNK_ROWS):
+        part = slice(offset, offset + CHUNK_ROWS)
+        ad_ids = range(first_ad + offset, first_ad + offset + len(ad_owner[part]))
+        stamps = _timestamps(ad_at[part])
+        _insert(conn, AdWatch.__table__, ['id', 'streamer_id', 'earnings', 'watched_at'],
+                list(zip(ad_ids, streamer_ids[ad_owner[part]].tolist(), [AD_EARNINGS] * len(ad_ids), stamps)))
+        next_transaction = _post(conn, next_transaction, 'ad', stamps, [f'ad_watch:{n}' for n in ad_ids], [
+            (streamer_ids[ad_owner[part]], ledger.BALANCE, AD_CENTS),
+            (None, ledger.PAYOUTS, -AD_CENTS),
+        ])
+    counts['ad_watch'] = len(ad_owner)
+    progress(f'ad_watch {len(ad_owner)}')
+
+    # Balances follow from the plays and ads, less what was withdrawn
+    balance = np.zeros(len(kinds), dtype=np.int64)  # cents
+    track_earnings = plays * ARTIST_PLAY_EARNINGS
+    np.add.at(balance, admins + owner_index, plays * ARTIST_PLAY_CENTS)
+    balance[admins + artists:] += streamer_plays * STREAMER_PLAY_CENTS + ads * AD_CENTS
+
+    eligible = np.flatnonzero(balance >= 1000)
+    requesting = eligible[rng.random(len(eligible)) < 0.3]
+    amounts = np.rint(balance[requesting] * rng.uniform(0.3, 0.9, len(requesting))).astype(np.int64)
+    statuses = rng.choice(['approved', 'approved', 'approved', 'rejected', 'pending'], len(requesting))
+    requested = created[requesting] + (rng.random(len(requesting)) * (now - created[requesting])).astype(np.int64)
+    processed = np.minimum(requested + rng.integers(3600, 5 * 86400, len(requesting)), now)
+    held = statuses != 'rejected'  # pending requests are held back too
+    np.subtract.at(balance, requesting[held], amounts[held])
+    processed_at = [None if status == 'pending' else stamp
+                    for status, stamp in zip(statuses.tolist(), _timestamps(processed))]
+    first_withdrawal = _next_id(conn, Withdrawal.__table__)
+    references = [f'withdrawal:{n}' for n in range(first_withdrawal, first_withdrawal + len(requesting))]
+    _insert(conn, Withdrawal.__table__, ['id', 'user_id', 'amount', 'status', 'requested_at', 'processed_at'],
+            list(zip(range(first_withdrawal, first_withdrawal + len(requesting)), user_ids[requesting].tolist(),
+                     (amounts / 100).tolist(), statuses.tolist(), _timestamps(requested), processed_at)))
+    counts['withdrawal'] = len(requesting)
+
+    next_transaction = _post(conn, next_transaction, 'withdrawal', _timestamps(requested), references, [
+        (user_ids[requesting], ledger.BALANCE, -amounts),
+        (None, ledger.WITHDRAWALS, amounts),
+    ])
+    refunded = np.flatnonzero(~held)
+    next_transaction = _post(conn, next_transaction, 'refund', _timestamps(processed[refunded]),
+                             [references[i] for i in refunded.tolist()], [
+        (user_ids[requesting[refunded]], ledger.BALANCE, amounts[refunded]),
+        (None, ledger.WITHDRAWALS, -amounts[refunded]),
+    ])
+    counts['ledger_transaction'] = next_transaction - first_transaction
+
+    # Counters that follow from the generated rows
+    mark = _placeholder(conn)
+    conn.exec_driver_sql(f'UPDATE {_table(conn, MusicTrack.__table__)} SET plays = {mark}, earnings = {mark} '
+                         f'WHERE id = {mark}',
+                         list(zip(plays.tolist(), np.round(track_earnings, 2).tolist(), track_ids.tolist())))
+    conn.exec_driver_sql(f'UPDATE {_table(conn, User.__table__)} SET balance = {mark} WHERE id = {mark}',
+                         list(zip((balance / 100).tolist(), user_ids.tolist())))
+
+    if charts is not None:
+        scored = np.flatnonzero(chart_scores)
+        _insert(conn, TrackChartScore.__table__, ['track_id', 'score', 'updated_at'],
+                list(zip(track_ids[scored].tolist(), chart_scores[scored].tolist(),
+                         _timestamps(np.full(len(scored), now)))))
+        charts.reset()
+
+    for index in entry_indexes:
+        index.create(conn)
+    db.session.commit()
+    return counts
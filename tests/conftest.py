@@ -0,0 +1,49 @@
+import pytest
+
+from app import create_app
+from database import db, User, MusicTrack
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "test.db"}',
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+        'UPLOAD_PARTS_FOLDER': str(tmp_path / 'upload_parts'),
+        'CACHE_SQLITE_PATH': str(tmp_path / 'fragment_cache.db'),
+        'CATALOG_INDEX_PATH': str(tmp_path / 'catalog.idx'),
+        'CATALOG_INDEX_IN_PROCESS': False,
+        'SLOW_QUERY_LOG': str(tmp_path / 'slow_queries.log'),
+        'TRANSCODE_IN_PROCESS': False,
+    })
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def streamer(app):
+    user = User(username='listener', email='listener@example.com', password='x', user_type='streamer')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def make_track(app):
+    artists = {}
+
+    def make_track(title='Track', duration=60, artist_username='artist'):
+        if artist_username not in artists:
+            artist = User(username=artist_username, email=f'{artist_username}@example.com', password='x',
+                          user_type='artist')
+            db.session.add(artist)
+            db.session.commit()
+            artists[artist_username] = artist.id
+        track = MusicTrack(title=title, filename=f'{title}.mp3', artist_id=artists[artist_username],
+                           duration=duration)
+        db.session.add(track)
+        db.session.commit()
+        return track
+    return make_track
@@ -0,0 +1,16 @@
+from activity import activity_feed
+from database import db, ActivityEvent
+from views.streamer import pay_play
+
+
+def test_plays_are_published_as_one_event_per_track(streamer, make_track):
+    first = make_track('First')
+    second = make_track('Second')
+    for track in (first, first, first, second):
+        pay_play(track, streamer, 1, 1, reference=None)
+    db.session.commit()
+    assert not [event for event in activity_feed.recent() if event['kind'] == 'play']
+
+    activity_feed.flush()
+    messages = sorted(event.message for event in ActivityEvent.query.filter_by(kind='play'))
+    assert messages == ['"First" was played (3 times)', '"Second" was played']
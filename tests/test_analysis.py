@@ -0,0 +1,19 @@
+import pytest
+
+from analysis import playback_gain
+from database import TrackAnalysis
+
+
+def test_quiet_track_with_a_high_peak_is_only_boosted_to_the_peak_ceiling():
+    analysis = TrackAnalysis(loudness_lufs=-30.0, peak_dbfs=-2.0)
+    assert playback_gain(analysis, -14.0) == pytest.approx(1.0)
+
+
+def test_boost_is_capped():
+    analysis = TrackAnalysis(loudness_lufs=-24.0, peak_dbfs=-20.0)
+    assert playback_gain(analysis, -14.0, max_boost_db=6.0) == pytest.approx(6.0)
+
+
+def test_loud_track_is_turned_down_to_the_target():
+    analysis = TrackAnalysis(loudness_lufs=-8.0, peak_dbfs=0.0)
+    assert playback_gain(analysis, -14.0) == pytest.approx(-6.0)
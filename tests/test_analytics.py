@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import db, User
+from views.streamer import pay_play
+
+
+@pytest.fixture
+def artist_client(app):
+    def artist_client(artist_id):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(artist_id)
+            sess['_fresh'] = True
+        return client
+    return artist_client
+
+
+def listeners(count):
+    users = [User(username=f'listener{n}', email=f'listener{n}@example.com', password='x', user_type='streamer')
+             for n in range(count)]
+    db.session.add_all(users)
+    db.session.commit()
+    return users
+
+
+def test_artist_analytics_count_plays_earnings_and_listeners(make_track, artist_client):
+    first = make_track('First')
+    second = make_track('Second')
+    alice, bob = listeners(2)
+    for track, streamer in ((first, alice), (first, alice), (first, bob), (second, bob)):
+        pay_play(track, streamer, 5, 2, reference=None)
+    db.session.commit()
+
+    client = artist_client(first.artist_id)
+    data = client.get('/api/artist/analytics?period=week').get_json()
+    assert data['success']
+    assert len(data['buckets']) == 12
+    assert data['totals'] == {'plays': 4, 'earnings': 0.2, 'listeners': 2}
+    assert data['buckets'][-1]['plays'] == 4
+
+    today = datetime.utcnow().date()
+    data = client.get(f'/api/artist/tracks/{first.id}/analytics?start={today - timedelta(days=1)}').get_json()
+    assert [bucket['plays'] for bucket in data['buckets']] == [0, 3]
+    assert data['totals']['listeners'] == 2
+
+
+def test_analytics_requests_are_checked(make_track, artist_client):
+    track = make_track()
+    other = make_track('Other', artist_username='other')
+    client = artist_client(track.artist_id)
+
+    assert client.get(f'/api/artist/tracks/{other.id}/analytics').status_code == 403
+    assert client.get('/api/artist/analytics?period=year').status_code == 400
+    assert client.get('/api/artist/analytics?start=2024-02-01&end=2024-01-01').status_code == 400
+    assert client.get('/api/artist/analytics?start=yesterday').status_code == 400
+    assert client.get('/api/artist/analytics?period=day&start=2000-01-01').status_code == 400
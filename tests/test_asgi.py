@@ -0,0 +1,84 @@
+import asyncio
+import contextvars
+import json
+import time
+
+import pytest
+
+from async_api import AsyncAPI, ThreadedWsgi
+from live import live_updates
+
+
+@pytest.fixture
+def application(app):
+    application = AsyncAPI(app, fallback=ThreadedWsgi(app, 4))
+    yield application
+    asyncio.run(application.engine.dispose())
+
+
+def serve(coroutine):
+    # Outside the test's app context, as under a server; pool threads copy the loop's context
+    return contextvars.Context().run(asyncio.run, coroutine)
+
+
+def login_cookie(application, user):
+    value = application.serializer.dumps({'_user_id': str(user.id), '_fresh': True})
+    return f'{application.sessions.get_cookie_name(application.app)}={value}'
+
+
+async def call(application, path, cookie='', method='GET'):
+    scope = {
+        'type': 'http', 'http_version': '1.1', 'method': method, 'scheme': 'http', 'path': path,
+        'root_path': '', 'query_string': b'', 'headers': [(b'cookie', cookie.encode())],
+        'server': ('testserver', 80), 'client': ('127.0.0.1', 50000),
+    }
+    messages = []
+    received = False
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+
+    await application(scope, receive, send)
+    headers = dict(messages[0]['headers'])
+    return messages[0]['status'], headers, b''.join(message.get('body', b'') for message in messages[1:])
+
+
+def test_api_endpoints_run_on_the_event_loop(application, streamer):
+    cookie = login_cookie(application, streamer)
+
+    async def run():
+        anonymous = await call(application, '/api/check_ad_status')
+        started = await call(application, '/api/start_ad', cookie, method='POST')
+        locked = await call(application, '/api/play_track/1', cookie, method='POST')
+        return anonymous, started, locked
+
+    anonymous, started, locked = serve(run())
+    assert anonymous[0] == 401
+    assert started[0] == 200 and json.loads(started[2])['success']
+    assert b'set-cookie' in started[1]
+    assert locked[0] == 403
+
+
+def test_pages_are_served_while_an_event_stream_is_open(application, streamer, monkeypatch):
+    monkeypatch.setattr(live_updates, 'max_seconds', 2)
+    cookie = login_cookie(application, streamer)
+
+    async def run():
+        stream = asyncio.create_task(call(application, '/api/events', cookie))
+        await asyncio.sleep(0.3)
+        before = time.monotonic()
+        page = await call(application, '/referral', cookie)
+        waited = time.monotonic() - before
+        return await stream, page, waited
+
+    stream, page, waited = serve(run())
+    assert stream[0] == 200 and stream[2].startswith(b'retry:')
+    assert page[0] == 200
+    assert waited < 1
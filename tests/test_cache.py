@@ -0,0 +1,21 @@
+from cache import FragmentCache
+
+
+def test_invalidation_reaches_other_workers(app):
+    # Two workers with their own in-process entries and the shared version file
+    first, second = FragmentCache(), FragmentCache()
+    for worker in (first, second):
+        worker.init_app(app)
+    builds = []
+
+    def build(worker):
+        return worker.cached('catalog_page', ['catalog'], lambda: builds.append(worker) or len(builds))
+
+    assert build(first) == 1 and build(second) == 2
+    assert build(first) == 1 and build(second) == 2
+
+    first.invalidate('catalog')
+    assert build(second) == 3
+
+    second.clear()
+    assert build(first) == 4
@@ -0,0 +1,25 @@
+import fcntl
+
+from catalog_index import catalog_index
+
+
+def titles(snapshot):
+    return [entry.title for entry in snapshot.active()]
+
+
+def test_catalog_changes_are_indexed_in_the_background(app, make_track, monkeypatch):
+    make_track('First')
+    assert titles(catalog_index.snapshot()) == ['First']
+
+    make_track('Second')
+    monkeypatch.setattr(catalog_index, 'in_process', True)
+    with open(f'{catalog_index.path}.lock', 'a') as lock_file:
+        # Another worker is building, so the background build has to wait
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        catalog_index.rebuild()
+        thread = catalog_index.thread
+        assert titles(catalog_index.snapshot()) == ['First']
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    thread.join(5)
+    assert titles(catalog_index.current) == ['First', 'Second']
@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+import pytest
+
+from charts import charts
+from database import db, ChartEpoch, TrackChartScore
+
+
+def stored_score(track):
+    db.session.expire_all()
+    return TrackChartScore.query.get(track.id).score
+
+
+def test_plays_far_past_the_epoch_rescale_instead_of_overflowing(make_track):
+    track = make_track()
+    half_life = timedelta(hours=72)
+    when = charts.initial_epoch + 2000 * half_life  # exp() of this overflows a float
+
+    charts.record_play(track, when=when)
+    charts.record_play(track, when=when + half_life)
+    db.session.commit()
+
+    assert ChartEpoch.query.get(1).epoch == when
+    assert charts.decayed(stored_score(track), now=when + half_life) == pytest.approx(1.5)
+
+
+def test_rescale_command_keeps_decayed_scores(app, make_track):
+    track = make_track()
+    when = charts.current_epoch() + timedelta(hours=1)
+    charts.record_play(track, when=when)
+    db.session.commit()
+    before = charts.decayed(stored_score(track), now=when)
+
+    result = app.test_cli_runner().invoke(args=['charts-rescale', '--epoch', (when + timedelta(days=1)).isoformat()])
+    assert result.exit_code == 0, result.output
+    assert charts.decayed(stored_score(track), now=when) == pytest.approx(before)
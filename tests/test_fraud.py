@@ -0,0 +1,97 @@
+from datetime import timedelta
+
+import pytest
+
+import ledger
+from database import db, User, PlaySession, ListeningHistory, FraudFlag
+from fraud import Verdict, fraud_detector
+from play_sessions import play_sessions
+
+
+@pytest.fixture
+def admin_client(app):
+    admin = User(username='admin', email='admin@example.com', password='x', user_type='admin')
+    db.session.add(admin)
+    db.session.commit()
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(admin.id)
+        sess['_fresh'] = True
+    return client
+
+
+def held_play(streamer, track):
+    """A started play whose earnings the detector held."""
+    token = play_sessions.start(streamer.id, track)
+    session_id = play_sessions.decode(token)[0]
+    flag = fraud_detector.record(db.session, streamer.id, 'play', Verdict(3.0, 'hold', 'streamer_plays_hour 120/40'),
+                                 reference=f'play_session:{session_id}', track_id=track.id)
+    db.session.commit()
+    return session_id, flag.id
+
+
+def listen(session_id, seconds=60):
+    started = PlaySession.query.get(session_id).started_at
+    for offset in range(10, seconds + 1, 10):
+        play_sessions.heartbeat(session_id, position=float(offset), now=started + timedelta(seconds=offset))
+    play_sessions.flush()
+
+
+def test_held_play_is_paid_once_when_released(streamer, make_track, admin_client):
+    track = make_track(duration=60)
+    session_id, flag_id = held_play(streamer, track)
+    listen(session_id)
+
+    assert ListeningHistory.query.count() == 0
+    assert FraudFlag.query.get(flag_id).held_cents > 0
+
+    assert admin_client.post(f'/admin/fraud/{flag_id}/release').status_code == 200
+    assert admin_client.post(f'/admin/fraud/{flag_id}/release').status_code == 400
+    assert admin_client.post(f'/admin/fraud/{flag_id}/forfeit').status_code == 400
+    db.session.expire_all()
+    assert ListeningHistory.query.count() == 1
+    assert ledger.balance(streamer.id) == FraudFlag.query.get(flag_id).held_cents
+
+
+def test_play_forfeited_before_it_is_credited_is_never_paid(streamer, make_track, admin_client):
+    track = make_track(duration=60)
+    session_id, flag_id = held_play(streamer, track)
+
+    assert admin_client.post(f'/admin/fraud/{flag_id}/forfeit').status_code == 200
+    listen(session_id)
+
+    db.session.expire_all()
+    assert ListeningHistory.query.count() == 0
+    assert ledger.balance(streamer.id) == 0
+    assert FraudFlag.query.get(flag_id).status == 'forfeited'
+
+
+def test_play_released_before_it_is_credited_is_paid_when_heard(streamer, make_track, admin_client):
+    track = make_track(duration=60)
+    session_id, flag_id = held_play(streamer, track)
+
+    assert admin_client.post(f'/admin/fraud/{flag_id}/release').status_code == 200
+    listen(session_id)
+
+    db.session.expire_all()
+    assert ListeningHistory.query.count() == 1
+    assert ledger.balance(streamer.id) > 0
+
+
+def test_plays_over_a_limit_are_flagged_then_held_until_the_window_passes():
+    detector = fraud_detector.copy()
+    detector.limits['streamer_plays_hour'] = 2
+    now = 1_000_000.0
+
+    actions = [detector.score_play(1, 10 + play, now=now + play).action for play in range(4)]
+    assert actions == [None, 'flag', 'flag', 'hold']
+    assert detector.score_play(1, 20, now=now + 3600 + 600).action is None
+
+
+def test_popular_tracks_are_flagged_but_never_held():
+    detector = fraud_detector.copy()
+    detector.limits['track_plays_hour'] = 1
+    verdicts = [detector.score_play(streamer_id, 10, now=1_000_000.0) for streamer_id in range(5)]
+
+    assert verdicts[-1].action == 'flag'
+    assert verdicts[-1].reasons == 'track_plays_hour 5/1'
@@ -0,0 +1,62 @@
+import pytest
+
+import ledger
+from database import db, User, Withdrawal, BalanceSnapshot
+
+
+@pytest.fixture
+def client(app, streamer):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(streamer.id)
+        sess['_fresh'] = True
+    return client
+
+
+def credit(user_id, amount_cents):
+    ledger.transfer('play', user_id, amount_cents, ledger.PAYOUTS)
+    db.session.commit()
+
+
+def test_balance_is_the_snapshot_plus_the_tail(streamer):
+    credit(streamer.id, 250)
+    credit(streamer.id, 100)
+    assert ledger.balance(streamer.id) == 350
+
+    assert ledger.take_snapshots() == 1
+    assert BalanceSnapshot.query.get(streamer.id).balance_cents == 350
+    assert ledger.balance(streamer.id) == 350
+
+    credit(streamer.id, -50)
+    assert ledger.balance(streamer.id) == 300
+    assert ledger.take_snapshots() == 1
+    assert ledger.take_snapshots() == 0
+    assert BalanceSnapshot.query.get(streamer.id).balance_cents == 300
+    assert ledger.balance(streamer.id) == 300
+
+
+def test_withdrawal_over_the_balance_is_refused(streamer, client):
+    credit(streamer.id, 1500)
+
+    client.post('/withdraw', data={'amount': '12'})
+    client.post('/withdraw', data={'amount': '12'})
+
+    db.session.expire_all()
+    assert Withdrawal.query.count() == 1
+    assert ledger.balance(streamer.id) == 300
+    assert User.query.get(streamer.id).balance == pytest.approx(3.0)
+
+
+def test_withdrawal_rechecks_the_balance_after_posting(streamer, client, monkeypatch):
+    credit(streamer.id, 1500)
+    # Reads before this request posts miss a parallel withdrawal that posted first
+    monkeypatch.setattr(ledger, 'balance', lambda user_id, balance=ledger.balance:
+                        balance(user_id) + (0 if 'moved_balances' in db.session.info else 1200))
+
+    client.post('/withdraw', data={'amount': '12'})
+    client.post('/withdraw', data={'amount': '12'})
+
+    monkeypatch.undo()
+    db.session.expire_all()
+    assert Withdrawal.query.count() == 1
+    assert ledger.balance(streamer.id) == 300
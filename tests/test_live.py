@@ -0,0 +1,11 @@
+def test_stream_is_refused_when_the_server_cannot_hold_it(app, streamer):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(streamer.id)
+        sess['_fresh'] = True
+
+    # The test client, like a sync worker, runs one request at a time
+    response = client.get('/api/events')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '30'
+    assert response.get_json()['retry_after'] == 30
@@ -0,0 +1,83 @@
+from datetime import timedelta
+
+from database import db, PlaySession, ListeningHistory
+from play_sessions import PlaySessions, play_sessions
+
+
+def heartbeats(session_id, start, seconds, step=10, flush_every=2):
+    """Heartbeat a session every `step` seconds, flushing now and then; returns whether it was credited."""
+    for number, offset in enumerate(range(step, seconds + 1, step), start=1):
+        play_sessions.heartbeat(session_id, position=float(offset), now=start + timedelta(seconds=offset))
+        if number % flush_every == 0:
+            play_sessions.flush()
+    play_sessions.flush()
+    return play_sessions.is_credited(session_id)
+
+
+def test_play_is_credited_once_it_has_been_heard(streamer, make_track):
+    track = make_track(duration=60)
+    session_id = play_sessions.decode(play_sessions.start(streamer.id, track))[0]
+    started = PlaySession.query.get(session_id).started_at
+
+    assert not heartbeats(session_id, started, 20)
+    assert heartbeats(session_id, started, 30)
+    assert ListeningHistory.query.filter_by(streamer_id=streamer.id).count() == 1
+
+
+def test_repeated_heartbeats_count_once(streamer, make_track):
+    track = make_track(duration=60)
+    session_id = play_sessions.decode(play_sessions.start(streamer.id, track))[0]
+    started = PlaySession.query.get(session_id).started_at
+
+    # Retried or duplicated heartbeats, possibly taken by different workers
+    for offset in (10, 10, 20, 20, 20):
+        play_sessions.heartbeat(session_id, now=started + timedelta(seconds=offset))
+        play_sessions.flush()
+    db.session.expire_all()
+    assert PlaySession.query.get(session_id).listened_seconds == 20
+
+
+def test_one_of_two_queued_plays_heartbeated_together_is_credited(streamer, make_track):
+    tracks = [make_track('First', duration=60), make_track('Second', duration=60)]
+    session_ids = [play_sessions.decode(token)[0] for token in play_sessions.start_many(streamer.id, tracks)]
+    started = PlaySession.query.get(session_ids[0]).started_at
+
+    # A client playing both stream URLs at once and heartbeating both tokens
+    for offset in range(0, 121, 10):
+        for session_id in session_ids:
+            play_sessions.heartbeat(session_id, position=float(offset), now=started + timedelta(seconds=offset))
+        play_sessions.flush()
+
+    db.session.expire_all()
+    assert PlaySession.query.filter(PlaySession.id.in_(session_ids), PlaySession.credited == True).count() == 1
+    assert ListeningHistory.query.filter_by(streamer_id=streamer.id).count() == 1
+
+
+def test_starting_a_play_closes_the_previous_one(streamer, make_track):
+    first = play_sessions.decode(play_sessions.start(streamer.id, make_track('First', duration=60)))[0]
+    started = PlaySession.query.get(first).started_at
+    heartbeats(first, started, 20)
+    play_sessions.start(streamer.id, make_track('Second', duration=60))
+
+    assert not heartbeats(first, started + timedelta(seconds=20), 60)
+    db.session.expire_all()
+    assert PlaySession.query.get(first).listened_seconds == 20
+
+
+def test_heartbeats_split_between_workers_count_once(app, streamer, make_track):
+    track = make_track(duration=120)
+    session_id = play_sessions.decode(play_sessions.start(streamer.id, track))[0]
+    started = PlaySession.query.get(session_id).started_at
+    other_worker = PlaySessions(app)
+    other_worker.credit_callback = play_sessions.credit_callback
+
+    # A load balancer alternating the session's heartbeats between two workers
+    for offset in range(10, 51, 10):
+        worker = play_sessions if offset % 20 else other_worker
+        worker.heartbeat(session_id, position=float(offset), now=started + timedelta(seconds=offset))
+    play_sessions.flush()
+    other_worker.flush()
+
+    db.session.expire_all()
+    assert PlaySession.query.get(session_id).listened_seconds == 50
+    assert not play_sessions.pending and not other_worker.pending
@@ -0,0 +1,43 @@
+from database import db, User
+from search import build_match_query, search_tracks
+
+
+def catalog(make_track):
+    tracks = {}
+    for title, genre, artist in (('Love Song', 'pop', 'artist'), ('Lovely Day', 'soul', 'artist'),
+                                 ('Loud Noise', 'rock', 'artist'), ('Café Love', 'pop', 'other')):
+        track = make_track(title, artist_username=artist)
+        track.genre = genre
+        tracks[title] = track
+    db.session.commit()
+    return tracks
+
+
+def test_words_are_prefixes_and_ranked_with_facets(make_track):
+    catalog(make_track)
+
+    found = search_tracks('lov')
+    assert {row['title'] for row in found['results']} == {'Love Song', 'Lovely Day', 'Café Love'}
+    assert found['total'] == 3
+    assert found['facets'] == [{'genre': 'pop', 'count': 2}, {'genre': 'soul', 'count': 1}]
+
+    pop = search_tracks('lov', genre='pop', per_page=1)
+    assert pop['total'] == 2 and len(pop['results']) == 1
+    assert pop['facets'] == found['facets']
+    assert search_tracks('cafe love')['results'][0]['title'] == 'Café Love'
+
+
+def test_index_follows_track_and_artist_changes(make_track):
+    tracks = catalog(make_track)
+    tracks['Love Song'].is_active = False
+    tracks['Loud Noise'].title = 'Loud Love'
+    User.query.filter_by(username='other').one().username = 'renamed'
+    db.session.commit()
+
+    assert {row['title'] for row in search_tracks('love')['results']} == {'Lovely Day', 'Loud Love', 'Café Love'}
+    assert [row['artist'] for row in search_tracks('renamed')['results']] == ['renamed']
+
+
+def test_query_syntax_is_not_passed_through():
+    assert build_match_query('love" OR title:*') == '"love"* "or"* "title"*'
+    assert search_tracks('"*')['results'] == []
@@ -0,0 +1,26 @@
+import pytest
+
+from cache import fragment_cache
+from settings import PlatformSettings, platform_settings
+
+
+def test_a_change_reaches_other_workers_at_their_next_check(app):
+    other = PlatformSettings(app)
+    assert other['min_withdrawal'] == 10.0
+    version = fragment_cache.version('settings')
+
+    platform_settings.set('min_withdrawal', '25')
+    assert platform_settings['min_withdrawal'] == 25.0
+    assert other['min_withdrawal'] == 10.0
+
+    other.last_check = 0.0  # SETTINGS_CHECK_SECONDS have passed
+    assert other['min_withdrawal'] == 25.0
+    assert fragment_cache.version('settings') != version
+
+
+def test_invalid_values_are_refused(app):
+    for name, value in (('min_withdrawal', '-1'), ('max_tracks_per_artist', '2.5'), ('ad_earnings', 'nan'),
+                        ('no_such_setting', '1')):
+        with pytest.raises(ValueError):
+            platform_settings.set(name, value)
+    assert platform_settings['min_withdrawal'] == 10.0
@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+from chunked_upload import chunked_uploads, UploadError
+from database import db, MusicTrack, UploadSession, UploadChunk
+from settings import platform_settings
+from views.artist import add_uploaded_track
+
+
+def test_upload_past_the_track_limit_is_refused(make_track):
+    artist_id = make_track('First').artist_id
+    platform_settings.set('max_tracks_per_artist', 2)
+
+    assert add_uploaded_track(artist_id, 'second.mp3', 'Second', '', '') is not None
+    assert add_uploaded_track(artist_id, 'third.mp3', 'Third', '', '') is None
+    assert MusicTrack.query.filter_by(artist_id=artist_id).count() == 2
+
+
+def test_open_uploads_and_reserved_space_are_capped(make_track, monkeypatch):
+    artist_id = make_track('First').artist_id
+    for number in range(chunked_uploads.max_open_sessions):
+        chunked_uploads.create(artist_id, f'track{number}.mp3', 1024, f'Track {number}')
+
+    with pytest.raises(UploadError) as error:
+        chunked_uploads.create(artist_id, 'one_more.mp3', 1024, 'One more')
+    assert error.value.status == 429
+
+    other_id = make_track('Other', artist_username='other').artist_id
+    monkeypatch.setattr(chunked_uploads, 'max_reserved_bytes', 4096)
+    with pytest.raises(UploadError) as error:
+        chunked_uploads.create(other_id, 'large.mp3', 2048, 'Large')
+    assert error.value.status == 507
+    assert UploadSession.query.count() == chunked_uploads.max_open_sessions
+
+
+def test_complete_rechecks_the_track_limit(make_track):
+    artist_id = make_track('First').artist_id
+    upload = chunked_uploads.create(artist_id, 'second.mp3', 4, 'Second')
+    chunked_uploads.write_chunk(upload, 0, b'data', 'crc32=adf3f363')
+    platform_settings.set('max_tracks_per_artist', 1)
+
+    with pytest.raises(UploadError):
+        chunked_uploads.complete(upload)
+
+
+def test_abort_removes_the_received_chunks(make_track):
+    artist_id = make_track('First').artist_id
+    upload = chunked_uploads.create(artist_id, 'second.mp3', 4, 'Second')
+    chunked_uploads.write_chunk(upload, 0, b'data', 'crc32=adf3f363')
+    chunked_uploads.abort(upload)
+
+    assert UploadChunk.query.count() == 0
+    with pytest.raises(UploadError) as error:
+        chunked_uploads.write_chunk(upload, 0, b'data', 'crc32=adf3f363')
+    assert error.value.status == 404
+
+
+def test_upload_can_be_finalized_again_when_adding_the_track_fails(make_track):
+    artist_id = make_track('First').artist_id
+    upload = chunked_uploads.create(artist_id, 'second.mp3', 4, 'Second')
+    upload_id = upload.id
+    chunked_uploads.write_chunk(upload, 0, b'data', 'crc32=adf3f363')
+
+    filename = chunked_uploads.complete(upload)
+    db.session.rollback()
+    chunked_uploads.restore(upload_id, filename)
+
+    upload = UploadSession.query.get(upload_id)
+    assert chunked_uploads.received(upload) == [0]
+    filename = chunked_uploads.complete(upload)
+    db.session.commit()
+    with open(os.path.join(chunked_uploads.upload_folder, filename), 'rb') as f:
+        assert f.read() == b'data'
+    assert UploadSession.query.count() == 0 and UploadChunk.query.count() == 0
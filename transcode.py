@@ -0,0 +1,207 @@
+import json
+import os
+import queue
+import shutil
+import subprocess
+import threading
+
+from database import db, MusicTrack, TrackRendition
+
+# (quality, bitrate in kbps) from smallest to largest
+RENDITION_LADDER = [
+    ('low', 64),
+    ('medium', 128),
+    ('high', 192),
+]
+
+DEFAULT_QUALITY = 'medium'
+
+
+def find_encoder():
+    """Path to ffmpeg, or None if no local encoder is installed."""
+    return shutil.which('ffmpeg')
+
+
+def probe(path):
+    """Return (duration in seconds, bitrate in kbps) using ffprobe, or (None, None)."""
+    ffprobe = shutil.which('ffprobe')
+    if ffprobe is None:
+        return None, None
+    try:
+        result = subprocess.run(
+            [ffprobe, '-v', 'error', '-show_entries', 'format=duration,bit_rate', '-of', 'json', path],
+            capture_output=True, timeout=60, check=True
+        )
+        info = json.loads(result.stdout).get('format', {})
+    except (subprocess.SubprocessError, OSError, ValueError):
+        return None, None
+    duration = float(info['duration']) if info.get('duration') else None
+    bitrate = int(info['bit_rate']) // 1000 if info.get('bit_rate') else None
+    return duration, bitrate
+
+
+def rendition_dir(upload_folder, track_id):
+    return os.path.join(upload_folder, 'renditions', str(track_id))
+
+
+def transcode_track(track, upload_folder, encoder=None):
+    """Encode the rendition ladder for one track and record it.
+
+    Every rendition is resampled to 44.1 kHz stereo MP3 at a constant
+    bitrate, so players get the same format whatever was uploaded. Rungs at
+    or above the bitrate of an already-compressed source are skipped because
+    they would only be larger, not better. Returns the renditions created.
+    """
+    encoder = encoder or find_encoder()
+    if encoder is None:
+        return []
+
+    source = os.path.join(upload_folder, track.filename)
+    if not os.path.exists(source):
+        return []
+
+    duration, source_bitrate = probe(source)
+    if duration and not track.duration:
+        track.duration = int(round(duration))
+    lossless = track.filename.lower().endswith('.wav')
+
+    output_dir = rendition_dir(upload_folder, track.id)
+    os.makedirs(output_dir, exist_ok=True)
+
+    existing = {r.quality for r in TrackRendition.query.filter_by(track_id=track.id)}
+    created = []
+    for index, (quality, bitrate) in enumerate(RENDITION_LADDER):
+        if quality in existing:
+            continue
+        # The lowest rung is always built so every track has a small stream
+        if index and not lossless and source_bitrate and bitrate >= source_bitrate:
+            break
+        filename = f'{quality}.mp3'
+        target = os.path.join(output_dir, filename)
+        try:
+            subprocess.run(
+                [encoder, '-nostdin', '-loglevel', 'error', '-y', '-i', source,
+                 '-vn', '-map_metadata', '-1', '-ac', '2', '-ar', '44100',
+                 '-codec:a', 'libmp3lame', '-b:a', f'{bitrate}k', target],
+                capture_output=True, timeout=600, check=True
+            )
+        except (subprocess.SubprocessError, OSError):
+            if os.path.exists(target):
+                os.remove(target)
+            continue
+        rendition = TrackRendition(
+            track_id=track.id,
+            quality=quality,
+            bitrate_kbps=bitrate,
+            filename=f'renditions/{track.id}/{filename}',
+            size_bytes=os.path.getsize(target)
+        )
+        db.session.add(rendition)
+        created.append(rendition)
+
+    db.session.commit()
+    return created
+
+
+def remove_renditions(upload_folder, track_id):
+    shutil.rmtree(rendition_dir(upload_folder, track_id), ignore_errors=True)
+
+
+def choose_rendition(renditions, quality=None, headers=None):
+    """Pick the rendition that best fits the client's hint.
+
+    An explicit ``quality`` wins. Otherwise the Save-Data, ECT and Downlink
+    client hints are used, falling back to DEFAULT_QUALITY. Returns None
+    when the track has no renditions yet.
+    """
+    if not renditions:
+        return None
+    by_quality = {r.quality: r for r in renditions}
+
+    if quality not in dict(RENDITION_LADDER):
+        quality = DEFAULT_QUALITY
+        if headers is not None:
+            ect = headers.get('ECT', '')
+            try:
+                downlink = float(headers.get('Downlink', ''))
+            except ValueError:
+                downlink = None
+            if headers.get('Save-Data', '').lower() == 'on' or ect in ('slow-2g', '2g'):
+                quality = 'low'
+            elif ect == '3g' or (downlink is not None and downlink < 1.5):
+                quality = 'low' if downlink is not None and downlink < 0.5 else 'medium'
+            elif downlink is not None and downlink >= 5:
+                quality = 'high'
+
+    # Closest rung at or below the wanted quality, else the smallest available
+    ladder = [q for q, _ in RENDITION_LADDER]
+    wanted = ladder.index(quality)
+    for candidate in reversed(ladder[:wanted + 1]):
+        if candidate in by_quality:
+            return by_quality[candidate]
+    return by_quality[min(by_quality, key=ladder.index)]
+
+
+class TranscodeWorker:
+    """Background thread that runs the ingest stages for new uploads.
+
+    Uploads only enqueue the track id; the work runs outside the request.
+    Building the rendition ladder is always a stage, and other modules add
+    theirs with the ``stage`` decorator. Tracks that were missed (worker
+    restarted, encoder missing at the time) are picked up by the
+    ``flask transcode-tracks`` and ``flask analyze-tracks`` commands.
+    """
+
+    def __init__(self, app=None):
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.app = None
+        self.stages = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('TRANSCODE_IN_PROCESS', True)
+        self.app = app
+        app.extensions['transcode_worker'] = self
+
+    def stage(self, func):
+        """Register `func(track)` to run for every uploaded track, before transcoding."""
+        self.stages.append(func)
+        return func
+
+    def enqueue(self, track_id):
+        if not self.app.config['TRANSCODE_IN_PROCESS']:
+            return
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='transcode-worker', daemon=True)
+                self.thread.start()
+        self.queue.put(track_id)
+
+    def process(self, track_id):
+        stages = self.stages + [lambda track: transcode_track(track, self.app.config['UPLOAD_FOLDER'])]
+        for stage in stages:
+            try:
+                track = MusicTrack.query.get(track_id)
+                if track is None:
+                    return
+                stage(track)
+            except Exception:
+                # One failed stage should not stop the others
+                db.session.rollback()
+                self.app.logger.exception('Ingest stage failed for track %s', track_id)
+
+    def run(self):
+        while True:
+            track_id = self.queue.get()
+            with self.app.app_context():
+                try:
+                    self.process(track_id)
+                finally:
+                    db.session.remove()
+            self.queue.task_done()
+
+
+transcode_worker = TranscodeWorker()
@@ -0,0 +1,15 @@
+import importlib
+
+BLUEPRINTS = ['auth', 'account', 'streamer', 'artist', 'admin', 'reports', 'exports']
+
+
+def register_blueprints(app, names=None):
+    """Import the view modules and register their blueprints on `app`.
+
+    Nothing here is imported until an app is built, and `names` limits it
+    to some of them, e.g. ['auth', 'reports'] for a job that only needs
+    those routes.
+    """
+    for name in names if names is not None else BLUEPRINTS:
+        module = importlib.import_module(f'{__name__}.{name}')
+        app.register_blueprint(module.bp)
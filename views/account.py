@@ -0,0 +1,88 @@
+from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask_login import login_required, current_user
+from sqlalchemy.orm import joinedload
+
+from database import db, User, Withdrawal, Referral
+from cache import fragment_cache
+from settings import platform_settings
+import ledger
+from activity import activity_feed
+from views.admin import push_to_admins, row_update, withdrawal_stats
+
+bp = Blueprint('account', __name__)
+
+@bp.route('/withdraw', methods=['POST'])
+@login_required
+def withdraw():
+    amount = float(request.form['amount'])
+    amount_cents = ledger.cents(amount)
+    
+    if amount_cents <= 0:
+        flash('Invalid withdrawal amount')
+        return redirect(url_for('streamer.dashboard'))
+    
+    if amount_cents > ledger.balance(current_user.id):
+        flash('Insufficient balance')
+        return redirect(url_for('streamer.dashboard'))
+    
+    min_withdrawal = platform_settings['min_withdrawal']
+    if amount < min_withdrawal:
+        flash(f'Minimum withdrawal is ${min_withdrawal:.2f}')
+        return redirect(url_for('streamer.dashboard'))
+    
+    withdrawal = Withdrawal(
+        user_id=current_user.id,
+        amount=amount_cents / 100
+    )
+    
+    # Parallel withdrawals are checked one at a time: Postgres locks the user's
+    # row, and on SQLite the posting takes the write lock before the balance is read again
+    db.session.query(User.id).filter_by(id=current_user.id).with_for_update().one()
+    db.session.add(withdrawal)
+    db.session.flush()
+    
+    # The amount is held on the withdrawals account until it is paid or refunded
+    ledger.transfer('withdrawal', current_user.id, -amount_cents, ledger.WITHDRAWALS,
+                    reference=f'withdrawal:{withdrawal.id}')
+    if ledger.balance(current_user.id) < 0:
+        db.session.rollback()
+        flash('Insufficient balance')
+        return redirect(url_for('streamer.dashboard'))
+    db.session.commit()
+    activity_feed.publish('withdrawal', f'{current_user.username} requested a ${withdrawal.amount:.2f} withdrawal',
+                          current_user.id)
+    push_to_admins(row_update('withdrawal', withdrawal), withdrawal_stats())
+    
+    flash('Withdrawal request submitted!')
+    return redirect(url_for('streamer.dashboard'))
+
+@bp.route('/referral')
+@login_required
+def referral():
+    # The referral list only changes when someone registers with this user's code
+    referral_namespace = f'referrals:{current_user.id}'
+    referral_count = fragment_cache.cached(f'referral_count:{current_user.id}', [referral_namespace],
+                                           lambda: Referral.query.filter_by(referrer_id=current_user.id).count())
+    
+    # Get user's referrals with the referred user data
+    referral_friends = fragment_cache.fragment(f'referral_friends:{current_user.id}', [referral_namespace, 'settings'], lambda: render_template(
+        'partials/referral_friends.html',
+        referrals=Referral.query.options(joinedload(Referral.referred)).filter_by(referrer_id=current_user.id).all()
+    ))
+    
+    # Calculate referral earnings
+    referral_bonus = platform_settings['referral_bonus']
+    referral_earnings = referral_count * referral_bonus
+    
+    # Calculate potential earnings (if they refer more people)
+    potential_earnings = (referral_count + 10) * referral_bonus  # Example calculation
+    
+    # Create referral URL
+    referral_url = f"{request.host_url}register?ref={current_user.referral_code}"
+    
+    return render_template('referral.html',
+                         referral_count=referral_count,
+                         referral_friends=referral_friends,
+                         referral_earnings=referral_earnings,
+                         potential_earnings=potential_earnings,
+                         referral_url=referral_url)
@@ -0,0 +1,653 @@
+import os
+import secrets
+from datetime import datetime, timedelta
+
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, make_response, current_app
+from flask_login import login_required, current_user
+from sqlalchemy import func
+
+from database import db, User, MusicTrack, Withdrawal, FraudFlag
+from cache import fragment_cache
+from catalog_index import catalog_index
+from charts import charts
+from transcode import remove_renditions
+from instrumentation import instrumentation
+from settings import platform_settings
+import ledger
+from activity import activity_feed, serialize
+from live import live_updates
+from views.streamer import pay_play, record_ad_watch
+
+bp = Blueprint('admin', __name__)
+
+def row_update(kind, item):
+    """A ('user'|'track'|'withdrawal', data) delta carrying the re-rendered admin table row"""
+    return kind, {'id': item.id, 'html': render_template(f'partials/admin_{kind}_row.html', **{kind: item})}
+
+def row_removed(kind, item_id):
+    return kind, {'id': item_id, 'deleted': True}
+
+def withdrawal_stats():
+    pending = db.session.query(func.count(Withdrawal.id), func.coalesce(func.sum(Withdrawal.amount), 0))\
+        .filter_by(status='pending')\
+        .one()
+    return 'stats', {'pending_withdrawals': pending[0], 'pending_amount': pending[1]}
+
+def push_to_admins(*updates):
+    """Send deltas to the open admin streams and return them for the acting tab's response"""
+    for name, data in updates:
+        live_updates.publish('admins', name, data)
+    return [{'event': name, 'data': data} for name, data in updates]
+
+@bp.route('/admin/events')
+@login_required
+def admin_events():
+    """Server-sent table, withdrawal and activity changes for the admin dashboard"""
+    if current_user.user_type != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    subscription = live_updates.connect(current_user.id, ['admins'], request.environ)
+    if subscription is None:
+        return live_updates.refused({})
+    
+    app = current_app._get_current_object()
+    sent = {}
+    
+    def update(subscription, event):
+        if event is not None:
+            if event[0] == 'stats':
+                sent.update(event[1])
+            return [event]
+        # Heartbeat: pick up what other workers did since the last one
+        with app.app_context():
+            activity_feed.refresh()
+            name, stats = withdrawal_stats()
+        if stats == sent:
+            return []
+        sent.update(stats)
+        return [(name, stats)]
+    
+    return live_updates.response(subscription, update)
+
+@bp.route('/admin')
+@login_required
+def admin_dashboard():
+    if current_user.user_type != 'admin':
+        flash('Access denied. Admin privileges required.')
+        return redirect(url_for('streamer.dashboard'))
+    
+    # Get statistics
+    total_users = User.query.count()
+    streamer_count = User.query.filter_by(user_type='streamer').count()
+    artist_count = User.query.filter_by(user_type='artist').count()
+    total_tracks = MusicTrack.query.count()
+    active_tracks = MusicTrack.query.filter_by(is_active=True).count()
+    
+    # Calculate total earnings (sum of all track earnings)
+    total_earnings = db.session.query(func.sum(MusicTrack.earnings)).scalar() or 0
+    
+    # Withdrawal statistics
+    pending_withdrawals = Withdrawal.query.filter_by(status='pending').count()
+    pending_amount = db.session.query(func.sum(Withdrawal.amount)).filter_by(status='pending').scalar() or 0
+    
+    # Latest events from this worker's ring buffer
+    recent_activities = [serialize(event) for event in activity_feed.recent(10)]
+    
+    # Get all data for management
+    all_users = User.query.all()
+    all_tracks = MusicTrack.query.all()
+    all_withdrawals = Withdrawal.query.all()
+    
+    # Trending artists from the in-memory charts, as the chart API serves them
+    entries = charts.top_artists(5)
+    artists = {user.id: user for user in User.query.filter(User.id.in_([artist_id for artist_id, _ in entries]))}
+    top_artists = [{'id': artist_id, 'username': artists[artist_id].username, 'score': round(score, 3)}
+                   for artist_id, score in entries if artist_id in artists]
+    
+    # Total plays
+    total_plays = db.session.query(func.sum(MusicTrack.plays)).scalar() or 0
+    
+    return render_template('admin.html',
+                         total_users=total_users,
+                         streamer_count=streamer_count,
+                         artist_count=artist_count,
+                         total_tracks=total_tracks,
+                         active_tracks=active_tracks,
+                         total_earnings=total_earnings,
+                         pending_withdrawals=pending_withdrawals,
+                         pending_amount=pending_amount,
+                         recent_activities=recent_activities,
+                         all_users=all_users,
+                         all_tracks=all_tracks,
+                         all_withdrawals=all_withdrawals,
+                         top_artists=top_artists,
+                         total_plays=total_plays)
+
+# User management API endpoints
+@bp.route('/admin/user/<int:user_id>')
+@login_required
+def get_user(user_id):
+    if current_user.user_type != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    user = User.query.get_or_404(user_id)
+    return jsonify({
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'user_type': user.user_type,
+        'balance': user.balance
+    })
+
+@bp.route('/admin/user/<int:user_id>/ledger')
+@login_required
+def user_ledger(user_id):
+    if current_user.user_type != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    User.query.get_or_404(user_id)
+    limit = min(request.args.get('limit', 100, type=int), 1000)
+    return jsonify({
+        'balance': ledger.balance(user_id) / 100,
+        'entries': [{
+            'created_at': created_at.isoformat(),
+            'kind': kind,
+            'reference': reference,
+            'amount': amount_cents / 100
+        } for created_at, kind, reference, amount_cents in ledger.statement(user_id, limit)]
+    })
+
+@bp.route('/admin/activity')
+@login_required
+def admin_activity():
+    """Latest events, or older ones from the events table when paging with ?before=<id>"""
+    if current_user.user_type != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    limit = min(request.args.get('limit', 20, type=int), 200)
+    kind = request.args.get('kind') or None
+    before = request.args.get('before', type=int)
+    if before is None and 'history' not in request.args:
+        return jsonify({'events': [serialize(event) for event in activity_feed.recent(limit, kind)]})
+    
+    events = activity_feed.history(before, limit, kind)
+    return jsonify({
+        'events': [dict(serialize(event), id=event['id']) for event in events],
+        'next_before': events[-1]['id'] if len(events) == limit else None
+    })
+
+@bp.route('/admin/user/<int:user_id>', methods=['PUT'])
+@login_required
+def update_user(user_id):
+    if current_user.user_type != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    user = User.query.get_or_404(user_id)
+    data = request.json
+    
+    user.username = data.get('username', user.username)
+    user.email = data.get('email', user.email)
+    user.user_type = data.get('user_type', user.user_type)
+    
+    # A new balance is recorded as an adjustment for the difference
+    if data.get('balance') is not None:
+        difference = ledger.cents(float(data['balance'])) - ledger.balance(user.id)
+        if difference:
+            ledger.transfer('adjustment', user.id, difference, ledger.ADJUSTMENTS, created_by=current_user.id)
+    
+    db.session.commit()
+    
+    return jsonify({'success': True, 'updates': push_to_admins(row_update('user', user))})
+
+@bp.route('/admin/user/<int:user_id>/toggle_status', methods=['POST'])
+@login_required
+def toggle_user_status(user_id):
+    if current_user.user_type != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    user = User.query.get_or_404(user_id)
+    user.is_active = not user.is_active
+    db.session.commit()
+    
+    return jsonify({'success': True, 'updates': push_to_admins(row_update('user', user))})
+
+@bp.route('/admin/user/<int:user_id>', methods=['DELETE'])
+@login_required
+def delete_user(user_id):
+    if current_user.user_type != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    user = User.query.get_or_404(user_id)
+    
+    # Prevent admin from deleting themselves
+    if user.id == current_user.id:
+        return jsonify({'error': 'Cannot delete your own account'}), 400
+    
+    db.session.delete(user)
+    db.session.commit()
+    live_updates.kick(user_id)
+    
+    return jsonify({'success': True, 'updates': push_to_admins(row_removed('user', user_id))})
+
+# Track management API endpoints
+@bp.route('/admin/track/<int:track_id>')
+@login_required
+def get_track(track_id):
+    if current_user.user_type != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    track = MusicTrack.query.get_or_404(track_id)
+    return jsonify({
+        'id': track.id,
+        'title': track.title,
+        'artist': {'username': track.artist.username},
+        'plays': track.plays,
+        'earnings': track.earnings,
+        'genre': track.genre,
+        'description': track.description,
+        'upload_date': track.upload_date.isoformat(),
+        'filename': track.filename
+    })
+
+@bp.route('/admin/track/<int:track_id>/toggle_status', methods=['POST'])
+@login_required
+def toggle_track_status(track_id):
+    if current_user.user_type != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    track = MusicTrack.query.get_or_404(track_id)
+    track.is_active = not track.is_active
+    db.session.commit()
+    fragment_cache.invalidate('catalog', f'artist:{track.artist_id}')
+    catalog_index.rebuild()
+    
+    return jsonify({'success': True, 'updates': push_to_admins(row_update('track', track))})
+
+@bp.route('/admin/track/<int:track_id>', methods=['DELETE'])
+@login_required
+def admin_delete_track(track_id):
+    if current_user.user_type != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    track = MusicTrack.query.get_or_404(track_id)
+    
+    try:
+        # Delete the physical file
+        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], track.filename)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        remove_renditions(current_app.config['UPLOAD_FOLDER'], track.id)
+        
+        # Delete from database
+        db.session.delete(track)
+        db.session.commit()
+        fragment_cache.invalidate('catalog', f'artist:{track.artist_id}')
+        catalog_index.rebuild()
+        
+        return jsonify({'success': True, 'updates': push_to_admins(row_removed('track', track_id))})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# Withdrawal management API endpoints
+@bp.route('/admin/withdrawal/<int:withdrawal_id>/process', methods=['POST'])
+@login_required
+def process_withdrawal(withdrawal_id):
+    if current_user.user_type != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    withdrawal = Withdrawal.query.get_or_404(withdrawal_id)
+    data = request.json
+    action = data.get('action')
+    
+    if action not in ['approved', 'rejected']:
+        return jsonify({'error': 'Invalid action'}), 400
+    
+    if withdrawal.status != 'pending':
+        return jsonify({'error': 'Withdrawal is not pending'}), 400
+    
+    withdrawal.status = action
+    withdrawal.processed_at = datetime.utcnow()
+    
+    # If rejected, return the amount to user's balance
+    if action == 'rejected':
+        ledger.transfer('refund', withdrawal.user_id, ledger.cents(withdrawal.amount), ledger.WITHDRAWALS,
+                        reference=f'withdrawal:{withdrawal.id}', created_by=current_user.id)
+    
+    db.session.commit()
+    activity_feed.publish('withdrawal_processed',
+                          f'Withdrawal of ${withdrawal.amount:.2f} for {withdrawal.user.username} {action}',
+                          withdrawal.user_id)
+    
+    return jsonify({'success': True,
+                    'updates': push_to_admins(row_update('withdrawal', withdrawal), withdrawal_stats())})
+
+# Withdrawal Management Routes
+@bp.route('/admin/withdrawal/<int:withdrawal_id>/approve', methods=['POST'])
+@login_required
+def approve_withdrawal(withdrawal_id):
+    if current_user.user_type != 'admin':
+        return jsonify({'success': False, 'error': 'Access denied'}), 403
+    
+    withdrawal = Withdrawal.query.get_or_404(withdrawal_id)
+    
+    if withdrawal.status != 'pending':
+        return jsonify({'success': False, 'error': 'Withdrawal is not pending'}), 400
+    
+    withdrawal.status = 'approved'
+    withdrawal.processed_at = datetime.utcnow()
+    db.session.commit()
+    activity_feed.publish('withdrawal_processed',
+                          f'Withdrawal of ${withdrawal.amount:.2f} for {withdrawal.user.username} approved',
+                          withdrawal.user_id)
+    
+    return jsonify({'success': True, 'message': 'Withdrawal approved successfully',
+                    'updates': push_to_admins(row_update('withdrawal', withdrawal), withdrawal_stats())})
+
+@bp.route('/admin/withdrawal/<int:withdrawal_id>/reject', methods=['POST'])
+@login_required
+def reject_withdrawal(withdrawal_id):
+    if current_user.user_type != 'admin':
+        return jsonify({'success': False, 'error': 'Access denied'}), 403
+    
+    data = request.json
+    reason = data.get('reason', 'No reason provided')
+    
+    withdrawal = Withdrawal.query.get_or_404(withdrawal_id)
+    
+    if withdrawal.status != 'pending':
+        return jsonify({'success': False, 'error': 'Withdrawal is not pending'}), 400
+    
+    # Return amount to user balance
+    ledger.transfer('refund', withdrawal.user_id, ledger.cents(withdrawal.amount), ledger.WITHDRAWALS,
+                    reference=f'withdrawal:{withdrawal.id}', created_by=current_user.id)
+    
+    withdrawal.status = 'rejected'
+    withdrawal.processed_at = datetime.utcnow()
+    withdrawal.rejection_reason = reason
+    db.session.commit()
+    activity_feed.publish('withdrawal_processed',
+                          f'Withdrawal of ${withdrawal.amount:.2f} for {withdrawal.user.username} rejected',
+                          withdrawal.user_id)
+    
+    return jsonify({'success': True, 'message': 'Withdrawal rejected successfully',
+                    'updates': push_to_admins(row_update('withdrawal', withdrawal), withdrawal_stats())})
+
+# Fraud Review Routes
+@bp.route('/admin/fraud')
+@login_required
+def fraud_flags():
+    """Flags awaiting review, newest first; ?status= picks another status"""
+    if current_user.user_type != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    query = FraudFlag.query
+    status = request.args.get('status')
+    if status:
+        query = query.filter(FraudFlag.status == status)
+    else:
+        query = query.filter(FraudFlag.status.in_(['flagged', 'held']))
+    before = request.args.get('before', type=int)
+    if before is not None:
+        query = query.filter(FraudFlag.id < before)
+    flags = query.order_by(FraudFlag.id.desc()).limit(limit).all()
+    return jsonify({
+        'flags': [{
+            'id': flag.id,
+            'streamer_id': flag.streamer_id,
+            'kind': flag.kind,
+            'reference': flag.reference,
+            'track_id': flag.track_id,
+            'score': flag.score,
+            'reasons': flag.reasons,
+            'status': flag.status,
+            'held': (flag.held_cents + flag.artist_cents) / 100,
+            'created_at': flag.created_at.isoformat()
+        } for flag in flags],
+        'next_before': flags[-1].id if len(flags) == limit else None
+    })
+
+def claim_fraud_flag(flag, status, reviewed_status):
+    """Move a flag from `status` to `reviewed_status` unless a concurrent review got there first.
+    
+    The move is a conditional update, so only one review of a flag goes on
+    to pay or forfeit it; the flag is reloaded with the amounts as claimed.
+    Does not commit.
+    """
+    claimed = FraudFlag.query.filter_by(id=flag.id, status=status).update({
+        'status': reviewed_status,
+        'reviewed_by': current_user.id,
+        'reviewed_at': datetime.utcnow()
+    }, synchronize_session=False)
+    if not claimed:
+        db.session.rollback()
+        return False
+    db.session.refresh(flag)
+    return True
+
+@bp.route('/admin/fraud/<int:flag_id>/release', methods=['POST'])
+@login_required
+def release_fraud_flag(flag_id):
+    """Clear a flag; held earnings are paid and the play or ad is counted"""
+    if current_user.user_type != 'admin':
+        return jsonify({'success': False, 'error': 'Access denied'}), 403
+    
+    flag = FraudFlag.query.get_or_404(flag_id)
+    if flag.status not in ('flagged', 'held'):
+        return jsonify({'success': False, 'error': 'Flag was already reviewed'}), 400
+    
+    status = 'released' if flag.status == 'held' else 'cleared'
+    if not claim_fraud_flag(flag, flag.status, status):
+        return jsonify({'success': False, 'error': 'Flag was already reviewed'}), 400
+    
+    if status == 'released' and flag.kind == 'play' and (flag.held_cents or flag.artist_cents):
+        track = MusicTrack.query.get(flag.track_id)
+        streamer = User.query.get(flag.streamer_id)
+        if track is None or streamer is None:
+            db.session.rollback()
+            return jsonify({'success': False, 'error': 'Track or streamer no longer exists'}), 400
+        pay_play(track, streamer, flag.artist_cents, flag.held_cents, flag.reference)
+    elif status == 'released' and flag.kind == 'ad' and flag.held_cents:
+        ad_watch = record_ad_watch(db.session, flag.streamer_id, flag.held_cents / 100)
+        flag.reference = f'ad_watch:{ad_watch.id}'
+    db.session.commit()
+    
+    return jsonify({'success': True, 'message': f'Flag {status}'})
+
+@bp.route('/admin/fraud/<int:flag_id>/forfeit', methods=['POST'])
+@login_required
+def forfeit_fraud_flag(flag_id):
+    """Confirm a held event as fraud; its earnings are never paid"""
+    if current_user.user_type != 'admin':
+        return jsonify({'success': False, 'error': 'Access denied'}), 403
+    
+    flag = FraudFlag.query.get_or_404(flag_id)
+    if not claim_fraud_flag(flag, 'held', 'forfeited'):
+        return jsonify({'success': False, 'error': 'Only held earnings can be forfeited'}), 400
+    db.session.commit()
+    
+    return jsonify({'success': True, 'message': 'Held earnings forfeited'})
+
+# System Routes
+@bp.route('/admin/system/update_setting', methods=['POST'])
+@login_required
+def update_platform_setting():
+    if current_user.user_type != 'admin':
+        return jsonify({'success': False, 'error': 'Access denied'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    key = data.get('key')
+    value = data.get('value')
+    
+    if not key or value is None:
+        return jsonify({'success': False, 'error': 'Missing key or value'}), 400
+    
+    # Other workers pick the new value up within SETTINGS_CHECK_SECONDS
+    try:
+        value = platform_settings.set(key, value, updated_by=current_user.id)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    current_app.logger.info('Setting %s = %s by user %s', key, value, current_user.id)
+    
+    return jsonify({'success': True, 'message': 'Setting updated successfully', 'value': value})
+
+@bp.route('/admin/system/backup', methods=['POST'])
+@login_required
+def backup_database():
+    if current_user.user_type != 'admin':
+        return jsonify({'success': False, 'error': 'Access denied'}), 403
+    
+    # Copying the whole database would tie up a request worker for minutes
+    return jsonify({'success': False, 'error': 'Backups run on the server: flask backup-db'}), 501
+
+@bp.route('/admin/system/clear_cache', methods=['POST'])
+@login_required
+def clear_cache():
+    if current_user.user_type != 'admin':
+        return jsonify({'success': False, 'error': 'Access denied'}), 403
+    
+    fragment_cache.clear()
+    
+    return jsonify({'success': True, 'message': 'Cache cleared successfully'})
+
+@bp.route('/admin/system/clear_sessions', methods=['POST'])
+@login_required
+def clear_old_sessions():
+    if current_user.user_type != 'admin':
+        return jsonify({'success': False, 'error': 'Access denied'}), 403
+    
+    return jsonify({'success': False, 'error': 'Expired sessions are purged on the server: flask purge-expired'}), 501
+
+@bp.route('/admin/metrics')
+def admin_metrics():
+    """Request and query metrics in Prometheus text format"""
+    token = current_app.config['METRICS_TOKEN']
+    authorization = request.headers.get('Authorization', '')
+    scraper = token and secrets.compare_digest(authorization, f'Bearer {token}')
+    if not scraper and not (current_user.is_authenticated and current_user.user_type == 'admin'):
+        return jsonify({'success': False, 'error': 'Access denied'}), 403
+    
+    response = make_response(instrumentation.render())
+    response.mimetype = 'text/plain'
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    return response
+
+@bp.route('/admin/user/<int:user_id>/ban', methods=['POST'])
+@login_required
+def ban_user(user_id):
+    if current_user.user_type != 'admin':
+        return jsonify({'success': False, 'error': 'Access denied'}), 403
+    
+    user = User.query.get_or_404(user_id)
+    data = request.json
+    
+    # Prevent admin from banning themselves
+    if user.id == current_user.id:
+        return jsonify({'success': False, 'error': 'Cannot ban yourself'}), 400
+    
+    duration = data.get('duration')
+    reason = data.get('reason', 'No reason provided')
+    
+    # Calculate ban expiry based on duration
+    if duration == '1h':
+        ban_expiry = datetime.utcnow() + timedelta(hours=1)
+    elif duration == '24h':
+        ban_expiry = datetime.utcnow() + timedelta(days=1)
+    elif duration == '7d':
+        ban_expiry = datetime.utcnow() + timedelta(days=7)
+    elif duration == 'permanent':
+        ban_expiry = None  # Permanent ban
+    else:
+        return jsonify({'success': False, 'error': 'Invalid duration'}), 400
+    
+    user.is_banned = True
+    user.ban_expiry = ban_expiry
+    user.ban_reason = reason
+    user.banned_at = datetime.utcnow()
+    
+    db.session.commit()
+    activity_feed.publish('ban', f'{user.username} was banned ({duration}): {reason}', user.id)
+    live_updates.kick(user.id)
+    
+    return jsonify({'success': True, 'message': f'User {user.username} has been banned',
+                    'updates': push_to_admins(row_update('user', user))})
+
+@bp.route('/admin/user/<int:user_id>/unban', methods=['POST'])
+@login_required
+def unban_user(user_id):
+    if current_user.user_type != 'admin':
+        return jsonify({'success': False, 'error': 'Access denied'}), 403
+    
+    user = User.query.get_or_404(user_id)
+    
+    user.is_banned = False
+    user.ban_expiry = None
+    user.ban_reason = None
+    user.banned_at = None
+    
+    db.session.commit()
+    activity_feed.publish('unban', f'{user.username} was unbanned', user.id)
+    
+    return jsonify({'success': True, 'message': f'User {user.username} has been unbanned',
+                    'updates': push_to_admins(row_update('user', user))})
+
+# Bulk Actions
+@bp.route('/admin/users/bulk_action', methods=['POST'])
+@login_required
+def bulk_user_action():
+    if current_user.user_type != 'admin':
+        return jsonify({'success': False, 'error': 'Access denied'}), 403
+    
+    data = request.json
+    action = data.get('action')
+    user_ids = data.get('user_ids', [])
+    
+    if not user_ids:
+        return jsonify({'success': False, 'error': 'No users selected'}), 400
+    
+    users = User.query.filter(User.id.in_(user_ids)).all()
+    events = []
+    
+    for user in users:
+        if user.id == current_user.id:
+            continue  # Skip current admin
+            
+        if action == 'activate':
+            user.is_active = True
+        elif action == 'deactivate':
+            user.is_active = False
+        elif action == 'delete':
+            db.session.delete(user)
+        elif action.startswith('ban_'):
+            duration = action.split('_')[1]
+            if duration == '1h':
+                user.ban_expiry = datetime.utcnow() + timedelta(hours=1)
+            elif duration == '24h':
+                user.ban_expiry = datetime.utcnow() + timedelta(days=1)
+            elif duration == '7d':
+                user.ban_expiry = datetime.utcnow() + timedelta(days=7)
+            user.is_banned = True
+            user.banned_at = datetime.utcnow()
+            events.append(('ban', f'{user.username} was banned ({duration})', user.id))
+        elif action == 'unban':
+            user.is_banned = False
+            user.ban_expiry = None
+            events.append(('unban', f'{user.username} was unbanned', user.id))
+    
+    changed = [user for user in users if user.id != current_user.id]
+    removed = [user.id for user in changed if action == 'delete']
+    db.session.commit()
+    for kind, message, user_id in events:
+        activity_feed.publish(kind, message, user_id)
+        if kind == 'ban':
+            live_updates.kick(user_id)
+    for user_id in removed:
+        live_updates.kick(user_id)
+    
+    if removed:
+        updates = [row_removed('user', user_id) for user_id in removed]
+    else:
+        updates = [row_update('user', user) for user in changed]
+    return jsonify({'success': True, 'message': f'Action completed for {len(users)} users',
+                    'updates': push_to_admins(*updates)})
@@ -0,0 +1,327 @@
+import os
+import uuid
+from datetime import date, datetime
+
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, current_app
+from flask_login import login_required, current_user
+from werkzeug.utils import secure_filename
+
+from database import db, User, MusicTrack, ListeningHistory
+from cache import fragment_cache
+from catalog_index import catalog_index
+from counters import sharded_counters
+from transcode import transcode_worker, remove_renditions
+from chunked_upload import chunked_uploads, UploadError
+from analysis import analyze_track
+from settings import platform_settings
+from activity import activity_feed
+from analytics import play_analytics, PERIODS, bucket_count, default_start
+
+bp = Blueprint('artist', __name__)
+
+ALLOWED_EXTENSIONS = {'mp3', 'wav', 'ogg'}
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+@bp.route('/artist/dashboard')
+@login_required
+def artist_dashboard():
+    if current_user.user_type != 'artist':
+        return redirect(url_for('streamer.dashboard'))
+    
+    tracks = MusicTrack.query.filter_by(artist_id=current_user.id).all()
+    # Totals include credits still in counter shards
+    track_ids = [track.id for track in tracks]
+    total_earnings = sum(track.earnings for track in tracks) + \
+        sum(sharded_counters.pending('track_earnings', track_ids).values()) / 100
+    total_plays = sum(track.plays for track in tracks) + sum(sharded_counters.pending('track_plays', track_ids).values())
+    
+    # Get unique listeners count
+    unique_listeners = db.session.query(ListeningHistory.streamer_id)\
+        .join(MusicTrack)\
+        .filter(MusicTrack.artist_id == current_user.id)\
+        .distinct()\
+        .count()
+    
+    # Get top performing tracks
+    top_tracks = MusicTrack.query\
+        .filter_by(artist_id=current_user.id)\
+        .order_by(MusicTrack.plays.desc())\
+        .limit(5)\
+        .all()
+    
+    return render_template('artist.html',
+                         tracks=tracks,
+                         total_earnings=total_earnings,
+                         total_plays=total_plays,
+                         listeners_count=unique_listeners,
+                         top_tracks=top_tracks)
+
+@bp.route('/api/artist/analytics')
+@login_required
+def artist_analytics():
+    """Plays, earnings and unique listeners across the artist's tracks over time"""
+    if current_user.user_type != 'artist':
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    return analytics_response('artist', current_user.id)
+
+@bp.route('/api/artist/tracks/<int:track_id>/analytics')
+@login_required
+def track_analytics(track_id):
+    """Plays, earnings and unique listeners of one of the artist's tracks over time"""
+    if current_user.user_type != 'artist':
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    track = MusicTrack.query.get_or_404(track_id)
+    if track.artist_id != current_user.id:
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    return analytics_response('track', track.id)
+
+def analytics_response(scope, key):
+    """Answer ?period=day|week|month&start=&end= from the rollups, through the fragment cache.
+    
+    Dates are YYYY-MM-DD in UTC. `end` defaults to today and `start` to
+    30 days, 12 weeks or 12 months before it; `start=all` begins at the
+    first play.
+    """
+    period = request.args.get('period', 'day')
+    if period not in PERIODS:
+        return jsonify({'success': False, 'error': f"period must be one of {', '.join(PERIODS)}"}), 400
+    
+    today = datetime.utcnow().date()
+    try:
+        end = min(date.fromisoformat(request.args['end']), today) if request.args.get('end') else today
+        if request.args.get('start') == 'all':
+            start = play_analytics.first_day(scope, key) or end
+        elif request.args.get('start'):
+            start = date.fromisoformat(request.args['start'])
+        else:
+            start = default_start(end, period)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Dates must be YYYY-MM-DD'}), 400
+    if start > end:
+        return jsonify({'success': False, 'error': 'start must not be after end'}), 400
+    if bucket_count(start, end, period) > play_analytics.max_buckets:
+        return jsonify({'success': False, 'error': 'Too many buckets; pick a longer period or a shorter range'}), 400
+    
+    # Past days no longer change; a range that includes today is refreshed often
+    ttl = play_analytics.cache_seconds if end >= today else play_analytics.history_cache_seconds
+    data = fragment_cache.cached(f'analytics:{scope}:{key}:{period}:{start}:{end}', [f'artist:{current_user.id}'],
+                                 lambda: play_analytics.series(scope, key, period, start, end), ttl=ttl)
+    return jsonify(dict(data, success=True))
+
+@bp.route('/upload', methods=['GET', 'POST'])
+@login_required
+def upload():
+    if current_user.user_type != 'artist':
+        return redirect(url_for('streamer.dashboard'))
+    
+    # Sidebar and track count only change with this artist's uploads and deletes
+    artist_namespace = f'artist:{current_user.id}'
+    
+    # Get recent tracks for the sidebar
+    recent_uploads = fragment_cache.fragment(f'recent_uploads:{current_user.id}', [artist_namespace], lambda: render_template(
+        'partials/recent_uploads.html',
+        recent_tracks=MusicTrack.query
+            .filter_by(artist_id=current_user.id)
+            .order_by(MusicTrack.upload_date.desc())
+            .limit(5)
+            .all()
+    ))
+    
+    # Get current track count for display; the limit check below counts afresh
+    current_tracks_count = fragment_cache.cached(f'track_count:{current_user.id}', [artist_namespace],
+                                                 lambda: MusicTrack.query.filter_by(artist_id=current_user.id).count())
+    
+    if request.method == 'POST':
+        if 'file' not in request.files:
+            flash('No file selected')
+            return render_template('upload.html', 
+                                 recent_uploads=recent_uploads,
+                                 current_tracks_count=current_tracks_count)
+        
+        file = request.files['file']
+        title = request.form['title']
+        genre = request.form.get('genre', '')
+        description = request.form.get('description', '')
+        
+        if not title:
+            flash('Track title is required')
+            return render_template('upload.html',
+                                 recent_uploads=recent_uploads,
+                                 current_tracks_count=current_tracks_count)
+        
+        if file.filename == '':
+            flash('No file selected')
+            return render_template('upload.html',
+                                 recent_uploads=recent_uploads,
+                                 current_tracks_count=current_tracks_count)
+        
+        if file and allowed_file(file.filename):
+            # Check the per-artist track limit
+            max_tracks = platform_settings['max_tracks_per_artist']
+            if artist_track_count(current_user.id) >= max_tracks:
+                flash(f'You have reached the maximum limit of {max_tracks} tracks')
+                return render_template('upload.html',
+                                     recent_uploads=recent_uploads,
+                                     current_tracks_count=current_tracks_count)
+            
+            filename = secure_filename(file.filename)
+            unique_filename = f"{uuid.uuid4()}_{filename}"
+            file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
+            file.save(file_path)
+            
+            # Another upload may have reached the limit while this file was saved
+            if add_uploaded_track(current_user.id, unique_filename, title, genre, description) is None:
+                os.remove(file_path)
+                flash(f'You have reached the maximum limit of {max_tracks} tracks')
+                return redirect(url_for('artist.upload'))
+            
+            flash('Track uploaded successfully!', 'success')
+            return redirect(url_for('artist.upload'))
+        else:
+            flash('Invalid file type. Please upload MP3, WAV, or OGG files.')
+    
+    return render_template('upload.html',
+                         recent_uploads=recent_uploads,
+                         current_tracks_count=current_tracks_count)
+
+def artist_track_count(artist_id):
+    """Uncached number of tracks an artist has, for enforcing the track limit"""
+    return MusicTrack.query.filter_by(artist_id=artist_id).count()
+
+def add_uploaded_track(artist_id, filename, title, genre, description):
+    """Create the track record for a stored upload and start processing it.
+    
+    Returns None, adding nothing, when the artist is already at the track limit.
+    """
+    track = MusicTrack(
+        title=title,
+        artist_id=artist_id,
+        filename=filename,
+        genre=genre,
+        description=description
+    )
+    
+    # Parallel uploads count one at a time: Postgres locks the artist's row,
+    # and on SQLite the insert takes the write lock before the count
+    db.session.query(User.id).filter_by(id=artist_id).with_for_update().one()
+    db.session.add(track)
+    db.session.flush()
+    if artist_track_count(artist_id) > platform_settings['max_tracks_per_artist']:
+        db.session.rollback()
+        return None
+    db.session.commit()
+    fragment_cache.invalidate('catalog', f'artist:{artist_id}')
+    catalog_index.rebuild()
+    activity_feed.publish('upload', f'{track.artist.username} uploaded "{title}"', artist_id)
+    
+    # Analyze and build the low/medium/high streaming renditions in the background
+    transcode_worker.enqueue(track.id)
+    return track
+
+# Resumable chunked uploads: init, send chunks in any order, then finalize
+@bp.errorhandler(UploadError)
+def handle_upload_error(error):
+    return jsonify({'success': False, 'error': error.message}), error.status
+
+@bp.route('/api/uploads', methods=['POST'])
+@login_required
+def create_upload():
+    if current_user.user_type != 'artist':
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    data = request.get_json() or {}
+    filename = secure_filename(data.get('filename', ''))
+    title = (data.get('title') or '').strip()
+    if not title:
+        return jsonify({'success': False, 'error': 'Track title is required'}), 400
+    if not filename or not allowed_file(filename):
+        return jsonify({'success': False, 'error': 'Invalid file type. Please upload MP3, WAV, or OGG files.'}), 400
+    max_tracks = platform_settings['max_tracks_per_artist']
+    if artist_track_count(current_user.id) >= max_tracks:
+        return jsonify({'success': False, 'error': f'You have reached the maximum limit of {max_tracks} tracks'}), 400
+    try:
+        size = int(data.get('size', 0))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'Invalid file size'}), 400
+    
+    upload = chunked_uploads.create(current_user.id, filename, size, title,
+                                    data.get('genre', ''), data.get('description', ''))
+    return jsonify(dict(chunked_uploads.status(upload), success=True))
+
+@bp.route('/api/uploads/<upload_id>', methods=['GET'])
+@login_required
+def upload_status(upload_id):
+    upload = chunked_uploads.get(upload_id, current_user.id)
+    return jsonify(dict(chunked_uploads.status(upload), success=True))
+
+@bp.route('/api/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+@login_required
+def upload_chunk(upload_id, index):
+    upload = chunked_uploads.get(upload_id, current_user.id)
+    chunked_uploads.write_chunk(upload, index, request.get_data(cache=False),
+                                request.headers.get('X-Chunk-Checksum'))
+    return jsonify({'success': True, 'index': index})
+
+@bp.route('/api/uploads/<upload_id>/finalize', methods=['POST'])
+@login_required
+def finalize_upload(upload_id):
+    upload = chunked_uploads.get(upload_id, current_user.id)
+    title, genre, description = upload.title, upload.genre, upload.description
+    filename = chunked_uploads.complete(upload)
+    try:
+        track = add_uploaded_track(current_user.id, filename, title, genre, description)
+    except Exception:
+        db.session.rollback()
+        chunked_uploads.restore(upload_id, filename)
+        raise
+    if track is None:
+        os.remove(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
+        chunked_uploads.abort(upload)
+        max_tracks = platform_settings['max_tracks_per_artist']
+        return jsonify({'success': False, 'error': f'You have reached the maximum limit of {max_tracks} tracks'}), 400
+    return jsonify({'success': True, 'track_id': track.id})
+
+@bp.route('/api/uploads/<upload_id>', methods=['DELETE'])
+@login_required
+def abort_upload(upload_id):
+    chunked_uploads.abort(chunked_uploads.get(upload_id, current_user.id))
+    return jsonify({'success': True})
+
+@transcode_worker.stage
+def analyze_upload(track):
+    analyze_track(track, current_app.config['UPLOAD_FOLDER'], current_app.config['WAVEFORM_POINTS'])
+
+@bp.route('/delete_track/<int:track_id>', methods=['DELETE'])
+@login_required
+def delete_track(track_id):
+    if current_user.user_type != 'artist':
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    track = MusicTrack.query.get_or_404(track_id)
+    
+    # Check if the track belongs to the current user
+    if track.artist_id != current_user.id:
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    try:
+        # Delete the physical file
+        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], track.filename)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        remove_renditions(current_app.config['UPLOAD_FOLDER'], track.id)
+        
+        # Delete from database
+        db.session.delete(track)
+        db.session.commit()
+        fragment_cache.invalidate('catalog', f'artist:{track.artist_id}')
+        catalog_index.rebuild()
+        
+        return jsonify({'success': True})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
@@ -0,0 +1,211 @@
+import secrets
+import uuid
+from datetime import datetime, timedelta
+
+from flask import Blueprint, render_template, request, redirect, url_for, flash, make_response, session, current_app
+from flask_login import login_user, logout_user, login_required, current_user
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from database import db, User, Referral
+from cache import fragment_cache
+from settings import platform_settings
+import ledger
+from activity import activity_feed
+
+bp = Blueprint('auth', __name__)
+
+@bp.route('/home')
+def home():
+    """Homepage route"""
+    # The homepage is the same for every visitor, so the rendered page is cached
+    html = fragment_cache.cached('home', ['home'], lambda: render_template('index.html'), ttl=3600)
+    response = make_response(html)
+    response.add_etag()
+    return response.make_conditional(request)
+
+# Update the index route to redirect to home
+@bp.route('/')
+def index():
+    if current_user.is_authenticated:
+        return redirect(url_for('streamer.dashboard'))
+    return redirect(url_for('auth.home'))
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        email = request.form['email']
+        password = request.form['password']
+        user = User.query.filter_by(email=email).first()
+        
+        if user and check_password_hash(user.password, password):
+            login_user(user)
+            # Clear any previous session data
+            session.pop('ad_start_time', None)
+            session.pop('ad_unlock_expiry', None)
+            session.pop('ad_completed', None)
+            
+            # Add proper redirect based on user type
+            if user.user_type == 'admin':
+                return redirect(url_for('admin.admin_dashboard'))
+            elif user.user_type == 'artist':
+                return redirect(url_for('artist.artist_dashboard'))
+            else:
+                return redirect(url_for('streamer.dashboard'))
+        else:
+            flash('Invalid credentials')
+    return render_template('login.html')
+
+@bp.route('/register', methods=['GET', 'POST'])
+def register():
+    if request.method == 'POST':
+        username = request.form['username']
+        email = request.form['email']
+        password = request.form['password']
+        user_type = request.form['user_type']
+        referral_code = request.form.get('referral_code', '')
+        
+        if User.query.filter_by(email=email).first():
+            flash('Email already exists')
+            return render_template('register.html')
+        
+        # Generate unique referral code
+        ref_code = str(uuid.uuid4())[:8]
+        
+        user = User(
+            username=username,
+            email=email,
+            password=generate_password_hash(password),
+            user_type=user_type,
+            referral_code=ref_code,
+            referred_by=referral_code if referral_code else None
+        )
+        
+        db.session.add(user)
+        db.session.commit()
+        activity_feed.publish('register', f'New {user_type} registered: {username}', user.id)
+        
+        # Handle referral bonus
+        if referral_code:
+            referrer = User.query.filter_by(referral_code=referral_code).first()
+            if referrer:
+                referral = Referral(referrer_id=referrer.id, referred_id=user.id, bonus_paid=True)
+                db.session.add(referral)
+                db.session.flush()
+                ledger.transfer('referral', referrer.id, ledger.cents(platform_settings['referral_bonus']),
+                                ledger.PAYOUTS, reference=f'referral:{referral.id}')
+                db.session.commit()
+                fragment_cache.invalidate(f'referrals:{referrer.id}')
+        
+        flash('Registration successful! Please login.')
+        return redirect(url_for('auth.login'))
+    
+    return render_template('register.html')
+
+@bp.route('/forgot-password', methods=['GET', 'POST'])
+def forgot_password():
+    if request.method == 'POST':
+        email = request.form['email']
+        user = User.query.filter_by(email=email).first()
+        
+        if user:
+            # Generate reset token
+            reset_token = secrets.token_urlsafe(32)
+            user.reset_token = reset_token
+            user.reset_token_expiry = datetime.utcnow() + timedelta(hours=1)
+            db.session.commit()
+            
+            # Send reset email
+            send_reset_email(user.email, reset_token)
+            flash('Password reset instructions have been sent to your email.')
+            return redirect(url_for('auth.login'))
+        else:
+            flash('If that email exists in our system, reset instructions will be sent.')
+            # Don't reveal whether email exists for security
+    
+    return render_template('forgot_password.html')
+
+@bp.route('/reset-password/<token>', methods=['GET', 'POST'])
+def reset_password(token):
+    user = User.query.filter_by(reset_token=token).first()
+    
+    # Check if token is valid and not expired
+    if not user or not user.reset_token_expiry or user.reset_token_expiry < datetime.utcnow():
+        flash('Invalid or expired reset token.')
+        return redirect(url_for('auth.forgot_password'))
+    
+    if request.method == 'POST':
+        password = request.form['password']
+        confirm_password = request.form['confirm_password']
+        
+        if password != confirm_password:
+            flash('Passwords do not match.')
+            return render_template('reset_password.html', token=token)
+        
+        if len(password) < 6:
+            flash('Password must be at least 6 characters long.')
+            return render_template('reset_password.html', token=token)
+        
+        # Update password
+        user.password = generate_password_hash(password)
+        user.reset_token = None
+        user.reset_token_expiry = None
+        db.session.commit()
+        
+        flash('Your password has been reset successfully. Please login.')
+        return redirect(url_for('auth.login'))
+    
+    return render_template('reset_password.html', token=token)
+
+def send_reset_email(email, token):
+    """Send password reset email"""
+    # Imported here so workers don't load the mail stack until someone resets a password
+    import smtplib
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+    
+    try:
+        reset_url = url_for('auth.reset_password', token=token, _external=True)
+        
+        # Create message
+        subject = "S.S PRODUCTION - Password Reset Request"
+        body = f"""
+        Hello,
+        
+        You have requested to reset your password for your S.S PRODUCTION account.
+        
+        Please click the following link to reset your password:
+        {reset_url}
+        
+        This link will expire in 1 hour.
+        
+        If you didn't request this reset, please ignore this email.
+        
+        Best regards,
+        S.S PRODUCTION Team
+        """
+        
+        # For production, you would use a proper email service
+        # This is a simplified version
+        msg = MIMEMultipart()
+        msg['From'] = current_app.config['MAIL_DEFAULT_SENDER']
+        msg['To'] = email
+        msg['Subject'] = subject
+        msg.attach(MIMEText(body, 'plain'))
+        
+        # Send email (you might want to use a background task for this)
+        server = smtplib.SMTP(current_app.config['MAIL_SERVER'], current_app.config['MAIL_PORT'])
+        server.starttls()
+        server.login(current_app.config['MAIL_USERNAME'], current_app.config['MAIL_PASSWORD'])
+        server.send_message(msg)
+        server.quit()
+        
+    except Exception:
+        current_app.logger.exception('Error sending reset email to %s', email)
+
+@bp.route('/logout')
+@login_required
+def logout():
+    # Clear session data on logout
+    session.clear()
+    logout_user()
+    return redirect(url_for('auth.login'))
@@ -0,0 +1,90 @@
+from flask import Blueprint, jsonify, make_response
+from flask_login import login_required, current_user
+
+from database import User, MusicTrack, Withdrawal
+
+bp = Blueprint('exports', __name__)
+
+# Export Routes
+@bp.route('/admin/export/<data_type>')
+@login_required
+def export_data(data_type):
+    if current_user.user_type != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    if data_type == 'users':
+        return export_users_csv()
+    elif data_type == 'tracks':
+        return export_tracks_csv()
+    elif data_type == 'earnings':
+        return export_earnings_csv()
+    elif data_type == 'withdrawals':
+        return export_withdrawals_csv()
+    else:
+        return jsonify({'error': 'Invalid export type'}), 400
+
+def export_users_csv():
+    """Export users data as CSV"""
+    users = User.query.all()
+    csv_data = "ID,Username,Email,User Type,Balance,Status,Created At\n"
+    
+    for user in users:
+        status = 'banned' if user.is_banned else 'active' if user.is_active else 'inactive'
+        csv_data += f'{user.id},{user.username},{user.email},{user.user_type},{user.balance},{status},{user.created_at}\n'
+    
+    response = make_response(csv_data)
+    response.headers["Content-Disposition"] = "attachment; filename=users_export.csv"
+    response.headers["Content-type"] = "text/csv"
+    return response
+
+def export_tracks_csv():
+    """Export tracks data as CSV"""
+    tracks = MusicTrack.query.all()
+    csv_data = "ID,Title,Artist,Plays,Earnings,Genre,Status,Upload Date\n"
+    
+    for track in tracks:
+        status = 'active' if track.is_active else 'inactive'
+        artist_name = track.artist.username if track.artist else 'Unknown'
+        upload_date = track.upload_date if hasattr(track, 'upload_date') else 'Unknown'
+        csv_data += f'{track.id},"{track.title}","{artist_name}",{track.plays},{track.earnings},{track.genre or "Unknown"},{status},{upload_date}\n'
+    
+    response = make_response(csv_data)
+    response.headers["Content-Disposition"] = "attachment; filename=tracks_export.csv"
+    response.headers["Content-type"] = "text/csv"
+    return response
+
+def export_earnings_csv():
+    """Export earnings data as CSV"""
+    csv_data = "Date,Platform Earnings,Artist Payouts,Streamer Payouts,Net Revenue\n"
+    
+    # Sample data
+    earnings_data = [
+        ('2024-01-01', 500.00, 300.00, 200.00, 0.00),
+        ('2024-02-01', 750.00, 450.00, 300.00, 0.00),
+        ('2024-03-01', 600.00, 400.00, 200.00, 0.00),
+        ('2024-04-01', 900.00, 600.00, 300.00, 0.00),
+        ('2024-05-01', 1200.00, 800.00, 400.00, 0.00),
+        ('2024-06-01', 1500.00, 1000.00, 500.00, 0.00),
+    ]
+    
+    for date, platform, artist, streamer, net in earnings_data:
+        csv_data += f'{date},{platform},{artist},{streamer},{net}\n'
+    
+    response = make_response(csv_data)
+    response.headers["Content-Disposition"] = "attachment; filename=earnings_export.csv"
+    response.headers["Content-type"] = "text/csv"
+    return response
+
+def export_withdrawals_csv():
+    """Export withdrawals data as CSV"""
+    withdrawals = Withdrawal.query.all()
+    csv_data = "ID,User,Amount,Status,Requested At,Processed At\n"
+    
+    for withdrawal in withdrawals:
+        processed_at = withdrawal.processed_at if withdrawal.processed_at else "Not processed"
+        csv_data += f'{withdrawal.id},{withdrawal.user.username},{withdrawal.amount},{withdrawal.status},{withdrawal.requested_at},{processed_at}\n'
+    
+    response = make_response(csv_data)
+    response.headers["Content-Disposition"] = "attachment; filename=withdrawals_export.csv"
+    response.headers["Content-type"] = "text/csv"
+    return response
@@ -0,0 +1,316 @@
+from datetime import datetime, timedelta
+
+from flask import Blueprint, request, jsonify, current_app
+from flask_login import login_required, current_user
+
+from database import db, User, MusicTrack, Withdrawal
+
+bp = Blueprint('reports', __name__)
+
+# Enhanced Admin Routes for Reports and Withdrawals
+
+# Reports Data Endpoint
+@bp.route('/admin/reports/data')
+@login_required
+def get_reports_data():
+    if current_user.user_type != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    period = request.args.get('period', '30d')
+    report_type = request.args.get('type', 'overview')
+    
+    try:
+        # Calculate date range based on period
+        end_date = datetime.utcnow()
+        if period == '7d':
+            start_date = end_date - timedelta(days=7)
+        elif period == '30d':
+            start_date = end_date - timedelta(days=30)
+        elif period == '90d':
+            start_date = end_date - timedelta(days=90)
+        elif period == '1y':
+            start_date = end_date - timedelta(days=365)
+        else:  # all time
+            # Get the earliest user creation date or use a default
+            first_user = User.query.order_by(User.created_at.asc()).first()
+            start_date = first_user.created_at if first_user else datetime(2024, 1, 1)
+        
+        data = generate_report_data(report_type, start_date, end_date)
+        return jsonify(data)
+    
+    except Exception as e:
+        current_app.logger.exception('Error generating report')
+        return jsonify({'error': f'Failed to generate report data: {str(e)}'}), 500
+
+def generate_report_data(report_type, start_date, end_date):
+    """Generate report data based on type and date range"""
+    
+    if report_type == 'overview':
+        return generate_overview_report(start_date, end_date)
+    elif report_type == 'earnings':
+        return generate_earnings_report(start_date, end_date)
+    elif report_type == 'users':
+        return generate_users_report(start_date, end_date)
+    elif report_type == 'music':
+        return generate_music_report(start_date, end_date)
+    else:
+        return generate_overview_report(start_date, end_date)
+
+def generate_overview_report(start_date, end_date):
+    """Generate overview report data"""
+    
+    try:
+        # User statistics
+        total_users = User.query.count()
+        new_users = User.query.filter(
+            User.created_at >= start_date,
+            User.created_at <= end_date
+        ).count()
+        
+        # MusicTrack statistics
+        total_tracks = MusicTrack.query.count()
+        new_tracks = MusicTrack.query.filter(
+            MusicTrack.upload_date >= start_date,
+            MusicTrack.upload_date <= end_date
+        ).count() if hasattr(MusicTrack, 'upload_date') else 0
+        
+        # Earnings statistics
+        total_earnings = db.session.query(db.func.sum(MusicTrack.earnings)).scalar() or 0
+        period_earnings = db.session.query(db.func.sum(MusicTrack.earnings)).filter(
+            MusicTrack.upload_date >= start_date,
+            MusicTrack.upload_date <= end_date
+        ).scalar() or 0 if hasattr(MusicTrack, 'upload_date') else 0
+        
+        # Withdrawal statistics
+        pending_withdrawals = Withdrawal.query.filter_by(status='pending').count()
+        
+        # Generate sample chart data
+        labels = get_last_6_months()
+        user_data = generate_sample_user_data(total_users)
+        earnings_data = generate_sample_earnings_data(total_earnings)
+        
+        return {
+            'chartType': 'line',
+            'title': 'Platform Overview - Last 6 Months',
+            'labels': labels,
+            'datasets': [
+                {
+                    'label': 'User Growth',
+                    'data': user_data,
+                    'borderColor': 'rgb(75, 192, 192)',
+                    'tension': 0.1
+                },
+                {
+                    'label': 'Platform Earnings ($)',
+                    'data': earnings_data,
+                    'borderColor': 'rgb(255, 99, 132)',
+                    'tension': 0.1
+                }
+            ],
+            'summary': [
+                {'label': 'Total Users', 'value': total_users},
+                {'label': 'New Users', 'value': new_users},
+                {'label': 'Total Tracks', 'value': total_tracks},
+                {'label': 'New Tracks', 'value': new_tracks},
+                {'label': 'Total Earnings', 'value': f'${total_earnings:.2f}'},
+                {'label': 'Period Earnings', 'value': f'${period_earnings:.2f}'},
+                {'label': 'Pending Withdrawals', 'value': pending_withdrawals}
+            ]
+        }
+    except Exception:
+        current_app.logger.exception('Error in overview report')
+        return get_fallback_report('overview')
+
+def generate_earnings_report(start_date, end_date):
+    """Generate earnings report data"""
+    try:
+        # Calculate earnings by month
+        labels = get_last_6_months()
+        
+        # Sample data - replace with actual queries
+        platform_earnings = [500, 750, 600, 900, 1200, 1500]
+        artist_earnings = [300, 450, 400, 600, 800, 1000]
+        streamer_earnings = [200, 300, 200, 300, 400, 500]
+        
+        total_platform = sum(platform_earnings)
+        total_artist = sum(artist_earnings)
+        total_streamer = sum(streamer_earnings)
+        
+        return {
+            'chartType': 'bar',
+            'title': 'Earnings Distribution - Last 6 Months',
+            'labels': labels,
+            'datasets': [
+                {
+                    'label': 'Platform Earnings',
+                    'data': platform_earnings,
+                    'backgroundColor': 'rgba(255, 99, 132, 0.5)'
+                },
+                {
+                    'label': 'Artist Earnings',
+                    'data': artist_earnings,
+                    'backgroundColor': 'rgba(54, 162, 235, 0.5)'
+                },
+                {
+                    'label': 'Streamer Earnings',
+                    'data': streamer_earnings,
+                    'backgroundColor': 'rgba(75, 192, 192, 0.5)'
+                }
+            ],
+            'summary': [
+                {'label': 'Total Platform Revenue', 'value': f'${total_platform:.2f}'},
+                {'label': 'Total Artist Payouts', 'value': f'${total_artist:.2f}'},
+                {'label': 'Total Streamer Payouts', 'value': f'${total_streamer:.2f}'},
+                {'label': 'Net Profit', 'value': f'${total_platform - total_artist - total_streamer:.2f}'}
+            ]
+        }
+    except Exception:
+        current_app.logger.exception('Error in earnings report')
+        return get_fallback_report('earnings')
+
+def generate_users_report(start_date, end_date):
+    """Generate user growth report data"""
+    try:
+        labels = get_last_6_months()
+        
+        current_streamers = User.query.filter_by(user_type='streamer').count()
+        current_artists = User.query.filter_by(user_type='artist').count()
+        total_current_users = User.query.count()
+        
+        # Sample growth data
+        streamers = generate_sample_growth_data(current_streamers, 6)
+        artists = generate_sample_growth_data(current_artists, 6)
+        total_users = [s + a for s, a in zip(streamers, artists)]
+        
+        return {
+            'chartType': 'line',
+            'title': 'User Growth - Last 6 Months',
+            'labels': labels,
+            'datasets': [
+                {
+                    'label': 'Total Users',
+                    'data': total_users,
+                    'borderColor': 'rgb(75, 192, 192)',
+                    'tension': 0.1
+                },
+                {
+                    'label': 'Streamers',
+                    'data': streamers,
+                    'borderColor': 'rgb(255, 99, 132)',
+                    'tension': 0.1
+                },
+                {
+                    'label': 'Artists',
+                    'data': artists,
+                    'borderColor': 'rgb(54, 162, 235)',
+                    'tension': 0.1
+                }
+            ],
+            'summary': [
+                {'label': 'Total Users', 'value': total_current_users},
+                {'label': 'Active Streamers', 'value': current_streamers},
+                {'label': 'Active Artists', 'value': current_artists},
+                {'label': 'New Registrations', 'value': User.query.filter(
+                    User.created_at >= start_date,
+                    User.created_at <= end_date
+                ).count()}
+            ]
+        }
+    except Exception:
+        current_app.logger.exception('Error in users report')
+        return get_fallback_report('users')
+
+def generate_music_report(start_date, end_date):
+    """Generate music performance report data"""
+    try:
+        labels = get_last_6_months()
+        
+        total_tracks = MusicTrack.query.count()
+        new_tracks = MusicTrack.query.filter(
+            MusicTrack.upload_date >= start_date,
+            MusicTrack.upload_date <= end_date
+        ).count() if hasattr(MusicTrack, 'upload_date') else 0
+        
+        # Sample data
+        tracks_uploaded = generate_sample_growth_data(total_tracks, 6)
+        total_plays = [t * 50 for t in tracks_uploaded]  # Estimate plays
+        total_earnings = [p * 0.1 for p in total_plays]  # Estimate earnings
+        
+        return {
+            'chartType': 'bar',
+            'title': 'Music Performance - Last 6 Months',
+            'labels': labels,
+            'datasets': [
+                {
+                    'label': 'Tracks Uploaded',
+                    'data': tracks_uploaded,
+                    'backgroundColor': 'rgba(54, 162, 235, 0.5)'
+                },
+                {
+                    'label': 'Total Plays',
+                    'data': total_plays,
+                    'backgroundColor': 'rgba(255, 99, 132, 0.5)'
+                },
+                {
+                    'label': 'Total Earnings ($)',
+                    'data': total_earnings,
+                    'backgroundColor': 'rgba(75, 192, 192, 0.5)'
+                }
+            ],
+            'summary': [
+                {'label': 'Total Tracks', 'value': total_tracks},
+                {'label': 'New Tracks This Period', 'value': new_tracks},
+                {'label': 'Total Plays', 'value': db.session.query(db.func.sum(MusicTrack.plays)).scalar() or 0},
+                {'label': 'Total MusicTrack Earnings', 'value': f'${(db.session.query(db.func.sum(MusicTrack.earnings)).scalar() or 0):.2f}'}
+            ]
+        }
+    except Exception:
+        current_app.logger.exception('Error in music report')
+        return get_fallback_report('music')
+
+# Helper functions for sample data
+def get_last_6_months():
+    """Get last 6 month names"""
+    months = []
+    for i in range(6):
+        month = (datetime.utcnow().month - i - 1) % 12 + 1
+        month_name = datetime(2024, month, 1).strftime('%b')
+        months.append(month_name)
+    return months[::-1]
+
+def generate_sample_user_data(total_users):
+    """Generate sample user growth data"""
+    base = max(1, total_users // 6)
+    return [base, base * 2, base * 3, base * 4, base * 5, total_users]
+
+def generate_sample_earnings_data(total_earnings):
+    """Generate sample earnings data"""
+    base = max(1, total_earnings // 6)
+    return [base, base * 1.5, base * 2, base * 2.5, base * 3, total_earnings]
+
+def generate_sample_growth_data(current_total, periods):
+    """Generate sample growth data"""
+    base = max(1, current_total // periods)
+    return [base, base * 2, base * 3, base * 4, base * 5, current_total]
+
+def get_fallback_report(report_type):
+    """Return fallback report data when there's an error"""
+    labels = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun']
+    fallback_data = [10, 20, 30, 40, 50, 60]
+    
+    return {
+        'chartType': 'line',
+        'title': f'{report_type.title()} Report - Sample Data',
+        'labels': labels,
+        'datasets': [{
+            'label': 'Sample Data',
+            'data': fallback_data,
+            'borderColor': 'rgb(75, 192, 192)',
+            'tension': 0.1
+        }],
+        'summary': [
+            {'label': 'Sample Stat 1', 'value': '100'},
+            {'label': 'Sample Stat 2', 'value': '200'},
+            {'label': 'Sample Stat 3', 'value': '300'}
+        ]
+    }
@@ -0,0 +1,592 @@
+import time
+from datetime import datetime, timedelta
+
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for, make_response, session, current_app, \
+    abort, send_from_directory
+from flask_login import login_required, current_user
+from sqlalchemy.orm import joinedload, selectinload
+
+from database import db, User, MusicTrack, ListeningHistory, AdWatch, TrackAnalysis
+from play_guard import play_guard
+from play_sessions import play_sessions
+from search import search_tracks
+from charts import charts
+from recommendations import recommender
+from cache import fragment_cache
+from catalog_index import catalog_index
+from counters import sharded_counters
+from transcode import choose_rendition
+from analysis import playback_gain
+from settings import platform_settings
+import ledger
+from activity import activity_feed
+from live import live_updates
+from analytics import play_analytics
+from fraud import fraud_detector, referral_group
+
+bp = Blueprint('streamer', __name__)
+
+@bp.route('/dashboard')
+@login_required
+def dashboard():
+    if current_user.user_type == 'admin':
+        return redirect(url_for('admin.admin_dashboard'))
+    elif current_user.user_type == 'artist':
+        return redirect(url_for('artist.artist_dashboard'))
+    else:
+        # For streamers, show available tracks; play counts may lag by up to a minute
+        track_grid = fragment_cache.fragment('catalog_grid', ['catalog', 'settings'], lambda: render_template(
+            'partials/track_grid.html',
+            tracks=catalog_index.snapshot().active()
+        ), ttl=60)
+        response = make_response(render_template('streamer.html', track_grid=track_grid))
+        # Ask browsers to send connection hints with the play requests
+        response.headers['Accept-CH'] = 'Downlink, ECT, Save-Data'
+        return response
+
+# API Routes for Streamer Dashboard
+@bp.route('/api/start_ad', methods=['POST'])
+@login_required
+def start_ad():
+    """Start watching an ad"""
+    if current_user.user_type != 'streamer':
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    # Store ad start time in session
+    session['ad_start_time'] = time.time()
+    session['ad_completed'] = False
+    
+    return jsonify({'success': True, 'message': 'Ad started'})
+
+@bp.route('/api/complete_ad', methods=['POST'])
+@login_required
+def complete_ad():
+    """Complete watching an ad and earn reward"""
+    if current_user.user_type != 'streamer':
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    ad_start_time = session.get('ad_start_time')
+    if not ad_start_time:
+        return jsonify({'success': False, 'error': 'No ad started'}), 400
+    
+    # Check if the whole ad has played
+    ad_duration = platform_settings['ad_duration']
+    elapsed_time = time.time() - ad_start_time
+    if elapsed_time < ad_duration:
+        return jsonify({'success': False, 'error': f'Ad not completed. Please watch for {ad_duration} seconds.'}), 400
+    
+    earnings = platform_settings['ad_earnings']
+    verdict = fraud_detector.score_ad(current_user.id, request.remote_addr)
+    
+    # Set ad unlock expiry
+    ad_unlock_expiry = datetime.utcnow() + timedelta(minutes=platform_settings['ad_unlock_minutes'])
+    session['ad_unlock_expiry'] = ad_unlock_expiry.isoformat()
+    session['ad_completed'] = True
+    
+    ad_watch = record_ad_watch(db.session, current_user.id, earnings, verdict, current_user.username)
+    db.session.commit()
+    activity_feed.publish('ad', f'{current_user.username} watched an ad', current_user.id)
+    live_updates.publish(f'user:{current_user.id}', 'unlock', {'expires_at': ad_unlock_expiry.isoformat()})
+    
+    return jsonify(ad_result(ad_watch, earnings, current_user.balance, ad_unlock_expiry))
+
+def ad_result(ad_watch, earnings, new_balance, ad_unlock_expiry):
+    if ad_watch is None:
+        return {
+            'success': True,
+            'earnings': 0,
+            'held': True,
+            'new_balance': new_balance,
+            'unlock_expiry': ad_unlock_expiry.isoformat(),
+            'message': 'Ad completed! Your earnings are on hold for review'
+        }
+    return {
+        'success': True,
+        'earnings': earnings,
+        'new_balance': new_balance,
+        'unlock_expiry': ad_unlock_expiry.isoformat(),
+        'message': f'Ad completed! You earned ${earnings:.2f}'
+    }
+
+def record_ad_watch(session, streamer_id, earnings, verdict=None, username=None):
+    """Record a watched ad and credit its earnings in `session`; does not commit.
+    
+    An ad the fraud detector holds is not recorded or paid; its earnings
+    wait in a FraudFlag until an admin reviews it, and None is returned.
+    """
+    if verdict is not None and verdict.action == 'hold':
+        fraud_detector.record(session, streamer_id, 'ad', verdict, held_cents=ledger.cents(earnings),
+                              username=username)
+        return None
+    
+    ad_watch = AdWatch(
+        streamer_id=streamer_id,
+        earnings=earnings,
+        watched_at=datetime.utcnow()
+    )
+    session.add(ad_watch)
+    session.flush()
+    
+    # Add earnings to user balance
+    ledger.transfer('ad', streamer_id, ledger.cents(earnings), ledger.PAYOUTS,
+                    reference=f'ad_watch:{ad_watch.id}', session=session)
+    if verdict is not None and verdict.action:
+        fraud_detector.record(session, streamer_id, 'ad', verdict, reference=f'ad_watch:{ad_watch.id}',
+                              username=username)
+    return ad_watch
+
+@bp.route('/api/check_ad_status')
+@login_required
+def check_ad_status():
+    """Check if user has active ad unlock"""
+    if current_user.user_type != 'streamer':
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    ad_unlock_expiry = session.get('ad_unlock_expiry')
+    is_unlocked = False
+    minutes_left = 0
+    
+    if ad_unlock_expiry:
+        try:
+            expiry_time = datetime.fromisoformat(ad_unlock_expiry)
+            if datetime.utcnow() < expiry_time:
+                is_unlocked = True
+                minutes_left = max(0, int((expiry_time - datetime.utcnow()).total_seconds() / 60))
+        except (ValueError, TypeError):
+            # Invalid expiry time, reset session
+            session.pop('ad_unlock_expiry', None)
+    
+    return jsonify({
+        'ad_unlocked': is_unlocked,
+        'minutes_left': minutes_left,
+        'ad_completed': session.get('ad_completed', False)
+    })
+
+@bp.route('/api/play_track/<int:track_id>', methods=['POST'])
+@login_required
+def api_play_track(track_id):
+    """Start playing a track; earnings are credited later by heartbeats"""
+    if current_user.user_type != 'streamer':
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    if not ad_unlocked():
+        return jsonify({'success': False, 'error': 'Please watch an ad first to unlock music'}), 403
+    
+    # Retried requests get their original response back without a second credit
+    idempotency_key = request.headers.get('Idempotency-Key', '')[:64]
+    replay = play_guard.replayed(current_user.id, idempotency_key)
+    if replay is not None:
+        return jsonify(dict(replay, replayed=True))
+    
+    # Reject repeat plays of the same track inside the minimum listen interval
+    if not play_guard.acquire(current_user.id, track_id):
+        response = jsonify({'success': False, 'error': 'This play was already recorded. Please keep listening.'})
+        response.headers['Retry-After'] = str(play_guard.retry_after(current_user.id, track_id))
+        return response, 429
+    
+    track = MusicTrack.query.get(track_id)
+    if track is None or not track.is_active:
+        play_guard.release(current_user.id, track_id)
+        return jsonify({'success': False, 'error': 'Track not found'}), 404
+    
+    # Open a play session; the play is credited once enough of it has been heard
+    verdict = fraud_detector.score_play(current_user.id, track.id, request.remote_addr,
+                                        referral_group(current_user.referred_by, current_user.referral_code))
+    play_token = play_sessions.start(current_user.id, track)
+    if verdict.action:
+        record_play_verdict(db.session, current_user, track.id, play_token, verdict)
+        db.session.commit()
+    
+    # Stream the rendition that fits the client's connection, or the original
+    # upload until renditions have been built
+    rendition = choose_rendition(track.renditions, request.args.get('quality'), request.headers)
+    stream_file = rendition.filename if rendition else track.filename
+    
+    result = {
+        'success': True,
+        'track_url': url_for('static', filename=f'uploads/{stream_file}'),
+        'quality': rendition.quality if rendition else 'original',
+        'gain_db': playback_gain(track.analysis, current_app.config['PLAYBACK_TARGET_LUFS'],
+                                 current_app.config['PLAYBACK_MAX_BOOST_DB']),
+        'title': track.title,
+        'artist': track.artist.username,
+        'earnings': platform_settings['streamer_play_earnings'],
+        'held': verdict.action == 'hold',
+        'new_balance': current_user.balance,
+        'play_token': play_token,
+        'heartbeat_interval': current_app.config['PLAY_HEARTBEAT_INTERVAL']
+    }
+    play_guard.remember(current_user.id, idempotency_key, result)
+    
+    return jsonify(result)
+
+@bp.route('/api/play_queue', methods=['POST'])
+@login_required
+def api_play_queue():
+    """Authorize a list of queued tracks in one request.
+    
+    Every playable track gets its own play session and a signed stream URL
+    that expires after PLAY_STREAM_URL_MAX_AGE, so the player can fetch the
+    next track ahead of time. Plays are credited by heartbeats as usual,
+    and only the session heartbeated most recently started accrues time,
+    so the stream URLs can all be valid without all of them earning.
+    """
+    if current_user.user_type != 'streamer':
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    if not ad_unlocked():
+        return jsonify({'success': False, 'error': 'Please watch an ad first to unlock music'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    track_ids = data.get('tracks')
+    if not isinstance(track_ids, list) or not all(isinstance(track_id, int) for track_id in track_ids):
+        return jsonify({'success': False, 'error': 'tracks must be a list of track ids'}), 400
+    track_ids = list(dict.fromkeys(track_ids))
+    if not track_ids or len(track_ids) > current_app.config['PLAY_QUEUE_MAX']:
+        return jsonify({'success': False,
+                        'error': f"Queue between 1 and {current_app.config['PLAY_QUEUE_MAX']} tracks"}), 400
+    
+    idempotency_key = request.headers.get('Idempotency-Key', '')[:64]
+    replay = play_guard.replayed(current_user.id, idempotency_key)
+    if replay is not None:
+        return jsonify(dict(replay, replayed=True))
+    
+    tracks = {track.id: track for track in MusicTrack.query
+              .options(joinedload(MusicTrack.artist), joinedload(MusicTrack.analysis),
+                       selectinload(MusicTrack.renditions))
+              .filter(MusicTrack.id.in_(track_ids), MusicTrack.is_active == True)}
+    
+    queued, skipped = [], []
+    for track_id in track_ids:
+        if track_id not in tracks:
+            skipped.append({'track_id': track_id, 'error': 'Track not found'})
+        elif not play_guard.acquire(current_user.id, track_id):
+            skipped.append({'track_id': track_id, 'error': 'This play was already recorded',
+                            'retry_after': play_guard.retry_after(current_user.id, track_id)})
+        else:
+            queued.append(tracks[track_id])
+    
+    group = referral_group(current_user.referred_by, current_user.referral_code)
+    verdicts = [fraud_detector.score_play(current_user.id, track.id, request.remote_addr, group) for track in queued]
+    play_tokens = play_sessions.start_many(current_user.id, queued) if queued else []
+    if any(verdict.action for verdict in verdicts):
+        for track, play_token, verdict in zip(queued, play_tokens, verdicts):
+            if verdict.action:
+                record_play_verdict(db.session, current_user, track.id, play_token, verdict)
+        db.session.commit()
+    
+    items = []
+    quality = request.args.get('quality')
+    target_lufs = current_app.config['PLAYBACK_TARGET_LUFS']
+    max_boost_db = current_app.config['PLAYBACK_MAX_BOOST_DB']
+    for track, play_token, verdict in zip(queued, play_tokens, verdicts):
+        rendition = choose_rendition(track.renditions, quality, request.headers)
+        stream_file = rendition.filename if rendition else track.filename
+        items.append({
+            'track_id': track.id,
+            'stream_url': url_for('streamer.stream_track', token=play_sessions.stream_token(current_user.id, stream_file)),
+            'quality': rendition.quality if rendition else 'original',
+            'gain_db': playback_gain(track.analysis, target_lufs, max_boost_db),
+            'title': track.title,
+            'artist': track.artist.username,
+            'play_token': play_token,
+            'held': verdict.action == 'hold',
+        })
+    
+    result = {
+        'success': True,
+        'items': items,
+        'skipped': skipped,
+        'earnings': platform_settings['streamer_play_earnings'],
+        'expires_in': current_app.config['PLAY_STREAM_URL_MAX_AGE'],
+        'heartbeat_interval': current_app.config['PLAY_HEARTBEAT_INTERVAL']
+    }
+    play_guard.remember(current_user.id, idempotency_key, result)
+    
+    return jsonify(result)
+
+@bp.route('/api/stream/<token>')
+def stream_track(token):
+    """Serve an upload to the streamer a signed stream URL was issued to"""
+    granted = play_sessions.stream_file(token)
+    if granted is None:
+        abort(403)
+    filename, streamer_id = granted
+    if str(streamer_id) != session.get('_user_id'):
+        abort(403)
+    # The URL is unique to this grant, so the browser may keep the file until it expires
+    response = send_from_directory(current_app.config['UPLOAD_FOLDER'], filename,
+                                   max_age=current_app.config['PLAY_STREAM_URL_MAX_AGE'])
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
+
+def record_play_verdict(session, streamer, track_id, play_token, verdict):
+    """Flag a play start, or hold its earnings for review when it is credited; does not commit"""
+    play_id = play_sessions.decode(play_token)[0]
+    fraud_detector.record(session, streamer.id, 'play', verdict, reference=f'play_session:{play_id}',
+                          track_id=track_id, username=streamer.username)
+
+def ad_unlocked():
+    """Whether the session holds an unexpired ad unlock; drops an unreadable one"""
+    ad_unlock_expiry = session.get('ad_unlock_expiry')
+    if not ad_unlock_expiry:
+        return False
+    try:
+        return datetime.utcnow() < datetime.fromisoformat(ad_unlock_expiry)
+    except (ValueError, TypeError):
+        session.pop('ad_unlock_expiry', None)
+        return False
+
+@bp.route('/api/play/heartbeat', methods=['POST'])
+def play_heartbeat():
+    """Record that a play session is still playing.
+    
+    The signed play token identifies the streamer, so this endpoint does
+    not load the user or touch the database; heartbeats are buffered and
+    written in batches by play_sessions.flush().
+    """
+    data = request.get_json(silent=True) or {}
+    decoded = play_sessions.decode(data.get('t', ''))
+    if decoded is None:
+        return jsonify({'success': False, 'error': 'Invalid play token'}), 400
+    
+    session_id, streamer_id = decoded
+    if str(streamer_id) != session.get('_user_id'):
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    position = data.get('p')
+    credited = play_sessions.heartbeat(session_id, float(position) if isinstance(position, (int, float)) else None)
+    if play_sessions.flush_due():
+        play_sessions.flush()
+        credited = play_sessions.is_credited(session_id)
+    if sharded_counters.compact_due():
+        sharded_counters.compact()
+    
+    return jsonify({'success': True, 'credited': credited})
+
+@play_sessions.credit_handler
+def credit_play(play):
+    """Credit a play session that reached the listening threshold"""
+    track = MusicTrack.query.get(play.track_id)
+    streamer = User.query.get(play.streamer_id)
+    if track is None or streamer is None:
+        return
+    
+    # Pay at the current rates
+    artist_cents = ledger.cents(platform_settings['artist_play_earnings'])
+    streamer_cents = ledger.cents(platform_settings['streamer_play_earnings'])
+    
+    # A held play is only paid and counted if an admin releases it, a forfeited one never
+    flag = fraud_detector.flag_for(f'play_session:{play.id}')
+    if flag is not None and flag.status == 'held':
+        if fraud_detector.hold(flag, streamer_cents, track.artist_id, artist_cents):
+            return
+    if flag is not None and flag.status == 'forfeited':
+        return
+    pay_play(track, streamer, artist_cents, streamer_cents, f'play_session:{play.id}')
+
+def pay_play(track, streamer, artist_cents, streamer_cents, reference):
+    """Pay for a play and count it in the track totals, history and charts; does not commit"""
+    # A popular track's row and its artist's balance are bumped through counter shards
+    ledger.post('play', [
+        (track.artist_id, ledger.BALANCE, artist_cents),
+        (streamer.id, ledger.BALANCE, streamer_cents),
+        (None, ledger.PAYOUTS, -artist_cents - streamer_cents),
+    ], reference=reference, sharded=(track.artist_id,))
+    sharded_counters.add('track_earnings', track.id, artist_cents)
+    sharded_counters.add('track_plays', track.id, 1)
+    
+    # Record listening history
+    history = ListeningHistory(
+        streamer_id=streamer.id,
+        track_id=track.id,
+        earnings=streamer_cents / 100,
+        listened_at=datetime.utcnow()
+    )
+    db.session.add(history)
+    charts.record_play(track)
+    play_analytics.record_play(track, streamer.id, artist_cents)
+    # Counted rather than published: admin feeds get one event per track every ACTIVITY_TALLY_SECONDS
+    activity_feed.tally('play', track.id, f'"{track.title}" was played', track.artist_id)
+
+@bp.route('/api/user_stats')
+@login_required
+def user_stats():
+    """Get user statistics"""
+    if current_user.user_type != 'streamer':
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    return jsonify(streamer_stats(current_user.id))
+
+def streamer_stats(user_id):
+    return {
+        'total_plays': ListeningHistory.query.filter_by(streamer_id=user_id).count(),
+        'total_earnings': db.session.query(User.balance).filter_by(id=user_id).scalar() or 0,
+        'ads_watched': AdWatch.query.filter_by(streamer_id=user_id).count()
+    }
+
+def unlock_state(expiry):
+    """The ad unlock as sent to the dashboard for an expiry datetime or None"""
+    if expiry is None or expiry <= datetime.utcnow():
+        return {'unlocked': False, 'expires_at': None, 'minutes_left': 0}
+    return {
+        'unlocked': True,
+        'expires_at': expiry.isoformat(),
+        'minutes_left': int((expiry - datetime.utcnow()).total_seconds() / 60)
+    }
+
+@bp.route('/api/events')
+@login_required
+def streamer_events():
+    """Server-sent stats and ad unlock changes for the streamer dashboard"""
+    if current_user.user_type != 'streamer':
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    subscription = live_updates.connect(current_user.id, [f'user:{current_user.id}'], request.environ)
+    if subscription is None:
+        return live_updates.refused({'success': False})
+    
+    app = current_app._get_current_object()
+    user_id = current_user.id
+    try:
+        expiry = datetime.fromisoformat(session.get('ad_unlock_expiry') or '')
+    except ValueError:
+        expiry = None
+    sent = {}
+    
+    def update(subscription, event):
+        nonlocal expiry
+        name, data = event or (None, None)
+        messages = []
+        
+        # Stats are re-read on heartbeats too, for balances moved by other workers
+        if name in (None, 'balance'):
+            with app.app_context():
+                stats = streamer_stats(user_id)
+            changed = {key: value for key, value in stats.items() if sent.get(key) != value}
+            if changed:
+                sent.update(changed)
+                messages.append(('stats', changed))
+        
+        if name == 'unlock':
+            expiry = datetime.fromisoformat(data['expires_at'])
+        unlock = unlock_state(expiry)
+        if unlock['unlocked'] != sent.get('unlocked') or unlock['expires_at'] != sent.get('expires_at'):
+            sent.update(unlocked=unlock['unlocked'], expires_at=unlock['expires_at'])
+            messages.append(('unlock', unlock))
+        if unlock['unlocked']:
+            subscription.wake_at = time.monotonic() + (expiry - datetime.utcnow()).total_seconds()
+        return messages
+    
+    return live_updates.response(subscription, update)
+
+@bp.route('/api/search')
+@login_required
+def api_search():
+    """Full-text search over the active catalog"""
+    query = request.args.get('q', '').strip()
+    genre = request.args.get('genre') or None
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 20, type=int)
+    
+    return jsonify(search_tracks(query, genre=genre, page=page, per_page=per_page))
+
+@bp.route('/api/charts/tracks')
+@login_required
+def api_chart_tracks():
+    """Trending tracks, optionally within one genre or for one artist"""
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    genre = request.args.get('genre')
+    artist_id = request.args.get('artist_id', type=int)
+    
+    # Ask for extra entries so hidden tracks can be skipped
+    entries = charts.top_tracks(limit * 2, genre=genre, artist_id=artist_id)
+    catalog = catalog_index.snapshot()
+    
+    chart = []
+    for track_id, score in entries:
+        track = catalog.get(track_id)
+        if track is None or not track.is_active:
+            continue
+        chart.append({
+            'rank': len(chart) + 1,
+            'id': track.id,
+            'title': track.title,
+            'artist': track.artist_name,
+            'genre': track.genre,
+            'score': round(score, 3)
+        })
+        if len(chart) == limit:
+            break
+    
+    return jsonify({'chart': chart})
+
+@bp.route('/api/charts/artists')
+@login_required
+def api_chart_artists():
+    """Trending artists by decayed plays across all their tracks"""
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    entries = charts.top_artists(limit)
+    artists = {user.id: user for user in User.query.filter(User.id.in_([artist_id for artist_id, _ in entries]))}
+    
+    chart = [{
+        'rank': rank,
+        'id': artist_id,
+        'username': artists[artist_id].username,
+        'score': round(score, 3)
+    } for rank, (artist_id, score) in enumerate(
+        [entry for entry in entries if entry[0] in artists], start=1)]
+    
+    return jsonify({'chart': chart})
+
+@bp.route('/api/charts/genres')
+@login_required
+def api_chart_genres():
+    """Trending genres"""
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    chart = [{
+        'rank': rank,
+        'genre': genre,
+        'score': round(score, 3)
+    } for rank, (genre, score) in enumerate(charts.top_genres(limit), start=1)]
+    
+    return jsonify({'chart': chart})
+
+@bp.route('/api/recommendations')
+@login_required
+def api_recommendations():
+    """Tracks that listeners of the streamer's recent tracks also played"""
+    if current_user.user_type != 'streamer':
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+    
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    ranked = recommender.for_streamer(current_user.id, limit)
+    catalog = catalog_index.snapshot()
+    tracks = {track_id: catalog.get(track_id) for track_id, _ in ranked}
+    
+    return jsonify({'recommendations': [{
+        'id': track_id,
+        'title': tracks[track_id].title,
+        'artist': tracks[track_id].artist_name,
+        'genre': tracks[track_id].genre,
+        'score': round(score, 4)
+    } for track_id, score in ranked if tracks[track_id] is not None]})
+
+@bp.route('/api/tracks/<int:track_id>/waveform')
+@login_required
+def track_waveform(track_id):
+    """Precomputed waveform peaks as raw bytes, one uint8 per point"""
+    analysis = TrackAnalysis.query.get(track_id)
+    if analysis is None:
+        return jsonify({'success': False, 'error': 'Waveform not available'}), 404
+    
+    response = make_response(analysis.waveform)
+    response.mimetype = 'application/octet-stream'
+    response.headers['X-Loudness-LUFS'] = '' if analysis.loudness_lufs is None else f'{analysis.loudness_lufs:.2f}'
+    response.headers['X-Duration'] = f'{analysis.duration:.3f}'
+    # Only changes when the track is analyzed again
+    response.set_etag(f'{track_id}-{analysis.analyzed_at.timestamp():.0f}')
+    response.cache_control.private = True
+    response.cache_control.max_age = 24 * 60 * 60
+    return response.make_conditional(request)